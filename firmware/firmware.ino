@@ -36,6 +36,31 @@ COMANDI DISPONIBILI SU PORTA SERIALE:
     Invia alla GoPro (IP 10.5.5.9) il comando per
     fermare la registrazione.
 
+  START e STOP non bloccano: la risposta della GoPro è letta da loop()
+  e nel frattempo gli altri comandi (anche STATUS) sono eseguiti subito.
+  Un secondo START/STOP attende la risposta del primo; un terzo riceve
+  BUSY. La connessione alla GoPro resta aperta (keep-alive) e viene
+  riusata finché la GoPro non la chiude.
+
+- QUIT
+    Chiude la connessione alla GoPro (CLOSED) e il WiFi (DISCONNECTED);
+    una richiesta in corso riceve FAILED.
+
+--------------------------------------------------------
+PROTOCOLLO CON ID (opzionale):
+Ogni comando può essere preceduto da un ID numerico:
+    #<seq> <comando>          es.  #12 START
+Tutte le risposte a quel comando riportano lo stesso ID e tre
+letture di millis():
+    #<seq> <risposta> <ricevuto> <inviato> <completato>
+      ricevuto    = quando il comando è stato letto
+      inviato     = quando la richiesta è partita verso la GoPro
+                    (START/STOP; per gli altri comandi = ricevuto)
+      completato  = quando la risposta è stata scritta
+    es.  #12 STARTED 50211 50230 50412
+Con l'ID, TIMEOUT è la risposta finale (non segue STARTED/STOPPED).
+I comandi senza ID ricevono le risposte di sempre.
+
 --------------------------------------------------------
 NOTE:
 - Prima di invocare CONNECT è obbligatorio aver inviato SETSSID e SETPASS.
@@ -61,6 +86,53 @@ const unsigned long reconnectInterval = 10000; // 10 secondi
 // timeout in ms per la lettura della risposta HTTP
 const unsigned long HTTP_RESPONSE_TIMEOUT = 10000;
 
+// Protocollo con ID: ID del comando in corso (-1 = comando senza ID)
+long cmdSeq = -1;
+unsigned long cmdReceived = 0;
+unsigned long cmdSent = 0;
+
+// Richiesta shutter alla GoPro, letta in modo non bloccante da loop()
+enum ShutterState { SHUTTER_IDLE, SHUTTER_HEADERS, SHUTTER_BODY };
+
+struct ShutterRequest {
+  int value;                 // 1 = START, 0 = STOP
+  long seq;                  // ID del comando (-1 = senza ID)
+  unsigned long received;
+  unsigned long sent;
+};
+
+ShutterState shutterState = SHUTTER_IDLE;
+ShutterRequest shutterCurrent;
+ShutterRequest shutterNext;
+bool shutterQueued = false;
+unsigned long shutterStart = 0;
+long bodyRemaining = -1;     // -1 = nessun Content-Length
+bool closeAfter = false;
+String responseLine = "";
+
+// Stampa una risposta con ID e tempi dati (senza ID se seq < 0)
+void replyWith(const char* msg, long seq, unsigned long received, unsigned long sent) {
+  if (seq < 0) {
+    Serial.println(msg);
+    return;
+  }
+  Serial.print('#');
+  Serial.print(seq);
+  Serial.print(' ');
+  Serial.print(msg);
+  Serial.print(' ');
+  Serial.print(received);
+  Serial.print(' ');
+  Serial.print(sent);
+  Serial.print(' ');
+  Serial.println(millis());
+}
+
+// Stampa una risposta al comando in corso
+void reply(const char* msg) {
+  replyWith(msg, cmdSeq, cmdReceived, cmdSent);
+}
+
 void setup() {
   Serial.begin(115200);
   while (!Serial);
@@ -69,6 +141,8 @@ void setup() {
 }
 
 void loop() {
+  pollShutter();
+
   if (WiFi.status() != WL_CONNECTED) {
     unsigned long now = millis();
     if (now - lastConnectAttempt > reconnectInterval && !(creds_ssid[0] == '\0' || (uint8_t)creds_ssid[0] == 0xFF) && !(creds_pass[0] == '\0' || (uint8_t)creds_pass[0] == 0xFF)) {
@@ -81,13 +155,23 @@ void loop() {
     String cmd = Serial.readStringUntil('\n');
     cmd.trim();
 
+    cmdReceived = cmdSent = millis();
+    cmdSeq = -1;
+    if (cmd.startsWith("#")) {
+      int space = cmd.indexOf(' ');
+      if (space > 0) {
+        cmdSeq = cmd.substring(1, space).toInt();
+        cmd.remove(0, space + 1);
+      }
+    }
+
     if (cmd.startsWith("SETSSID ")) {
       cmd.remove(0, 8);
       cmd.toCharArray(creds_ssid, sizeof(creds_ssid));
 
       memset(creds_pass, 0, sizeof(creds_pass));
 
-      Serial.println("NO_PASS");
+      reply("NO_PASS");
     }
     else if (cmd.startsWith("SETPASS ")) {
       cmd.remove(0, 8);
@@ -98,40 +182,45 @@ void loop() {
     else if (cmd == "CONNECT") {
       connectWiFi();
     }
-    else if (cmd == "START") startRecording();
-    else if (cmd == "STOP") stopRecording();
+    else if (cmd == "START") requestShutter(1);
+    else if (cmd == "STOP") requestShutter(0);
     else if (cmd == "STATUS") {
       if (WiFi.status() == WL_CONNECTED) {
-        Serial.println("CONNECTED");
+        reply("CONNECTED");
       } else {
-        Serial.println("DISCONNECTED");
+        reply("DISCONNECTED");
       }
     }
     else if (cmd == "QUIT") {
+      abortShutter();
       if (client.connected()) {
         client.stop();
-        Serial.println("CLOSED");
+        reply("CLOSED");
       }
 
       if (WiFi.status() == WL_CONNECTED) {
         WiFi.disconnect();
-        Serial.println("DISCONNECTED");
+        reply("DISCONNECTED");
       }
     }
     else if (cmd == "RESET") {
+      abortShutter();
+      client.stop();
       if (WiFi.status() == WL_CONNECTED) {
         WiFi.disconnect();
-        Serial.println("DISCONNECTED");
+        reply("DISCONNECTED");
       }
 
       memset(creds_ssid, 0, sizeof(creds_ssid));
       memset(creds_pass, 0, sizeof(creds_pass));
 
-      Serial.println("CLEARED");
+      reply("CLEARED");
     }
     else {
-      Serial.println("⚠ Comando non riconosciuto");
+      reply("⚠ Comando non riconosciuto");
     }
+
+    cmdSeq = -1;  // le righe fuori da un comando (riconnessione) sono senza ID
   }
 }
 
@@ -141,15 +230,15 @@ bool connectWiFi() {
 
   // controllo credenziali
   if (creds_ssid[0] == '\0' || (uint8_t)creds_ssid[0] == 0xFF) {
-    Serial.println("NO_SSID");
+    reply("NO_SSID");
     return false;
   }
   if (creds_pass[0] == '\0' || (uint8_t)creds_pass[0] == 0xFF) {
-    Serial.println("NO_PASS");
+    reply("NO_PASS");
     return false;
   }
 
-  Serial.println("CONNECTING");
+  reply("CONNECTING");
 
   WiFi.begin(creds_ssid, creds_pass);
 
@@ -164,72 +253,142 @@ bool connectWiFi() {
 
   status = WiFi.status();
   if (status == WL_CONNECTED) {
-    Serial.println("CONNECTED");
+    reply("CONNECTED");
     return true;
   } else {
-    Serial.println("DISCONNECTED");
+    reply("DISCONNECTED");
     return false;
   }
 }
 
 // --- Funzioni GoPro ---
-void startRecording() {
+void shutterReply(const ShutterRequest& req, const char* msg) {
+  replyWith(msg, req.seq, req.received, req.sent);
+}
+
+const char* shutterDone(const ShutterRequest& req) {
+  return req.value ? "STARTED" : "STOPPED";
+}
+
+// START/STOP: invia subito se non c'è una richiesta in corso, altrimenti
+// la mette in coda (una sola); la risposta arriva da pollShutter()
+void requestShutter(int value) {
   if (WiFi.status() != WL_CONNECTED) {
-    Serial.println("DISCONNECT");
+    reply("DISCONNECT");
     return;
   }
-  if (!client.connect("10.5.5.9", 80)) {
-    Serial.println("FAILED");
-    client.stop();
-    return;
+  ShutterRequest req = { value, cmdSeq, cmdReceived, cmdReceived };
+  if (shutterState == SHUTTER_IDLE) {
+    beginShutter(req);
+  } else if (!shutterQueued) {
+    shutterNext = req;
+    shutterQueued = true;
+  } else {
+    reply("BUSY");
   }
+}
 
-  client.println("GET /gp/gpControl/command/shutter?p=1 HTTP/1.1");
-  client.println("Host: 10.5.5.9");
-  client.println("Connection: close");
-  client.println();
-
-  // leggo la risposta con timeout per evitare blocchi
-  unsigned long start = millis();
-  while (client.connected() || client.available()) {
-    if (client.available()) {
-      String line = client.readStringUntil('\n');
-    }
-    if (millis() - start > HTTP_RESPONSE_TIMEOUT) {
-      Serial.println("TIMEOUT");
-      break;
+void beginShutter(ShutterRequest req) {
+  shutterCurrent = req;
+  // riusa la connessione se la GoPro l'ha tenuta aperta
+  if (!client.connected()) {
+    client.stop();
+    if (!client.connect("10.5.5.9", 80)) {
+      shutterReply(shutterCurrent, "FAILED");
+      client.stop();
+      nextShutter();
+      return;
     }
   }
-  client.stop();
-  Serial.println("STARTED");
+
+  shutterCurrent.sent = millis();
+  client.print(req.value ? "GET /gp/gpControl/command/shutter?p=1 HTTP/1.1\r\n"
+                         : "GET /gp/gpControl/command/shutter?p=0 HTTP/1.1\r\n");
+  client.print("Host: 10.5.5.9\r\nConnection: keep-alive\r\n\r\n");
+
+  shutterState = SHUTTER_HEADERS;
+  shutterStart = millis();
+  bodyRemaining = -1;
+  closeAfter = false;
+  responseLine = "";
 }
 
-void stopRecording() {
-  if (WiFi.status() != WL_CONNECTED) {
-    Serial.println("DISCONNECT");
-    return;
+void nextShutter() {
+  shutterState = SHUTTER_IDLE;
+  if (shutterQueued) {
+    shutterQueued = false;
+    beginShutter(shutterNext);
   }
-  if (!client.connect("10.5.5.9", 80)) {
-    Serial.println("FAILED");
+}
+
+void finishShutter() {
+  shutterReply(shutterCurrent, shutterDone(shutterCurrent));
+  if (closeAfter) {
     client.stop();
-    return;
   }
+  nextShutter();
+}
 
-  client.println("GET /gp/gpControl/command/shutter?p=0 HTTP/1.1");
-  client.println("Host: 10.5.5.9");
-  client.println("Connection: close");
-  client.println();
+// Richiesta in corso e in coda ricevono FAILED (QUIT, RESET)
+void abortShutter() {
+  if (shutterState != SHUTTER_IDLE) {
+    shutterReply(shutterCurrent, "FAILED");
+  }
+  if (shutterQueued) {
+    shutterReply(shutterNext, "FAILED");
+  }
+  shutterQueued = false;
+  shutterState = SHUTTER_IDLE;
+}
 
-  unsigned long start = millis();
-  while (client.connected() || client.available()) {
-    if (client.available()) {
-      String line = client.readStringUntil('\n');
+// Legge quanto è arrivato della risposta, senza attendere
+void pollShutter() {
+  if (shutterState == SHUTTER_IDLE) {
+    return;
+  }
+
+  while (client.available() && shutterState != SHUTTER_IDLE) {
+    char c = client.read();
+    if (shutterState == SHUTTER_HEADERS) {
+      if (c != '\n') {
+        if (responseLine.length() < 128) responseLine += c;
+        continue;
+      }
+      responseLine.trim();
+      responseLine.toLowerCase();
+      if (responseLine.length() == 0) {
+        // fine degli header
+        shutterState = SHUTTER_BODY;
+        if (bodyRemaining < 0) {
+          closeAfter = true;       // corpo fino alla chiusura (o chunked)
+        }
+      } else if (responseLine.startsWith("content-length:")) {
+        bodyRemaining = responseLine.substring(15).toInt();
+      } else if (responseLine.startsWith("connection:") && responseLine.indexOf("close") > 0) {
+        closeAfter = true;
+      } else if (responseLine.startsWith("transfer-encoding:")) {
+        bodyRemaining = 0;         // lo stato basta: si chiude dopo gli header
+        closeAfter = true;
+      }
+      responseLine = "";
+    } else if (bodyRemaining > 0) {
+      bodyRemaining--;
     }
-    if (millis() - start > HTTP_RESPONSE_TIMEOUT) {
-      Serial.println("TIMEOUT");
-      break;
+  }
+
+  if (shutterState == SHUTTER_BODY && bodyRemaining == 0) {
+    finishShutter();
+  } else if (!client.connected() && !client.available()) {
+    // la GoPro ha chiuso: la risposta è completa
+    closeAfter = true;
+    finishShutter();
+  } else if (millis() - shutterStart > HTTP_RESPONSE_TIMEOUT) {
+    shutterReply(shutterCurrent, "TIMEOUT");
+    client.stop();
+    if (shutterCurrent.seq < 0) {
+      // senza ID come sempre: STARTED/STOPPED dopo il TIMEOUT
+      shutterReply(shutterCurrent, shutterDone(shutterCurrent));
     }
+    nextShutter();
   }
-  client.stop();
-  Serial.println("STOPPED");
 }
\ No newline at end of file
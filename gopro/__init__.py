@@ -0,0 +1,11 @@
+from .serial_controller import (ArduinoPort, ClockSync, CommandResult, PendingCommand, SerialController,
+                                TaggedReply, parse_tagged)
+from .http_controller import GoProCamera, HttpController, PendingRequest
+from .trigger import DeviceTiming, SyncTrigger, TakeReport
+from .provisioning import ProvisioningResult, RetryPolicy, assign_networks, provision, provision_port
+
+__all__ = ['ArduinoPort', 'ClockSync', 'CommandResult', 'PendingCommand', 'SerialController',
+           'TaggedReply', 'parse_tagged',
+           'GoProCamera', 'HttpController', 'PendingRequest',
+           'DeviceTiming', 'SyncTrigger', 'TakeReport',
+           'ProvisioningResult', 'RetryPolicy', 'assign_networks', 'provision', 'provision_port']
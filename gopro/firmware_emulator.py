@@ -0,0 +1,472 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tty
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gopro.http_controller import read_response
+from gopro.serial_controller import UNKNOWN_COMMAND
+
+# (value, seq, received): one START (1) or STOP (0) for the non-blocking firmware
+ShutterRequest = Tuple[int, Optional[int], int]
+
+
+@dataclass
+class EmulatorOptions:
+    """Behaviour of one emulated controller; times in seconds"""
+    serial_latency: float = 0.0             # before every command is handled
+    join_time: float = 1.0                  # from CONNECTING to CONNECTED
+    join_timeout: float = 10.0              # connectWiFi() gives up after this
+    dot_interval: float = 0.5               # one '.' per interval while joining
+    join_failures: int = 0                  # first join attempts that end DISCONNECTED
+    networks: Optional[Dict[str, str]] = None   # ssid -> password joined; None joins any
+    drop_after: Optional[float] = None      # WiFi drops this long after every join
+    reconnect_interval: float = 10.0
+    gopro_host: str = "127.0.0.1"
+    gopro_port: int = 80
+    http_connect_timeout: float = 2.0
+    http_timeout: float = 10.0              # HTTP_RESPONSE_TIMEOUT
+    nonblocking: bool = False               # shutter state machine on a kept-alive connection
+
+
+class FirmwareEmulator:
+    """Emulates firmware/firmware.ino behind a pseudo-terminal
+
+    ``port`` is the pty device to open in place of the Arduino's serial
+    port. Commands are handled one at a time, as the firmware's ``loop()``
+    does, with the same replies; START and STOP send the shutter request to
+    the GoPro at ``gopro_host:gopro_port`` (a ``GoProStub``) on a new
+    connection and block until it closes or ``http_timeout`` expires.
+    With ``nonblocking`` they behave as the firmware's shutter state
+    machine instead: the request goes out on a kept-alive connection, other
+    commands are handled while it is in flight, one more START/STOP waits
+    for it and a third gets BUSY. Commands sent as ``#<seq> <command>`` get
+    tagged replies, as with the firmware's optional tagged protocol. Linux
+    and macOS only.
+    """
+
+    def __init__(self, options: EmulatorOptions = None):
+        self.options = options or EmulatorOptions()
+        self.ssid = ""
+        self.password = ""
+        self.wifi_connected = False
+        self.joins = 0                      # join attempts so far
+        self.commands: List[Tuple[float, str]] = []     # (time.perf_counter(), command)
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._buffer = b''
+        self._lines: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._drop_handle: Optional[asyncio.TimerHandle] = None
+        self._last_attempt = 0.0
+        self._boot = time.perf_counter()
+        self._seq: Optional[int] = None     # ID of the tagged command being handled
+        self._received = 0
+        self._sent = 0
+        self.http_connections = 0           # connections opened to the camera
+        self._http: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+        self._shutter_task: Optional[asyncio.Task] = None
+        self._current: Optional[ShutterRequest] = None
+        self._queued: Optional[ShutterRequest] = None
+
+    @property
+    def port(self) -> Optional[str]:
+        return os.ttyname(self._slave) if self._slave is not None else None
+
+    async def __aenter__(self) -> 'FirmwareEmulator':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Open the pty and boot, running ``setup()``"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self._lines = asyncio.Queue()
+        asyncio.get_running_loop().add_reader(self._master, self._on_readable)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        for task in (self._task, self._shutter_task):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._task = self._shutter_task = None
+        self._close_http()
+        self._cancel_drop()
+        if self._master is not None:
+            asyncio.get_running_loop().remove_reader(self._master)
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = self._slave = None
+
+    def drop_wifi(self):
+        """Lose the WiFi link silently, as when the camera goes out of range"""
+        self.wifi_connected = False
+        self._cancel_drop()
+
+    def _cancel_drop(self):
+        if self._drop_handle is not None:
+            self._drop_handle.cancel()
+            self._drop_handle = None
+
+    # --- Serial ---
+
+    def _on_readable(self):
+        try:
+            data = os.read(self._master, 4096)
+        except OSError:
+            return
+        self._buffer += data
+        while b'\n' in self._buffer:
+            line, self._buffer = self._buffer.split(b'\n', 1)
+            self._lines.put_nowait(line.decode('utf-8', errors='ignore').strip())
+
+    def _print(self, text: str):
+        try:
+            os.write(self._master, text.encode('utf-8'))
+        except (BlockingIOError, OSError):
+            pass                            # nobody reading: output is lost, as on USB
+
+    def _println(self, text: str):
+        self._print(text + "\r\n")
+
+    def millis(self) -> int:
+        return int((time.perf_counter() - self._boot) * 1000) & 0xFFFFFFFF
+
+    def _reply(self, text: str):
+        """A reply line, tagged when answering a tagged command"""
+        self._reply_as(text, self._seq, self._received, self._sent)
+
+    def _reply_as(self, text: str, seq: Optional[int], received: int, sent: int):
+        if seq is None:
+            self._println(text)
+        else:
+            self._println(f"#{seq} {text} {received} {sent} {self.millis()}")
+
+    # --- loop() ---
+
+    async def _run(self):
+        await self._connect_wifi()          # setup()
+        while True:
+            cmd = await self._next_command()
+            if cmd is None:
+                await self._connect_wifi()
+                continue
+            self.commands.append((time.perf_counter(), cmd))
+            if self.options.serial_latency:
+                await asyncio.sleep(self.options.serial_latency)
+            self._received = self._sent = self.millis()
+            if cmd.startswith("#"):
+                seq, _, cmd = cmd[1:].partition(" ")
+                self._seq = int(seq) if seq.isdigit() else 0
+            try:
+                await self._handle(cmd)
+            finally:
+                self._seq = None
+
+    async def _next_command(self) -> Optional[str]:
+        """Next serial command, or None when the periodic reconnection is due"""
+        if self.wifi_connected or not (self.ssid and self.password):
+            return await self._lines.get()
+        due = self._last_attempt + self.options.reconnect_interval - time.perf_counter()
+        if due <= 0 and self._lines.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self._lines.get(), max(due, 0))
+        except asyncio.TimeoutError:
+            return None
+
+    async def _handle(self, cmd: str):
+        if cmd.startswith("SETSSID "):
+            self.ssid = cmd[8:][:31]
+            self.password = ""
+            self._reply("NO_PASS")
+        elif cmd.startswith("SETPASS "):
+            self.password = cmd[8:][:63]
+            await self._connect_wifi()
+        elif cmd == "CONNECT":
+            await self._connect_wifi()
+        elif cmd in ("START", "STOP") and self.options.nonblocking:
+            self._request_shutter(1 if cmd == "START" else 0)
+        elif cmd == "START":
+            await self._shutter(1, "STARTED")
+        elif cmd == "STOP":
+            await self._shutter(0, "STOPPED")
+        elif cmd == "STATUS":
+            self._reply("CONNECTED" if self.wifi_connected else "DISCONNECTED")
+        elif cmd == "QUIT":
+            # Only the non-blocking firmware keeps a connection to report CLOSED for
+            self._abort_shutter()
+            if self._http is not None:
+                self._close_http()
+                self._reply("CLOSED")
+            if self.wifi_connected:
+                self.drop_wifi()
+                self._reply("DISCONNECTED")
+        elif cmd == "RESET":
+            self._abort_shutter()
+            self._close_http()
+            if self.wifi_connected:
+                self.drop_wifi()
+                self._reply("DISCONNECTED")
+            self.ssid = self.password = ""
+            self._reply("CLEARED")
+        else:
+            self._reply(UNKNOWN_COMMAND)
+
+    async def _connect_wifi(self) -> bool:
+        options = self.options
+        self._last_attempt = time.perf_counter()
+        if not self.ssid:
+            self._reply("NO_SSID")
+            return False
+        if not self.password:
+            self._reply("NO_PASS")
+            return False
+
+        self._reply("CONNECTING")
+        self.drop_wifi()
+        self.joins += 1
+        joins = (self.joins > options.join_failures
+                 and (options.networks is None or options.networks.get(self.ssid) == self.password))
+        wait = options.join_time if joins else options.join_timeout
+        start = time.perf_counter()
+        while time.perf_counter() - start < wait:
+            await asyncio.sleep(options.dot_interval)
+            self._print(".")
+        self._println("")
+
+        if not joins:
+            self._reply("DISCONNECTED")
+            return False
+        self.wifi_connected = True
+        if options.drop_after is not None:
+            self._drop_handle = asyncio.get_running_loop().call_later(options.drop_after, self.drop_wifi)
+        self._reply("CONNECTED")
+        return True
+
+    async def _shutter(self, value: int, done: str):
+        options = self.options
+        if not self.wifi_connected:
+            self._reply("DISCONNECT")
+            return
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(options.gopro_host, options.gopro_port),
+                options.http_connect_timeout)
+        except (OSError, asyncio.TimeoutError):
+            self._reply("FAILED")
+            return
+
+        self._sent = self.millis()
+        writer.write((f"GET /gp/gpControl/command/shutter?p={value} HTTP/1.1\r\n"
+                      f"Host: 10.5.5.9\r\nConnection: close\r\n\r\n").encode('ascii'))
+        # Read until the camera closes the connection, as the firmware does
+        deadline = time.perf_counter() + options.http_timeout
+        try:
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                if not await asyncio.wait_for(reader.read(1024), remaining):
+                    break
+        except asyncio.TimeoutError:
+            self._reply("TIMEOUT")
+            if self._seq is not None:
+                return                      # tagged: TIMEOUT is the final reply
+        except OSError:
+            pass
+        finally:
+            writer.close()
+        self._reply(done)
+
+    # --- Non-blocking shutter (pollShutter() in the firmware) ---
+
+    def _request_shutter(self, value: int):
+        if not self.wifi_connected:
+            self._reply("DISCONNECT")
+            return
+        request = (value, self._seq, self._received)
+        if self._shutter_task is None:
+            self._shutter_task = asyncio.create_task(self._shutter_worker(request))
+        elif self._queued is None:
+            self._queued = request
+        else:
+            self._reply("BUSY")
+
+    async def _shutter_worker(self, request: ShutterRequest):
+        while request is not None:
+            self._current = request
+            await self._exchange(request)
+            request, self._queued = self._queued, None
+        self._current = None
+        self._shutter_task = None
+
+    def _abort_shutter(self):
+        """FAILED for the request in flight and the queued one"""
+        for request in (self._current, self._queued):
+            if request is not None:
+                self._reply_as("FAILED", request[1], request[2], request[2])
+        if self._shutter_task is not None:
+            self._shutter_task.cancel()
+        self._shutter_task = self._current = self._queued = None
+
+    def _close_http(self):
+        if self._http is not None:
+            self._http[1].close()
+            self._http = None
+
+    async def _exchange(self, request: ShutterRequest):
+        options = self.options
+        value, seq, received = request
+        done = "STARTED" if value else "STOPPED"
+        if self._http is None or self._http[0].at_eof() or self._http[1].is_closing():
+            self._close_http()
+            try:
+                self._http = await asyncio.wait_for(
+                    asyncio.open_connection(options.gopro_host, options.gopro_port),
+                    options.http_connect_timeout)
+                self.http_connections += 1
+            except (OSError, asyncio.TimeoutError):
+                self._reply_as("FAILED", seq, received, received)
+                return
+
+        reader, writer = self._http
+        sent = self.millis()
+        writer.write((f"GET /gp/gpControl/command/shutter?p={value} HTTP/1.1\r\n"
+                      f"Host: 10.5.5.9\r\nConnection: keep-alive\r\n\r\n").encode('ascii'))
+        try:
+            response = await asyncio.wait_for(read_response(reader), options.http_timeout)
+            if not response.keep_alive:
+                self._close_http()
+        except asyncio.TimeoutError:
+            self._reply_as("TIMEOUT", seq, received, sent)
+            self._close_http()
+            if seq is not None:
+                return
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            self._close_http()              # the camera closed: the response is complete
+        self._reply_as(done, seq, received, sent)
+
+
+# ============================================================
+# Script: emulated controllers, optionally benchmarked
+# ============================================================
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def benchmark(emulators: List[FirmwareEmulator], takes: int, timeout: float,
+                    tagged: bool = False):
+    """Provision every emulated controller, then time ``takes`` START/STOP pairs"""
+    from gopro.provisioning import RetryPolicy, assign_networks, provision
+    from gopro.serial_controller import SerialController
+    from gopro.trigger import SyncTrigger
+
+    ports = [emulator.port for emulator in emulators]
+    async with SerialController(ports, settle=0, tagged=tagged) as controller:
+        results = await provision(controller, assign_networks(ports, [("emulator", "emulator")] * len(ports)),
+                                  policy=RetryPolicy(attempts=3, base_delay=0.1))
+        connected = sum(result.ok for result in results.values())
+        print(f"{connected}/{len(ports)} controllers joined WiFi")
+
+        trigger = SyncTrigger(controller, timeout=timeout)
+        latencies, send_skews, reply_skews, camera_skews, failures = [], [], [], [], 0
+        for _ in range(takes):
+            for report in (await trigger.start(), await trigger.stop()):
+                latencies += [device.latency for device in report.devices if device.ok]
+                send_skews.append(report.send_skew)
+                if report.reply_skew is not None:
+                    reply_skews.append(report.reply_skew)
+                if report.camera_skew is not None:
+                    camera_skews.append(report.camera_skew)
+                failures += len(report.failed)
+                print(report.summary().splitlines()[0])
+
+    print(f"\n{len(emulators)} controllers, {2 * takes} commands each, {failures} failed")
+    if latencies:
+        print(f"latency     p50 {percentile(latencies, 0.5) * 1000:8.1f} ms   "
+              f"p99 {percentile(latencies, 0.99) * 1000:8.1f} ms   max {max(latencies) * 1000:8.1f} ms")
+    print(f"send skew   p50 {percentile(send_skews, 0.5) * 1000:8.3f} ms   "
+          f"max {max(send_skews) * 1000:8.3f} ms")
+    if reply_skews:
+        print(f"reply skew  p50 {percentile(reply_skews, 0.5) * 1000:8.1f} ms   "
+              f"max {max(reply_skews) * 1000:8.1f} ms")
+    if camera_skews:
+        print(f"camera skew p50 {percentile(camera_skews, 0.5) * 1000:8.1f} ms   "
+              f"max {max(camera_skews) * 1000:8.1f} ms")
+    return failures
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Emulated GoPro controllers (firmware.ino) on ptys")
+    parser.add_argument('--count', type=int, default=1, help="number of controllers")
+    parser.add_argument('--gopro', default=None,
+                        help="HOST:PORT of the camera for every controller; "
+                             "by default each gets its own local GoProStub")
+    parser.add_argument('--serial-latency', type=float, default=0.0)
+    parser.add_argument('--http-latency', type=float, default=0.0, help="stub response delay")
+    parser.add_argument('--http-timeout', type=float, default=10.0)
+    parser.add_argument('--join-time', type=float, default=1.0)
+    parser.add_argument('--join-failures', type=int, default=0)
+    parser.add_argument('--drop-after', type=float, default=None, help="WiFi drops this long after joining")
+    parser.add_argument('--reconnect-interval', type=float, default=10.0)
+    parser.add_argument('--takes', type=int, default=0,
+                        help="run this many START/STOP takes against the emulators and exit")
+    parser.add_argument('--timeout', type=float, default=15.0, help="per-command timeout of --takes")
+    parser.add_argument('--tagged', action='store_true', help="use the tagged protocol in --takes")
+    parser.add_argument('--nonblocking', action='store_true',
+                        help="emulate the non-blocking firmware, with kept-alive camera connections")
+    args = parser.parse_args()
+
+    from gopro.gopro_stub import GoProStub
+
+    stubs, emulators = [], []
+    try:
+        for _ in range(args.count):
+            options = EmulatorOptions(
+                serial_latency=args.serial_latency, join_time=args.join_time,
+                join_failures=args.join_failures, drop_after=args.drop_after,
+                reconnect_interval=args.reconnect_interval, http_timeout=args.http_timeout,
+                nonblocking=args.nonblocking)
+            if args.gopro:
+                host, _, port = args.gopro.rpartition(':')
+                options.gopro_host, options.gopro_port = host, int(port)
+            else:
+                stub = GoProStub(latency=args.http_latency, keep_alive=args.nonblocking)
+                await stub.start()
+                stubs.append(stub)
+                options.gopro_host, options.gopro_port = stub.host, stub.port
+            emulator = FirmwareEmulator(options)
+            await emulator.start()
+            emulators.append(emulator)
+
+        if args.takes:
+            return await benchmark(emulators, args.takes, args.timeout, args.tagged)
+
+        for emulator in emulators:
+            print(f"{emulator.port} -> http://{emulator.options.gopro_host}:{emulator.options.gopro_port}")
+        print("\ne.g.: python gopro/goproManager.py " + " ".join(emulator.port for emulator in emulators))
+        await asyncio.Event().wait()
+    finally:
+        for emulator in emulators:
+            await emulator.close()
+        for stub in stubs:
+            await stub.close()
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(1 if asyncio.run(main()) else 0)
+    except KeyboardInterrupt:
+        pass
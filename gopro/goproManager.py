@@ -1,73 +1,46 @@
-import serial
-import threading
-import time
-from prompt_toolkit import prompt
+import asyncio
+import os
+import sys
+from prompt_toolkit import PromptSession
 from prompt_toolkit.patch_stdout import patch_stdout
 from prompt_toolkit.shortcuts import print_formatted_text
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gopro.serial_controller import BAUD, SerialController
+from gopro.http_controller import GoProCamera, HttpController
+from gopro.trigger import SyncTrigger
+from gopro.provisioning import RetryPolicy, assign_networks, provision
+
 # ============================================================
 # CONFIGURAZIONE
 # ============================================================
-PORTE = ["COM5"]  # Modifica con le tue porte reali
-BAUD = 115200
+# Modifica con le tue porte reali, oppure passale da riga di comando
+# (es. le pty di gopro/firmware_emulator.py)
+PORTE = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ["COM5"]
 STATUS_INTERVAL = 5  # secondi tra interrogazioni STATUS
-
-arduinos = []
-arduino_states = {}  # stato per ogni COM
-state_lock = threading.Lock()
+TAKES_LOG = "takes.jsonl"  # tempi di invio/risposta di ogni START/STOP
+WIFI_RETRY = RetryPolicy(attempts=3)  # per porta: passare policies= a provision()
+# Con --http le GoPro sono comandate direttamente in HTTP, senza Arduino:
+# (nome, indirizzo IP della scheda WiFi collegata alla rete di quella GoPro)
+CAMERE_HTTP = [("GoPro1", None)]
 
 # ============================================================
-# THREAD DI LETTURA E GESTIONE EVENTI
+# LETTURA E GESTIONE EVENTI
 # ============================================================
-def read_arduino(ser):
+def print_line(port, line):
     """
-    Thread principale che legge dalla porta seriale e aggiorna lo stato.
+    Chiamata per ogni riga ricevuta: lo stato di ogni porta è aggiornato
+    da SerialController sullo stesso event loop, senza thread.
     """
-    while True:
-        try:
-            line = ser.readline().decode(errors="ignore").strip()
-            if not line:
-                continue
-
-            with state_lock:
-                state = arduino_states.get(ser.port, {})
-                if line == "READY":
-                    state["status"] = "READY"
-                elif line in ["STARTED", "STOPPED"]:
-                    state["last_cmd"] = line
-                elif line in ["CONNECTED", "DISCONNECTED", "NO_SSID", "NO_PASS"]:
-                    state["wifi"] = line
-                else:
-                    state["last_msg"] = line
-                arduino_states[ser.port] = state
-
-            # Stampa sempre la linea ricevuta
-            print_formatted_text(f"[COM][{ser.port}] -> {line}")
-
-        except Exception as e:
-            state = arduino_states.get(ser.port, {})
-            print_formatted_text(f"[COM][{ser.port}] ❌ Errore lettura: {e}")
-            print_formatted_text(f"[COM][{ser.port}] ❌ Errore lettura status: {state}")
-            time.sleep(1)
-
-# ============================================================
-# INVIO COMANDI SERIAL
-# ============================================================
-def send_command(ser_list, cmd):
-    for ser in ser_list:
-        try:
-            ser.write((cmd + "\n").encode())
-            ser.flush()
-        except Exception as e:
-            print_formatted_text(f"[{ser.port}] ❌ Errore invio comando: {e}")
+    print_formatted_text(f"[COM][{port}] -> {line}")
 
 # ============================================================
 # MONITOR STATO PERIODICO
 # ============================================================
-def monitor_status(ser_list, interval=STATUS_INTERVAL):
+async def monitor_status(arduinos, interval=STATUS_INTERVAL):
     while True:
-        send_command(ser_list, "STATUS")
-        time.sleep(interval)
+        await arduinos.status()
+        await asyncio.sleep(interval)
 
 # ============================================================
 # LETTURA FILE DI RETI
@@ -90,116 +63,101 @@ def load_networks(filename="networks.txt"):
     return nets
 
 # ============================================================
-# CONNESSIONE WIFI LOGICA CORRETTA
+# CONNESSIONE WIFI
 # ============================================================
-def connect_arduino(ser, ssid, pwd, timeout=20):
+async def connect_arduinos(arduinos, networks):
     """
-    Gestisce la connessione WiFi in modo robusto:
-      - NO_SSID  -> invia SSID
-      - NO_PASS  -> invia password
-      - CONNECTED -> successo
-      - DISCONNECTED -> fallimento
+    Connette tutti gli Arduino alle reti WiFi in parallelo: ogni risposta
+    (NO_SSID, NO_PASS, CONNECTED, DISCONNECTED) riceve subito il passo
+    successivo, i tentativi falliti sono ripetuti secondo WIFI_RETRY.
     """
-    ser.reset_input_buffer()
-    print_formatted_text(f"[PY][{ser.port}] 🔗 Tentativo connessione a '{ssid}'...")
-    start = time.time()
-    last_sent = None
-
-    # Reset stato WiFi locale
-    with state_lock:
-        arduino_states[ser.port]["wifi"] = "NO_SSID"
-
-    while time.time() - start < timeout:
-        with state_lock:
-            wifi_status = arduino_states.get(ser.port, {}).get("wifi", "")
-
-        if wifi_status == "NO_SSID" and last_sent != "SSID":
-            ser.write(f"SETSSID {ssid}\n".encode())
-            ser.flush()
-            last_sent = "SSID"
-            print_formatted_text(f"[PY][{ser.port}] 📡 Inviato SSID: {ssid}")
-
-        elif wifi_status == "NO_PASS" and last_sent != "PASS":
-            ser.write(f"SETPASS {pwd}\n".encode())
-            ser.flush()
-            last_sent = "PASS"
-            print_formatted_text(f"[PY][{ser.port}] 🔑 Inviata password.")
-
-        elif wifi_status == "CONNECTED":
-            print_formatted_text(f"[PY][{ser.port}] ✅ Connesso a {ssid}")
-            return True
-
-        elif wifi_status == "DISCONNECTED":
-            print_formatted_text(f"[PY][{ser.port}] ❌ Connessione fallita (DISCONNECTED)")
-            return False
-
-        time.sleep(0.2)
-
-    print_formatted_text(f"[PY][{ser.port}] ⏰ Timeout connessione a {ssid}")
-    return False
-
-# ============================================================
-# APERTURA DELLE PORTE SERIALI
-# ============================================================
-for porta in PORTE:
-    try:
-        ser = serial.Serial(porta, BAUD, timeout=1)
-        time.sleep(2)
-
-        arduinos.append(ser)
-        with state_lock:
-            arduino_states[porta] = {"status": "OPEN", "wifi": "NO_SSID", "last_cmd": None}
-        threading.Thread(target=read_arduino, args=(ser,), daemon=True).start()
-        print_formatted_text(f"[PY][{porta}] Aperta con successo.")
-    except Exception as e:
-        print_formatted_text(f"[PY][{porta}] ❌ Errore apertura: {e}")
-
-if not arduinos:
-    print_formatted_text("[PY] ❌ Nessun Arduino aperto!")
-    exit()
-
-# ============================================================
-# CONNESSIONE ALLE RETI WIFI
-# ============================================================
-available_networks = load_networks()
-for idx, ser in enumerate(arduinos):
-    if idx >= len(available_networks):
-        print_formatted_text(f"[PY][{ser.port}] ⚠ Nessuna rete assegnata, skipping.")
-        continue
-    ssid, pwd = available_networks[idx]
-    print_formatted_text(f"[PY][{ser.port}] 🌐 Configurazione rete: SSID='{ssid}', PASS='{pwd}'")
-    connect_arduino(ser, ssid, pwd)
-
-# ============================================================
-# INTERFACCIA A COMANDO
-# ============================================================
-print_formatted_text("[PY] 👉 Comandi: 'a'=START, 's'=STOP, 'status'=stato, 'q'=USCITA")
-
-def print_states():
-    with state_lock:
-        for port, info in arduino_states.items():
-            print_formatted_text(f"[STATE][{port}] {info}")
-
-with patch_stdout():
-    while True:
-        cmd = prompt('> ', bottom_toolbar="Comandi: 'a'=START, 's'=STOP, 'status', 'q'=USCITA").lower().strip()
-        if cmd == "a":
-            print_formatted_text("[PY] 🚀 START tutte le GoPro...")
-            send_command(arduinos, "START")
-        elif cmd == "s":
-            print_formatted_text("[PY] 🛑 STOP tutte le GoPro...")
-            send_command(arduinos, "STOP")
-        elif cmd == "status":
-            print_states()
-        elif cmd == "q":
-            print_formatted_text("[PY] 🔌 Chiusura connessioni...")
-            break
+    assigned = assign_networks([port.port for port in arduinos], networks)
+    for port in arduinos:
+        if port.port not in assigned:
+            print_formatted_text(f"[PY][{port.port}] ⚠ Nessuna rete assegnata, skipping.")
+    for porta, (ssid, pwd) in assigned.items():
+        print_formatted_text(f"[PY][{porta}] 🌐 Configurazione rete: SSID='{ssid}', PASS='{pwd}'")
+    results = await provision(arduinos, assigned, policy=WIFI_RETRY)
+    for porta, result in results.items():
+        if result.ok:
+            print_formatted_text(f"[PY][{porta}] ✅ Connesso a {result.ssid} in {result.time_to_connect:.1f}s "
+                                 f"({result.attempts} tentativi)")
         else:
-            print_formatted_text("[PY] ⚠️ Comando non valido.")
+            print_formatted_text(f"[PY][{porta}] ❌ Connessione fallita dopo {result.attempts} tentativi "
+                                 f"({result.error})")
+    return results
+
+# ============================================================
+# MAIN
+# ============================================================
+def open_cameras(http):
+    """Controller seriale (Arduino) o HTTP diretto: stessa interfaccia"""
+    if http:
+        return HttpController(GoProCamera(nome, local_addr=scheda) for nome, scheda in CAMERE_HTTP)
+    # --tagged: comandi con ID e tempi dell'Arduino (vedi firmware.ino)
+    return SerialController(PORTE, BAUD, on_line=print_line, tagged="--tagged" in sys.argv)
+
+async def main():
+    http = "--http" in sys.argv
+    # Tutte le porte sono lette sullo stesso event loop
+    async with open_cameras(http) as arduinos:
+        for porta, errore in arduinos.failed.items():
+            print_formatted_text(f"[PY][{porta}] ❌ Errore apertura: {errore}")
+        for nome in arduinos.ports:
+            print_formatted_text(f"[PY][{nome}] Aperta con successo.")
+
+        if not len(arduinos):
+            print_formatted_text("[PY] ❌ Nessun Arduino aperto!")
+            return
+
+        # Connessione alle reti WiFi (in HTTP il PC è già sulla rete della GoPro)
+        if not http:
+            await connect_arduinos(arduinos, load_networks())
+
+        # Interfaccia a comando: START e STOP girano in background,
+        # il prompt resta disponibile mentre si attendono le risposte
+        print_formatted_text("[PY] 👉 Comandi: 'a'=START, 's'=STOP, 'status'=stato, 'q'=USCITA")
+        session = PromptSession()
+        trigger = SyncTrigger(arduinos, log_path=TAKES_LOG)
+        pending = set()
+
+        def report(done):
+            # Gli errori della ripresa vanno all'utente, non all'event loop
+            pending.discard(done)
+            if done.cancelled():
+                print_formatted_text("[PY] ⚠️ Comando annullato.")
+            elif done.exception() is not None:
+                print_formatted_text(f"[PY] ❌ Errore: {done.exception()!r}")
+            else:
+                print_formatted_text(done.result().summary())
+
+        def run(command):
+            task = asyncio.create_task(command)
+            pending.add(task)
+            task.add_done_callback(report)
+
+        with patch_stdout():
+            while True:
+                cmd = (await session.prompt_async(
+                    '> ', bottom_toolbar="Comandi: 'a'=START, 's'=STOP, 'status', 'q'=USCITA")).lower().strip()
+                if cmd == "a":
+                    print_formatted_text("[PY] 🚀 START tutte le GoPro...")
+                    run(trigger.start())
+                elif cmd == "s":
+                    print_formatted_text("[PY] 🛑 STOP tutte le GoPro...")
+                    run(trigger.stop())
+                elif cmd == "status":
+                    for port, info in arduinos.states().items():
+                        print_formatted_text(f"[STATE][{port}] {info}")
+                elif cmd == "q":
+                    print_formatted_text("[PY] 🔌 Chiusura connessioni...")
+                    break
+                else:
+                    print_formatted_text("[PY] ⚠️ Comando non valido.")
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
 
-# ============================================================
-# CHIUSURA
-# ============================================================
-for ser in arduinos:
-    ser.close()
-print_formatted_text("[PY] ✅ Connessioni chiuse.")
+    print_formatted_text("[PY] ✅ Connessioni chiuse.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclass
+class StubRequest:
+    """One request served by the stub"""
+    path: str
+    received: float             # time.perf_counter()
+    connection: int             # index of the TCP connection it came on
+    status: int
+
+
+class GoProStub:
+    """Local HTTP server answering like a GoPro's /gp/gpControl endpoints
+
+    Serves the shutter command (``?p=1`` starts, ``?p=0`` stops recording)
+    and the status JSON, with keep-alive connections unless
+    ``keep_alive=False``. ``latency`` delays every response, and
+    ``requests`` records what was served, for tests and benchmarks.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 keep_alive: bool = True, max_requests: int = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.keep_alive = keep_alive
+        self.max_requests = max_requests        # per connection, then the stub closes it
+        self.recording = False
+        self.requests: List[StubRequest] = []
+        self.connections = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def __aenter__(self) -> 'GoProStub':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _respond(self, path: str):
+        url = urlsplit(path)
+        if url.path == "/gp/gpControl/command/shutter":
+            value = parse_qs(url.query).get('p', [''])[0]
+            if value not in ('0', '1'):
+                return 400, {}
+            self.recording = value == '1'
+            return 200, {}
+        if url.path == "/gp/gpControl/status":
+            return 200, {"status": {"8": int(self.recording)}, "settings": {}}
+        return 404, {}
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connection = self.connections
+        self.connections += 1
+        served = 0
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                received = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip().lower()
+                parts = request_line.decode('latin-1').split()
+                status, payload = self._respond(parts[1]) if len(parts) >= 2 else (400, {})
+                self.requests.append(StubRequest(parts[1] if len(parts) >= 2 else '',
+                                                 received, connection, status))
+                served += 1
+                keep = (self.keep_alive and headers.get('connection') != 'close'
+                        and (self.max_requests is None or served < self.max_requests))
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                body = json.dumps(payload).encode()
+                writer.write((f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                              f"Content-Type: application/json\r\n"
+                              f"Content-Length: {len(body)}\r\n"
+                              f"Connection: {'keep-alive' if keep else 'close'}\r\n\r\n").encode() + body)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for a GoPro's HTTP control API")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before every response")
+    parser.add_argument('--no-keep-alive', action='store_true')
+    args = parser.parse_args()
+
+    stub = GoProStub(args.host, args.port, args.latency, not args.no_keep_alive)
+    await stub.start()
+    print(f"GoPro stub on http://{stub.host}:{stub.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
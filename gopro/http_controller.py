@@ -0,0 +1,285 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+from .serial_controller import CommandResult
+
+GOPRO_HOST = "10.5.5.9"
+GOPRO_PORT = 80
+
+# Command -> (path, reply on success), replies named as the firmware's
+COMMAND_PATHS: Dict[str, Tuple[str, str]] = {
+    "START": ("/gp/gpControl/command/shutter?p=1", "STARTED"),
+    "STOP": ("/gp/gpControl/command/shutter?p=0", "STOPPED"),
+    "STATUS": ("/gp/gpControl/status", "CONNECTED"),
+}
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get('connection', '').lower() != 'close'
+
+
+async def read_response(reader: asyncio.StreamReader) -> HttpResponse:
+    """Read one HTTP/1.1 response: Content-Length, chunked or close-delimited body"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionResetError("connection closed before the response")
+    parts = status_line.decode('latin-1').split(' ', 2)
+    if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+        raise ValueError(f"Invalid status line: {status_line!r}")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await reader.readline()
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+        body = bytes(body)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        headers['connection'] = 'close'
+    return HttpResponse(int(parts[1]), headers, body)
+
+
+class GoProCamera:
+    """One camera reached over HTTP on a kept-alive connection
+
+    Every GoPro serves its own WiFi at the same address, so with one WiFi
+    adapter per camera ``local_addr`` picks the adapter (its IP address)
+    the connection leaves from. The connection is opened ahead of the
+    first command and reused until the camera closes it; a request that
+    finds a stale connection is sent again once on a new one.
+    """
+
+    def __init__(self, name: str, host: str = GOPRO_HOST, port: int = GOPRO_PORT,
+                 local_addr: str = None, connect_timeout: float = 5.0):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.local_addr = local_addr
+        self.connect_timeout = connect_timeout
+        self.state = {"status": "CLOSED", "last_cmd": None}
+        self.error: Optional[str] = None
+        self.connections = 0            # connections opened so far
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Open the connection if it is not open"""
+        if self.is_open:
+            return
+        local = (self.local_addr, 0) if self.local_addr else None
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, local_addr=local), self.connect_timeout)
+        self.connections += 1
+        self.state["status"] = "OPEN"
+
+    def _drop(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        self.state["status"] = "CLOSED"
+
+    def request_bytes(self, path: str) -> bytes:
+        host = self.host if self.port == 80 else f"{self.host}:{self.port}"
+        return (f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                f"Connection: keep-alive\r\n\r\n").encode('ascii')
+
+    async def prepare(self, command: str) -> 'PendingRequest':
+        """Reserve the camera and its connection for ``command``"""
+        if command not in COMMAND_PATHS:
+            raise ValueError(f"Unknown command: {command}")
+        await self._lock.acquire()
+        pending = PendingRequest(self, command)
+        try:
+            await self.connect()
+            self.error = None
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            pending.connect_error = self.error
+        return pending
+
+    async def command(self, command: str, timeout: float = 10.0) -> CommandResult:
+        pending = await self.prepare(command)
+        pending.fire()
+        return await pending.wait(timeout)
+
+    async def close(self):
+        async with self._lock:
+            self._drop()
+
+
+class PendingRequest:
+    """HTTP counterpart of ``PendingCommand``: ``fire`` writes, ``wait`` reads the reply"""
+
+    def __init__(self, camera: GoProCamera, command: str):
+        self.camera = camera
+        self.command = command
+        self.path, self.success = COMMAND_PATHS[command]
+        self.connect_error: Optional[str] = None
+        self.result: Optional[CommandResult] = None
+        self._released = False
+
+    def fire(self) -> float:
+        """Write the request now on the open connection; returns its send time"""
+        camera = self.camera
+        self.result = CommandResult(camera.name, self.command, time.perf_counter())
+        if self.connect_error is not None:
+            self.result.error = "FAILED"
+            self.result.lines = [self.connect_error]
+            return self.result.sent
+        camera._writer.write(camera.request_bytes(self.path))
+        self.result.sent = time.perf_counter()
+        return self.result.sent
+
+    async def wait(self, timeout: float = 10.0) -> CommandResult:
+        """Read the response and release the camera
+
+        Replies use the firmware's words: STARTED/STOPPED/CONNECTED on
+        success, FAILED when the camera cannot be reached, TIMEOUT when it
+        does not answer within ``timeout`` and ``HTTP <status>`` otherwise.
+        """
+        camera, result = self.camera, self.result
+        try:
+            if result is None:
+                raise RuntimeError("request not fired")
+            if result.error is not None:
+                return result
+            try:
+                response = await asyncio.wait_for(self._exchange(), timeout)
+            except asyncio.TimeoutError:
+                camera._drop()
+                result.error = "TIMEOUT"
+                return result
+            except Exception as e:
+                camera._drop()
+                camera.error = str(e) or type(e).__name__
+                result.error = "FAILED"
+                result.lines = [camera.error]
+                return result
+            result.received = time.perf_counter()
+            result.reply = self.success if response.status == 200 else f"HTTP {response.status}"
+            result.lines = [response.body.decode('utf-8', errors='replace')]
+            result.arrivals = [result.received]
+            if response.status != 200:
+                result.error = result.reply
+            elif self.command in ("START", "STOP"):
+                camera.state["last_cmd"] = result.reply
+            if not response.keep_alive:
+                camera._drop()
+            return result
+        finally:
+            self._release()
+
+    async def _exchange(self) -> HttpResponse:
+        camera = self.camera
+        await camera._writer.drain()
+        try:
+            return await read_response(camera._reader)
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+            # The camera closed the kept-alive connection: send once more on a new one
+            camera._drop()
+            await camera.connect()
+            camera._writer.write(camera.request_bytes(self.path))
+            await camera._writer.drain()
+            return await read_response(camera._reader)
+
+    def _release(self):
+        if not self._released:
+            self._released = True
+            self.camera._lock.release()
+
+    def cancel(self):
+        """Release the camera without sending"""
+        self._release()
+
+
+class HttpController:
+    """Drives several cameras directly over HTTP, like ``SerialController`` over serial
+
+    Same interface: ``prepare``/``broadcast``/``start``/``stop``/``status``
+    return one ``CommandResult`` per camera, so ``SyncTrigger`` and the
+    scripts can use either backend. Entering the context opens a kept-alive
+    connection to every camera; cameras that cannot be reached are listed
+    in ``failed`` and retried on the next command.
+    """
+
+    def __init__(self, cameras: Iterable[GoProCamera], timeout: float = 10.0):
+        self.ports: Dict[str, GoProCamera] = {camera.name: camera for camera in cameras}
+        self.timeout = timeout
+        self.failed: Dict[str, str] = {}
+
+    async def __aenter__(self) -> 'HttpController':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __iter__(self):
+        return iter(list(self.ports.values()))
+
+    async def open(self) -> Dict[str, str]:
+        """Connect to every camera; returns the errors of those that failed"""
+        cameras = list(self.ports.values())
+        results = await asyncio.gather(*(camera.connect() for camera in cameras),
+                                       return_exceptions=True)
+        for camera, result in zip(cameras, results):
+            if isinstance(result, BaseException):
+                self.failed[camera.name] = str(result) or type(result).__name__
+            else:
+                self.failed.pop(camera.name, None)
+        return dict(self.failed)
+
+    async def close(self):
+        await asyncio.gather(*(camera.close() for camera in self.ports.values()))
+
+    async def prepare(self, command: str) -> List[PendingRequest]:
+        return list(await asyncio.gather(*(camera.prepare(command) for camera in self)))
+
+    async def broadcast(self, command: str, timeout: float = None) -> List[CommandResult]:
+        """Send ``command`` to every camera at once and wait for every response"""
+        pending = await self.prepare(command)
+        for item in pending:
+            item.fire()
+        timeout = self.timeout if timeout is None else timeout
+        return list(await asyncio.gather(*(item.wait(timeout) for item in pending)))
+
+    async def start(self, timeout: float = None) -> List[CommandResult]:
+        return await self.broadcast("START", timeout)
+
+    async def stop(self, timeout: float = None) -> List[CommandResult]:
+        return await self.broadcast("STOP", timeout)
+
+    async def status(self, timeout: float = None) -> List[CommandResult]:
+        return await self.broadcast("STATUS", timeout)
+
+    def states(self) -> Dict[str, dict]:
+        return {name: dict(camera.state) for name, camera in self.ports.items()}
@@ -0,0 +1,143 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import random
+import time
+from .serial_controller import ArduinoPort, SerialController
+
+WIFI_REPLIES = ("NO_SSID", "NO_PASS", "CONNECTED", "DISCONNECTED")
+
+
+@dataclass
+class RetryPolicy:
+    """Retry schedule with exponential, jittered backoff
+
+    Same schedule as ``movella_dot_py``'s RetryPolicy, but starting at 1 s
+    and capped at 10 s instead of 0.5 s and 5 s: a WiFi join takes seconds,
+    not a BLE round trip, so shorter waits would only retry into an attempt
+    the access point is still handling. Kept separate so that ``gopro``
+    does not depend on the sensor package.
+    """
+    attempts: int = 3
+    base_delay: float = 1.0     # seconds before the second attempt
+    max_delay: float = 10.0
+    jitter: float = 0.5         # +/- fraction applied to every delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt (1-based)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+@dataclass
+class ProvisioningResult:
+    """Outcome of joining one controller to its WiFi network
+
+    Times are seconds from the start of provisioning; ``events`` lists every
+    WiFi reply with its time, across all attempts.
+    """
+    port: str
+    ssid: str
+    attempts: int = 0
+    elapsed: float = 0.0
+    time_to_connect: Optional[float] = None
+    events: List[Tuple[float, str]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def summary(self) -> str:
+        if self.ok:
+            return (f"[{self.port}] connected to '{self.ssid}' in {self.time_to_connect:.2f}s "
+                    f"({self.attempts} attempts)")
+        return (f"[{self.port}] '{self.ssid}' FAILED after {self.elapsed:.2f}s "
+                f"({self.attempts} attempts): {self.error}")
+
+
+async def _attempt(port: ArduinoPort, ssid: str, password: str, timeout: float,
+                   start: float, result: ProvisioningResult) -> bool:
+    """One credential exchange, answering each WiFi reply as soon as it arrives"""
+    lines = port.subscribe()
+    try:
+        deadline = time.perf_counter() + timeout
+        await port.send(f"SETSSID {ssid}")
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                result.error = f"no CONNECTED within {timeout:.1f}s"
+                return False
+            try:
+                arrival, line = await asyncio.wait_for(lines.get(), remaining)
+            except asyncio.TimeoutError:
+                continue
+            if line is None:
+                result.error = port.error or "port closed"
+                return False
+            if line not in WIFI_REPLIES:
+                continue
+            result.events.append((arrival - start, line))
+            if line == "NO_SSID":
+                await port.send(f"SETSSID {ssid}")
+            elif line == "NO_PASS":
+                await port.send(f"SETPASS {password}")
+            elif line == "CONNECTED":
+                result.time_to_connect = arrival - start
+                result.error = None
+                return True
+            else:
+                result.error = "DISCONNECTED"
+                return False
+    finally:
+        port.unsubscribe(lines)
+
+
+async def provision_port(port: ArduinoPort, ssid: str, password: str,
+                         policy: RetryPolicy = None, timeout: float = 20.0) -> ProvisioningResult:
+    """Join one controller to ``ssid``, retrying failed attempts per ``policy``
+
+    The firmware answers SETSSID with NO_PASS and SETPASS with CONNECTING
+    then CONNECTED or DISCONNECTED; a NO_SSID or NO_PASS at any point gets
+    the missing credential at once. ``timeout`` bounds each attempt.
+    """
+    policy = policy or RetryPolicy()
+    start = time.perf_counter()
+    result = ProvisioningResult(port.port, ssid)
+    for attempt in range(1, policy.attempts + 1):
+        result.attempts = attempt
+        try:
+            connected = await _attempt(port, ssid, password, timeout, start, result)
+        except Exception as e:
+            connected = False
+            result.error = str(e) or type(e).__name__
+        if connected or not port.is_open:
+            break
+        if attempt < policy.attempts:
+            await asyncio.sleep(policy.delay(attempt))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def assign_networks(ports: Iterable[str],
+                    networks: List[Tuple[str, str]]) -> Dict[str, Tuple[str, str]]:
+    """Pair ports with networks in order, as listed in networks.txt"""
+    return dict(zip(ports, networks))
+
+
+async def provision(controller: SerialController, networks: Dict[str, Tuple[str, str]],
+                    policies: Dict[str, RetryPolicy] = None, policy: RetryPolicy = None,
+                    timeout: float = 20.0) -> Dict[str, ProvisioningResult]:
+    """Provision every open controller of ``networks`` (port -> (ssid, password)) at once
+
+    ``policies`` overrides ``policy`` for individual ports. Results are keyed
+    by port, in the order of ``networks``.
+    """
+    policies = policies or {}
+    targets = [(name, credentials) for name, credentials in networks.items()
+               if name in controller.ports]
+    results = await asyncio.gather(*(
+        provision_port(controller.ports[name], ssid, password,
+                       policies.get(name, policy), timeout)
+        for name, (ssid, password) in targets))
+    return {name: result for (name, _), result in zip(targets, results)}
@@ -0,0 +1,531 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import time
+import serial_asyncio
+
+BAUD = 115200
+
+# Reply vocabulary of firmware/firmware.ino
+WIFI_STATES = ("NO_SSID", "NO_PASS", "CONNECTING", "CONNECTED", "DISCONNECTED")
+SHUTTER_REPLIES = ("STARTED", "STOPPED")
+HTTP_TIMEOUT = "TIMEOUT"            # camera response timed out, STARTED/STOPPED follows
+                                    # (final reply in the tagged protocol)
+UNKNOWN_COMMAND = "⚠ Comando non riconosciuto"
+
+# Replies that complete each command: (success, failure)
+COMMAND_REPLIES: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "START": (("STARTED",), ("FAILED", "DISCONNECT", "BUSY")),
+    "STOP": (("STOPPED",), ("FAILED", "DISCONNECT", "BUSY")),
+    "STATUS": (("CONNECTED", "DISCONNECTED"), ()),
+    "CONNECT": (("CONNECTED",), ("DISCONNECTED", "NO_SSID", "NO_PASS")),
+    "SETSSID": (("NO_PASS",), ()),
+    "SETPASS": (("CONNECTED",), ("DISCONNECTED", "NO_SSID", "NO_PASS")),
+    "RESET": (("CLEARED",), ()),
+    "QUIT": ((), ()),           # CLOSED/DISCONNECTED only if something was open
+}
+
+
+@dataclass
+class TaggedReply:
+    """One reply line of the tagged protocol: ``#<seq> <reply> <received> <sent> <done>``
+
+    The three numbers are the controller's ``millis()`` when it read the
+    command, when it acted on it (wrote the request to the camera, for
+    START and STOP) and when it printed this line.
+    """
+    seq: int
+    reply: str
+    received: int
+    sent: int
+    done: int
+
+
+def parse_tagged(line: str) -> Optional[TaggedReply]:
+    """Parse a tagged reply line; None for untagged or malformed lines"""
+    if not line.startswith("#"):
+        return None
+    try:
+        seq, rest = line[1:].split(" ", 1)
+        reply, received, sent, done = rest.rsplit(" ", 3)
+        return TaggedReply(int(seq), reply, int(received), int(sent), int(done))
+    except ValueError:
+        return None
+
+
+class ClockSync:
+    """Offset between a controller's ``millis()`` and the host's ``time.perf_counter``
+
+    Every tagged reply is a sample: the controller read the command after
+    the host sent it and replied before the host received the reply, so
+    assuming equal serial delays both ways the offset is the difference of
+    the two midpoints, within half the serial round trip. The estimate is
+    the sample with the shortest round trip among the last ``window``.
+    """
+
+    def __init__(self, window: int = 16):
+        self.samples = deque(maxlen=window)     # (round trip, offset), seconds
+
+    def add(self, host_sent: float, host_received: float, tag: TaggedReply) -> float:
+        """Add one command's timing; returns that sample's offset"""
+        on_device = (tag.done - tag.received) / 1000
+        round_trip = max(host_received - host_sent - on_device, 0.0)
+        offset = (tag.received + tag.done) / 2000 - (host_sent + host_received) / 2
+        self.samples.append((round_trip, offset))
+        return offset
+
+    @property
+    def offset(self) -> Optional[float]:
+        """Controller clock minus host clock, seconds"""
+        return min(self.samples)[1] if self.samples else None
+
+    @property
+    def uncertainty(self) -> Optional[float]:
+        """Bound on the error of ``offset``: half its sample's round trip"""
+        return min(self.samples)[0] / 2 if self.samples else None
+
+    def to_host(self, millis: int) -> Optional[float]:
+        """A controller ``millis()`` reading as ``time.perf_counter`` seconds"""
+        return millis / 1000 - self.offset if self.samples else None
+
+
+@dataclass
+class CommandResult:
+    """Outcome of one command on one controller
+
+    Times come from ``time.perf_counter``: ``sent`` when the command was
+    handed to the port, ``received`` when its final reply arrived. ``lines``
+    holds every line received in between, final reply included, and
+    ``arrivals`` the time each of them arrived. With the tagged protocol
+    the controller's own timestamps of the final reply are kept too.
+    """
+    port: str
+    command: str
+    sent: float
+    received: Optional[float] = None
+    reply: Optional[str] = None
+    lines: List[str] = field(default_factory=list)
+    arrivals: List[float] = field(default_factory=list)
+    error: Optional[str] = None
+    tag: Optional[TaggedReply] = None
+    clock_offset: Optional[float] = None    # controller clock - host clock, seconds
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from send to final reply"""
+        return self.received - self.sent if self.received is not None else None
+
+    @property
+    def round_trip(self) -> Optional[float]:
+        """Serial round trip: ``latency`` minus the time spent on the controller"""
+        if self.tag is None or self.latency is None:
+            return None
+        return self.latency - (self.tag.done - self.tag.received) / 1000
+
+    def to_host(self, millis: int) -> Optional[float]:
+        """A controller ``millis()`` reading as ``time.perf_counter`` seconds"""
+        return millis / 1000 - self.clock_offset if self.clock_offset is not None else None
+
+    @property
+    def device_sent(self) -> Optional[float]:
+        """When the controller acted on the command, on the host clock"""
+        return self.to_host(self.tag.sent) if self.tag is not None else None
+
+    @property
+    def device_done(self) -> Optional[float]:
+        """When the controller printed the final reply, on the host clock"""
+        return self.to_host(self.tag.done) if self.tag is not None else None
+
+    def summary(self) -> str:
+        outcome = "ok" if self.ok else f"FAILED ({self.error})"
+        latency = f"{self.latency * 1000:.0f} ms" if self.latency is not None else "no reply"
+        return f"[{self.port}] {self.command} -> {self.reply or '-'} in {latency} {outcome}"
+
+
+@dataclass
+class _Waiter:
+    success: Tuple[str, ...]
+    failure: Tuple[str, ...]
+    future: asyncio.Future
+    seq: Optional[int] = None
+    lines: List[str] = field(default_factory=list)
+    arrivals: List[float] = field(default_factory=list)
+    tag: Optional[TaggedReply] = None
+
+
+class ArduinoPort:
+    """One GoPro controller on a serial port, read on the running event loop
+
+    A reader task parses every line as it arrives: it updates ``state``
+    (``status``, ``wifi``, ``last_cmd``, ``last_msg``), calls ``on_line``
+    and completes whoever awaits that reply. Untagged replies carry no ID,
+    so commands on one port are serialized.
+
+    With ``tagged`` every command is sent as ``#<seq> <command>`` and its
+    replies are matched by that ID instead of by order; their controller
+    timestamps feed ``clock``. Tagged commands are not serialized, so a
+    STATUS can be sent while a START is in flight on a controller that
+    handles it without blocking. Untagged lines (unsolicited WiFi replies,
+    ``send``) work as before.
+    """
+
+    def __init__(self, port: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                 on_line: Callable[[str, str], None] = None, tagged: bool = False):
+        self.port = port
+        self.reader = reader
+        self.writer = writer
+        self.on_line = on_line
+        self.tagged = tagged
+        self.clock = ClockSync()
+        self._seq = 0
+        self.state = {"status": "OPEN", "wifi": "NO_SSID", "last_cmd": None}
+        self.error: Optional[str] = None
+        self._waiters: List[_Waiter] = []
+        self._subscribers: List[asyncio.Queue] = []
+        self._command_lock = asyncio.Lock()
+        self._reader_task = asyncio.create_task(self._read_lines())
+
+    @classmethod
+    async def open(cls, port: str, baudrate: int = BAUD, settle: float = 2.0,
+                   on_line: Callable[[str, str], None] = None, tagged: bool = False) -> 'ArduinoPort':
+        """Open ``port``; ``settle`` seconds let the board reset after opening"""
+        reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
+        if settle:
+            await asyncio.sleep(settle)
+        return cls(port, reader, writer, on_line, tagged)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state["status"] != "CLOSED"
+
+    async def _read_lines(self):
+        try:
+            while True:
+                raw = await self.reader.readline()
+                if not raw:
+                    raise ConnectionError("port closed")
+                line = raw.decode(errors="ignore").strip()
+                if line:
+                    self._handle_line(line)
+        except asyncio.CancelledError:
+            self._close_waiters("port closed")
+            raise
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            self._close_waiters(self.error)
+        finally:
+            self.state["status"] = "CLOSED"
+            for queue in self._subscribers:
+                queue.put_nowait((time.perf_counter(), None))
+
+    def _handle_line(self, line: str):
+        arrival = time.perf_counter()
+        tag = parse_tagged(line)
+        seq = tag.seq if tag is not None else None
+        reply = tag.reply if tag is not None else line
+        state = self.state
+        if reply == "READY":
+            state["status"] = "READY"
+        elif reply in SHUTTER_REPLIES:
+            state["last_cmd"] = reply
+        elif reply in WIFI_STATES:
+            state["wifi"] = reply
+        else:
+            state["last_msg"] = reply
+        if self.on_line:
+            self.on_line(self.port, line)
+
+        for queue in self._subscribers:
+            queue.put_nowait((arrival, reply))
+        for waiter in list(self._waiters):
+            if waiter.future.done() or waiter.seq != seq:
+                continue
+            waiter.lines.append(reply)
+            waiter.arrivals.append(arrival)
+            if (reply in waiter.success or reply in waiter.failure or reply == UNKNOWN_COMMAND
+                    or (tag is not None and reply == HTTP_TIMEOUT)):
+                waiter.tag = tag
+                waiter.future.set_result((arrival, reply))
+                self._waiters.remove(waiter)
+
+    def _close_waiters(self, reason: str):
+        for waiter in self._waiters:
+            if not waiter.future.done():
+                waiter.future.set_exception(ConnectionError(reason))
+        self._waiters.clear()
+
+    def _expect(self, success: Iterable[str], failure: Iterable[str] = (),
+                seq: int = None) -> _Waiter:
+        waiter = _Waiter(tuple(success), tuple(failure),
+                         asyncio.get_running_loop().create_future(), seq)
+        self._waiters.append(waiter)
+        return waiter
+
+    def next_seq(self) -> int:
+        """Sequence ID for the next tagged command, 1 to 65535"""
+        self._seq = self._seq % 65535 + 1
+        return self._seq
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue receiving ``(arrival, line)`` for every line from now on
+
+        ``line`` is None once the port has closed. Call ``unsubscribe`` when
+        done.
+        """
+        queue = asyncio.Queue()
+        if not self.is_open:
+            queue.put_nowait((time.perf_counter(), None))
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    async def send(self, line: str) -> float:
+        """Write one command line; returns its perf_counter send time"""
+        if not self.is_open:
+            raise ConnectionError(self.error or "port closed")
+        self.writer.write((line + "\n").encode())
+        sent = time.perf_counter()
+        await self.writer.drain()
+        return sent
+
+    async def wait_for(self, lines: Iterable[str], timeout: float = None) -> Tuple[float, str]:
+        """Wait for the next of the given lines; returns its arrival time and the line"""
+        waiter = self._expect(lines)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    async def prepare(self, command: str,
+                      replies: Tuple[Iterable[str], Iterable[str]] = None) -> 'PendingCommand':
+        """Reserve the port for ``command``, to be written later by ``PendingCommand.fire``
+
+        ``replies`` is the (success, failure) vocabulary, by default the
+        firmware's for that command; commands without a reply complete once
+        written, unknown ones on the firmware's refusal.
+        """
+        name = command.split(" ", 1)[0]
+        success, failure = replies or COMMAND_REPLIES.get(name, ((), (UNKNOWN_COMMAND,)))
+        if not self.tagged:
+            await self._command_lock.acquire()
+        return PendingCommand(self, command, tuple(success), tuple(failure), locked=not self.tagged)
+
+    async def command(self, command: str, timeout: float = 15.0,
+                      replies: Tuple[Iterable[str], Iterable[str]] = None) -> CommandResult:
+        """Send ``command`` and wait for its final reply (see ``prepare``)"""
+        pending = await self.prepare(command, replies)
+        pending.fire()
+        return await pending.wait(timeout)
+
+    async def status(self, timeout: float = 2.0) -> CommandResult:
+        return await self.command("STATUS", timeout)
+
+    async def start(self, timeout: float = 15.0) -> CommandResult:
+        return await self.command("START", timeout)
+
+    async def stop(self, timeout: float = 15.0) -> CommandResult:
+        return await self.command("STOP", timeout)
+
+    async def sync_clock(self, probes: int = 5, timeout: float = 2.0) -> Optional[float]:
+        """Refresh ``clock`` with tagged STATUS probes; returns the offset"""
+        if self.tagged:
+            for _ in range(probes):
+                await self.command("STATUS", timeout)
+        return self.clock.offset
+
+    async def connect_wifi(self, ssid: str, password: str, timeout: float = 20.0) -> CommandResult:
+        """Send SSID and password; completes on CONNECTED or DISCONNECTED"""
+        deadline = time.perf_counter() + timeout
+        self.state["wifi"] = "NO_SSID"
+        result = await self.command(f"SETSSID {ssid}", timeout)
+        if not result.ok:
+            return result
+        result = await self.command(f"SETPASS {password}", max(deadline - time.perf_counter(), 0.0))
+        result.command = f"SETPASS {'*' * len(password)}"
+        return result
+
+    async def close(self):
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except asyncio.CancelledError:
+            pass
+        self.writer.close()
+
+
+class PendingCommand:
+    """A command holding its port: ``fire`` writes it, ``wait`` collects the reply
+
+    ``fire`` does not yield to the event loop, so firing several pending
+    commands back to back puts them on their ports within microseconds.
+    An untagged command holds its port until ``wait`` (or ``cancel`` if
+    never fired).
+    """
+
+    def __init__(self, port: ArduinoPort, command: str,
+                 success: Tuple[str, ...], failure: Tuple[str, ...], locked: bool = True):
+        self.port = port
+        self.command = command
+        self.success = success
+        self.failure = failure
+        self.result: Optional[CommandResult] = None
+        self._waiter: Optional[_Waiter] = None
+        self._released = not locked
+
+    def fire(self) -> float:
+        """Write the command now; returns its perf_counter send time"""
+        port = self.port
+        line = self.command
+        if port.tagged:
+            seq = port.next_seq()
+            line = f"#{seq} {self.command}"
+        else:
+            seq = None
+        if self.success or self.failure:
+            self._waiter = port._expect(self.success, self.failure, seq)
+        try:
+            if not port.is_open:
+                raise ConnectionError(port.error or "port closed")
+            port.writer.write((line + "\n").encode())
+            sent = time.perf_counter()
+            self.result = CommandResult(port.port, self.command, sent)
+        except Exception as e:
+            self._forget()
+            self.result = CommandResult(port.port, self.command, time.perf_counter(),
+                                        error=str(e) or type(e).__name__)
+        return self.result.sent
+
+    async def wait(self, timeout: float = 15.0) -> CommandResult:
+        """Wait for the final reply of the fired command and release the port"""
+        try:
+            result, waiter = self.result, self._waiter
+            if result is None:
+                raise RuntimeError("command not fired")
+            if result.error is not None:
+                return result
+            await self.port.writer.drain()
+            if waiter is None:
+                return result
+            try:
+                result.received, result.reply = await asyncio.wait_for(waiter.future, timeout)
+            except asyncio.TimeoutError:
+                result.error = f"no reply within {timeout:.1f}s"
+            except ConnectionError as e:
+                result.error = str(e)
+            result.lines, result.arrivals = waiter.lines, waiter.arrivals
+            if waiter.tag is not None:
+                result.tag = waiter.tag
+                self.port.clock.add(result.sent, result.received, waiter.tag)
+                result.clock_offset = self.port.clock.offset
+            if result.reply is not None and result.reply not in self.success:
+                result.error = result.reply
+            elif HTTP_TIMEOUT in waiter.lines:
+                result.error = HTTP_TIMEOUT
+            return result
+        finally:
+            self._forget()
+            self.cancel()
+
+    def _forget(self):
+        if self._waiter is not None and self._waiter in self.port._waiters:
+            self.port._waiters.remove(self._waiter)
+
+    def cancel(self):
+        """Release the port without waiting"""
+        if not self._released:
+            self._released = True
+            self.port._command_lock.release()
+
+
+class SerialController:
+    """Every GoPro controller on one event loop, driven concurrently
+
+    Use as an async context manager: entering opens every port at once
+    (ports that fail to open are listed in ``failed``), leaving closes them.
+    ``start``/``stop``/``status`` run on all open ports at the same time and
+    return one ``CommandResult`` per port. ``tagged`` selects the tagged
+    protocol on every port (see ``ArduinoPort``).
+    """
+
+    def __init__(self, ports: Iterable[str], baudrate: int = BAUD, settle: float = 2.0,
+                 on_line: Callable[[str, str], None] = None, tagged: bool = False):
+        self.port_names = list(ports)
+        self.baudrate = baudrate
+        self.settle = settle
+        self.on_line = on_line
+        self.tagged = tagged
+        self.ports: Dict[str, ArduinoPort] = {}
+        self.failed: Dict[str, str] = {}
+
+    async def __aenter__(self) -> 'SerialController':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def __len__(self) -> int:
+        return len(self.ports)
+
+    def __iter__(self):
+        return iter(list(self.ports.values()))
+
+    async def open(self) -> Dict[str, str]:
+        """Open every port not open yet; returns the errors of those that failed"""
+        pending = [name for name in self.port_names if name not in self.ports]
+        results = await asyncio.gather(
+            *(ArduinoPort.open(name, self.baudrate, self.settle, self.on_line, self.tagged)
+              for name in pending),
+            return_exceptions=True)
+        for name, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                self.failed[name] = str(result) or type(result).__name__
+            else:
+                self.ports[name] = result
+                self.failed.pop(name, None)
+        return dict(self.failed)
+
+    async def close(self):
+        await asyncio.gather(*(port.close() for port in self.ports.values()))
+        self.ports.clear()
+
+    async def prepare(self, command: str) -> List[PendingCommand]:
+        """Reserve every open port for ``command`` (see ``ArduinoPort.prepare``)"""
+        return list(await asyncio.gather(*(port.prepare(command) for port in self)))
+
+    async def broadcast(self, command: str, timeout: float = 15.0) -> List[CommandResult]:
+        """Send ``command`` to every open port at once and wait for every reply
+
+        The command is written to all ports back to back once every port is
+        free, so their send times differ by microseconds.
+        """
+        pending = await self.prepare(command)
+        for item in pending:
+            item.fire()
+        return list(await asyncio.gather(*(item.wait(timeout) for item in pending)))
+
+    async def start(self, timeout: float = 15.0) -> List[CommandResult]:
+        return await self.broadcast("START", timeout)
+
+    async def stop(self, timeout: float = 15.0) -> List[CommandResult]:
+        return await self.broadcast("STOP", timeout)
+
+    async def status(self, timeout: float = 2.0) -> List[CommandResult]:
+        return await self.broadcast("STATUS", timeout)
+
+    async def sync_clocks(self, probes: int = 5, timeout: float = 2.0) -> Dict[str, Optional[float]]:
+        """Refresh every port's clock offset at once (tagged protocol only)"""
+        offsets = await asyncio.gather(*(port.sync_clock(probes, timeout) for port in self))
+        return dict(zip(self.ports, offsets))
+
+    def states(self) -> Dict[str, dict]:
+        return {name: dict(port.state) for name, port in self.ports.items()}
@@ -0,0 +1,169 @@
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple, Union
+import asyncio
+import json
+import time
+from .http_controller import HttpController
+from .serial_controller import CommandResult, SerialController
+
+
+@dataclass
+class DeviceTiming:
+    """Send and reply times of one device in one take (``time.perf_counter`` seconds)"""
+    device: str
+    kind: str                       # "gopro" or "dot"
+    sent: float
+    replied: Optional[float] = None
+    reply: Optional[str] = None
+    error: Optional[str] = None
+    events: List[Tuple[float, str]] = field(default_factory=list)  # every reply line
+    # Tagged protocol only, on the host clock: when the controller sent the
+    # request to the camera and when it got the response
+    camera_sent: Optional[float] = None
+    camera_replied: Optional[float] = None
+    clock_offset: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Seconds from send to final reply"""
+        return self.replied - self.sent if self.replied is not None else None
+
+
+@dataclass
+class TakeReport:
+    """Timing of one synchronized START or STOP across every camera and sensor
+
+    ``fired`` is when the trigger began writing (``time.perf_counter``) and
+    ``host_time`` the same instant as ``time.time()``. Skews are the spread
+    between the first and last device, in seconds.
+    """
+    take: int
+    command: str
+    fired: float
+    host_time: float
+    devices: List[DeviceTiming] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(device.ok for device in self.devices)
+
+    @property
+    def failed(self) -> List[DeviceTiming]:
+        return [device for device in self.devices if not device.ok]
+
+    @property
+    def send_skew(self) -> float:
+        sent = [device.sent for device in self.devices]
+        return max(sent) - min(sent) if sent else 0.0
+
+    @property
+    def reply_skew(self) -> Optional[float]:
+        replied = [device.replied for device in self.devices if device.ok]
+        return max(replied) - min(replied) if replied else None
+
+    @property
+    def camera_skew(self) -> Optional[float]:
+        """Spread of the instants the cameras were sent the command (tagged protocol)"""
+        sent = [device.camera_sent for device in self.devices
+                if device.ok and device.camera_sent is not None]
+        return max(sent) - min(sent) if sent else None
+
+    def summary(self) -> str:
+        """One line per device with its send offset, latency and reply"""
+        ok = len(self.devices) - len(self.failed)
+        reply_skew = f"{self.reply_skew * 1000:.1f} ms" if self.reply_skew is not None else "-"
+        header = (f"take {self.take} {self.command}: {ok}/{len(self.devices)} ok, "
+                  f"send skew {self.send_skew * 1000:.3f} ms, reply skew {reply_skew}")
+        if self.camera_skew is not None:
+            header += f", camera skew {self.camera_skew * 1000:.1f} ms"
+        lines = [header]
+        for device in self.devices:
+            offset = (device.sent - self.fired) * 1000
+            latency = f"{device.latency * 1000:8.1f} ms" if device.latency is not None else "   no reply"
+            outcome = device.reply or "-"
+            if not device.ok:
+                outcome += f" FAILED ({device.error})"
+            if device.camera_sent is not None:
+                outcome += f"  (camera +{(device.camera_sent - self.fired) * 1000:.1f} ms)"
+            lines.append(f"  {device.kind:<5} {device.device:<20} sent +{offset:.3f} ms, "
+                         f"reply {latency}  {outcome}")
+        return "\n".join(lines)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form, with the derived latencies and skews"""
+        entry = asdict(self)
+        for device, timing in zip(entry['devices'], self.devices):
+            device['latency'] = timing.latency
+        entry['send_skew'] = self.send_skew
+        entry['reply_skew'] = self.reply_skew
+        entry['camera_skew'] = self.camera_skew
+        return entry
+
+
+def _camera_timing(result: CommandResult) -> DeviceTiming:
+    return DeviceTiming(result.port, "gopro", result.sent, result.received, result.reply,
+                        result.error, list(zip(result.arrivals, result.lines)),
+                        result.device_sent, result.device_done, result.clock_offset)
+
+
+class SyncTrigger:
+    """Starts and stops every GoPro controller and Movella DOT sensor together
+
+    ``cameras`` is a ``SerialController`` or an ``HttpController``. Every
+    camera is reserved first, so nothing is in flight when the trigger
+    fires. The commands are then written to all cameras back to back
+    without yielding to the event loop, and the sensors' MESSAGE_CONTROL
+    writes are issued on the same loop right after; every DOT sensor gets
+    the same UTC start second. Each send and final reply is timestamped and
+    every take produces a ``TakeReport``, appended as one JSON line to
+    ``log_path`` when given.
+    """
+
+    def __init__(self, cameras: Union[SerialController, HttpController] = None, fleet=None,
+                 duration_seconds: int = 3600, timeout: float = 15.0, log_path: str = None):
+        self.cameras = cameras
+        self.fleet = fleet
+        self.duration_seconds = duration_seconds
+        self.timeout = timeout
+        self.log_path = log_path
+        self.takes: List[TakeReport] = []
+
+    async def start(self) -> TakeReport:
+        return await self._trigger("START")
+
+    async def stop(self) -> TakeReport:
+        return await self._trigger("STOP")
+
+    async def _trigger(self, command: str) -> TakeReport:
+        pending = await self.cameras.prepare(command) if self.cameras is not None else []
+
+        fired = time.perf_counter()
+        host_time = time.time()
+        for item in pending:
+            item.fire()
+        fleet_task = None
+        if self.fleet is not None:
+            if command == "START":
+                operation = self.fleet.start_recording(self.duration_seconds, int(host_time))
+            else:
+                operation = self.fleet.stop_recording()
+            fleet_task = asyncio.ensure_future(operation)
+
+        camera_results = await asyncio.gather(*(item.wait(self.timeout) for item in pending))
+        report = TakeReport(len(self.takes) + 1, command, fired, host_time,
+                            [_camera_timing(result) for result in camera_results])
+        if fleet_task is not None:
+            for result in (await fleet_task).results:
+                report.devices.append(DeviceTiming(
+                    result.name or result.address, "dot", result.started,
+                    result.started + result.elapsed if result.ok else None,
+                    "WRITTEN" if result.ok else None, result.error))
+        self.takes.append(report)
+        if self.log_path:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(report.to_dict()) + "\n")
+        return report
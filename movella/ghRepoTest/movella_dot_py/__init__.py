@@ -1,7 +1,8 @@
-from .models.enums import OutputRate, FilterProfile, PayloadMode
+from .models.enums import OutputRate, FilterProfile, PayloadMode, SensorState
 from .models.data_structures import SensorConfiguration, DeviceInfo
 from .core.sensor import MovellaDOTSensor
+from .core.fleet import MovellaDOTFleet
 
 __version__ = "1.0.0"
-__all__ = ['OutputRate', 'FilterProfile', 'PayloadMode', 
-           'SensorConfiguration', 'DeviceInfo', 'MovellaDOTSensor']
\ No newline at end of file
+__all__ = ['OutputRate', 'FilterProfile', 'PayloadMode', 'SensorState',
+           'SensorConfiguration', 'DeviceInfo', 'MovellaDOTSensor', 'MovellaDOTFleet']
\ No newline at end of file
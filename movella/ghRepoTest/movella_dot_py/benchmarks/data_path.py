@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from movella_dot_py.benchmarks.parser_throughput import make_packets
+from movella_dot_py.core.collector import HOST_TIME_FIELD, SensorDataCollector
+from movella_dot_py.core.fleet import MovellaDOTFleet
+from movella_dot_py.core.loss import LossTracker
+from movella_dot_py.core.parser import PAYLOAD_FIELDS, PayloadParser
+from movella_dot_py.core.sensor import MovellaDOTSensor
+from movella_dot_py.core.simulator import DOTSimulator, SimulationOptions
+from movella_dot_py.models.data_structures import SensorConfiguration
+from movella_dot_py.models.enums import OutputRate, PayloadMode
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+PARSE_SIZES = (1_000, 10_000, 100_000)
+SENSOR_COUNTS = (1, 5, 20)
+# Distinct packets fed in turn to the per-packet benchmarks
+POOL_SIZE = 4096
+OUTPUT_RATE = 120
+# Fraction of samples missing from the synthetic captures
+LOSS = 0.005
+
+# Collector getters and the column each one needs
+GETTERS = {
+    'get_timestamps': 'timestamp',
+    'get_unwrapped_timestamps': 'timestamp',
+    'get_host_receive_times': 'timestamp',
+    'get_host_timestamps': 'timestamp',
+    'get_quaternions': 'quaternion',
+    'get_euler_angles': 'euler_angles',
+    'get_accelerations': 'acceleration',
+    'get_free_accelerations': 'free_acceleration',
+    'get_angular_velocities': 'angular_velocity',
+    'get_magnetic_fields': 'magnetic_field',
+    'get_status_values': 'status',
+    'get_acc_clipping_counts': 'clipping_acc',
+    'get_gyr_clipping_counts': 'clipping_gyr',
+}
+
+
+def measure(func, setup=None, repeat: int = 3) -> dict:
+    """Best time of ``func(setup())`` over ``repeat`` runs, then its memory in one traced run
+
+    ``setup`` is not timed nor traced. ``peak_bytes`` is the largest amount
+    of memory allocated while ``func`` ran, ``retained_bytes`` what its
+    result still holds (e.g. a filled collector); NumPy buffers included.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        func(state)
+        best = min(best, time.perf_counter() - start)
+        del state
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    try:
+        result = func(state)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result, state
+    return {'seconds': best, 'peak_bytes': peak, 'retained_bytes': retained}
+
+
+def synthetic_columns(payload_mode: PayloadMode, samples: int, seed: int = 0) -> dict:
+    """Decoded columns of a capture at ``OUTPUT_RATE`` Hz with wraps and lost samples"""
+    rng = np.random.default_rng(seed)
+    parser = PayloadParser(payload_mode)
+    pool = parser.parse_batch(b''.join(make_packets(parser, POOL_SIZE, seed)))
+    sequence = np.flatnonzero(rng.random(int(samples * (1 + 2 * LOSS)) + 16) >= LOSS)[:samples]
+    period_us = 1e6 / OUTPUT_RATE
+    origin = int(rng.integers(1 << 32))
+    columns = {name: np.resize(pool[name], (samples,) + pool[name].shape[1:])
+               for name in PAYLOAD_FIELDS[payload_mode]}
+    columns['timestamp'] = ((origin + np.rint(sequence * period_us).astype(np.int64))
+                            & 0xFFFFFFFF).astype(np.uint32)
+    columns[HOST_TIME_FIELD] = (1.7e9 + sequence / OUTPUT_RATE + 0.02
+                                + rng.uniform(0, 0.01, samples))
+    return columns
+
+
+def filled_collector(payload_mode: PayloadMode, columns: dict,
+                     address: str = None) -> SensorDataCollector:
+    collector = SensorDataCollector(payload_mode, address, capacity=len(columns['timestamp']))
+    collector.add_columns(columns)
+    return collector
+
+
+def getter_modes():
+    """Fewest payload modes that carry the column of every getter, with their getters"""
+    remaining = dict(GETTERS)
+    plan = []
+    while remaining:
+        mode = max(PAYLOAD_FIELDS, key=lambda m: sum(f in PAYLOAD_FIELDS[m] for f in remaining.values()))
+        covered = [getter for getter, name in remaining.items() if name in PAYLOAD_FIELDS[mode]]
+        plan.append((mode, covered))
+        for getter in covered:
+            del remaining[getter]
+    return plan
+
+
+def bench_parse(sizes, repeat):
+    for mode in PAYLOAD_FIELDS:
+        parser = PayloadParser(mode)
+        pool = make_packets(parser, POOL_SIZE)
+        for samples in sizes:
+            def run(_):
+                parse = parser.parse
+                for i in range(samples):
+                    parse(pool[i % POOL_SIZE])
+            yield {'benchmark': 'parse', 'mode': mode.name, 'samples': samples,
+                   **measure(run, repeat=repeat)}
+
+
+def bench_add_data(payload_mode, sizes, repeat):
+    pool = make_packets(PayloadParser(payload_mode), POOL_SIZE)
+    for samples in sizes:
+        def run(_):
+            collector = SensorDataCollector(payload_mode)
+            add_data = collector.add_data
+            host_time = 1.7e9
+            for i in range(samples):
+                add_data(pool[i % POOL_SIZE], host_time)
+            return collector
+        yield {'benchmark': 'add_data', 'mode': payload_mode.name, 'samples': samples,
+               **measure(run, repeat=repeat)}
+
+
+def bench_getters(sizes, repeat):
+    for mode, getters in getter_modes():
+        for samples in sizes:
+            columns = synthetic_columns(mode, samples)
+            shared = filled_collector(mode, columns)
+            for getter in getters:
+                if getter == 'get_host_timestamps':
+                    # The clock fit is cached: time a first call on a fresh collector
+                    def setup(columns=columns):
+                        return filled_collector(mode, columns)
+                else:
+                    def setup(shared=shared):
+                        return shared
+                yield {'benchmark': getter, 'mode': mode.name, 'samples': samples,
+                       **measure(lambda collector: getattr(collector, getter)(), setup, repeat)}
+            del columns, shared
+
+
+def bench_collected_data(payload_mode, sizes, sensor_counts, max_rows, repeat):
+    for sensors in sensor_counts:
+        for samples in sizes:
+            if sensors * samples > max_rows:
+                continue
+            columns = synthetic_columns(payload_mode, samples)
+
+            def setup(columns=columns):
+                fleet = []
+                for index in range(sensors):
+                    sensor = MovellaDOTSensor(SensorConfiguration(OutputRate.RATE_120,
+                                                                  payload_mode=payload_mode))
+                    sensor.data_collector = filled_collector(payload_mode, columns, f"sensor{index}")
+                    sensor.loss_tracker = LossTracker(sensor.data_collector, OUTPUT_RATE)
+                    fleet.append(sensor)
+                return fleet
+
+            def run(fleet):
+                return [sensor.get_collected_data() for sensor in fleet]
+
+            yield {'benchmark': 'get_collected_data', 'mode': payload_mode.name,
+                   'samples': samples, 'sensors': sensors, **measure(run, setup, repeat)}
+            del columns
+
+
+async def _stream(payload_mode, sensors, packets):
+    """Stream ``packets`` per sensor from a fleet of simulated sensors at full speed"""
+    simulator = DOTSimulator(count=sensors, options=SimulationOptions(speed=0, seed=1))
+    config = SensorConfiguration(OutputRate.RATE_120, payload_mode=payload_mode)
+    # Bring-up and configuration print their progress
+    with contextlib.redirect_stdout(io.StringIO()):
+        fleet = MovellaDOTFleet(simulator.addresses, config, client_factory=simulator,
+                                read_info=False)
+        await fleet.connect()
+    try:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await fleet.start_measurement()
+        while min(sensor.data_collector.size for sensor in fleet) < packets:
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - start
+        with contextlib.redirect_stdout(io.StringIO()):
+            await fleet.stop_measurement()
+        received = sum(sensor.data_collector.size for sensor in fleet)
+        callback = max((sensor.metrics().callback_time for sensor in fleet), key=lambda s: s.p99)
+        return received, elapsed, callback
+    finally:
+        with contextlib.redirect_stdout(io.StringIO()):
+            await fleet.disconnect()
+
+
+def bench_end_to_end(payload_mode, sensor_counts, packets, repeat):
+    """Simulated notifications through the fleet, handler and collector
+
+    The packets/s include building the packets in the simulator; the
+    callback times are those of the notification handler alone (slowest
+    sensor by p99).
+    """
+    for sensors in sensor_counts:
+        runs = []
+
+        def run(_):
+            runs.append(asyncio.run(_stream(payload_mode, sensors, packets)))
+
+        result = measure(run, repeat=repeat)
+        received, elapsed, callback = min(runs[:-1] or runs, key=lambda r: r[1])
+        yield {'benchmark': 'end_to_end', 'mode': payload_mode.name, 'samples': packets,
+               'sensors': sensors, **result, 'seconds': elapsed, 'packets': received,
+               'packets_per_second': received / elapsed,
+               'callback_p50_ms': callback.p50, 'callback_p99_ms': callback.p99}
+
+
+def _key(entry: dict) -> tuple:
+    return (entry['benchmark'], entry['mode'], entry['samples'], entry.get('sensors'))
+
+
+def compare(results: list, baseline_path: str, tolerance: float) -> list:
+    """Entries at least ``tolerance`` slower or hungrier than in the baseline file"""
+    with open(baseline_path) as f:
+        baseline = {_key(entry): entry for entry in json.load(f)['results']}
+    regressions = []
+    for entry in results:
+        old = baseline.get(_key(entry))
+        if old is None:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            if old[metric] > 0 and entry[metric] > old[metric] * (1 + tolerance):
+                regressions.append((entry, metric, old[metric], entry[metric]))
+    return regressions
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def format_entry(entry: dict) -> str:
+    label = entry['benchmark'] + (f" x{entry['sensors']}" if 'sensors' in entry else '')
+    rate = entry['samples'] * entry.get('sensors', 1) / entry['seconds'] if entry['seconds'] else 0
+    return (f"{label:<30}{entry['mode']:<28}{entry['samples']:>11,}{entry['seconds'] * 1000:>12.2f}"
+            f"{rate:>17,.0f}{entry['peak_bytes'] / 2**20:>11.1f}{entry['retained_bytes'] / 2**20:>11.1f}")
+
+
+def parse_sizes(text: str):
+    return tuple(int(float(size)) for size in text.split(','))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and peak memory of the parse -> collect -> export data path")
+    parser.add_argument('--sizes', type=parse_sizes, default=SIZES,
+                        help="samples for add_data, the getters and get_collected_data (e.g. 1e3,1e5)")
+    parser.add_argument('--parse-sizes', type=parse_sizes, default=PARSE_SIZES,
+                        help="packets for parse in every payload mode")
+    parser.add_argument('--sensors', type=parse_sizes, default=SENSOR_COUNTS,
+                        help="fleet sizes for get_collected_data and end_to_end")
+    parser.add_argument('--mode', default=PayloadMode.CUSTOM_MODE_5.name,
+                        choices=[mode.name for mode in PAYLOAD_FIELDS],
+                        help="payload mode of add_data, get_collected_data and end_to_end")
+    parser.add_argument('--packets', type=int, default=20000,
+                        help="packets per sensor in end_to_end")
+    parser.add_argument('--max-rows', type=int, default=20_000_000,
+                        help="skip get_collected_data runs holding more samples in total")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', default=None,
+                        choices=['parse', 'add_data', 'getters', 'collected_data', 'end_to_end'])
+    parser.add_argument('--quick', action='store_true',
+                        help="sizes up to 1e5, one repeat, 2000 packets per sensor")
+    parser.add_argument('--output', default='data_path_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', default=None,
+                        help="results file of an earlier run to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="relative slowdown or memory growth reported as a regression")
+    args = parser.parse_args()
+    if args.quick:
+        args.sizes = tuple(size for size in args.sizes if size <= 100_000)
+        args.parse_sizes = tuple(size for size in args.parse_sizes if size <= 100_000)
+        args.repeat = 1
+        args.packets = 2000
+
+    mode = PayloadMode[args.mode]
+    suites = {
+        'parse': lambda: bench_parse(args.parse_sizes, args.repeat),
+        'add_data': lambda: bench_add_data(mode, args.sizes, args.repeat),
+        'getters': lambda: bench_getters(args.sizes, args.repeat),
+        'collected_data': lambda: bench_collected_data(mode, args.sizes, args.sensors,
+                                                       args.max_rows, args.repeat),
+        'end_to_end': lambda: bench_end_to_end(mode, args.sensors, args.packets, args.repeat),
+    }
+
+    header = (f"{'Benchmark':<30}{'Mode':<28}{'Samples':>11}{'Time (ms)':>12}"
+              f"{'Samples/s':>17}{'Peak MB':>11}{'Kept MB':>11}")
+    print(header)
+    print('-' * len(header))
+    results = []
+    for name, suite in suites.items():
+        if args.only and name not in args.only:
+            continue
+        for entry in suite():
+            results.append(entry)
+            print(format_entry(entry), flush=True)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'settings': {'repeat': args.repeat, 'pool_size': POOL_SIZE, 'output_rate': OUTPUT_RATE,
+                     'loss': LOSS, 'packets': args.packets},
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for entry, metric, old, new in regressions:
+            print(f"REGRESSION {entry['benchmark']} {entry['mode']} {entry['samples']}"
+                  f"{' x' + str(entry['sensors']) if 'sensors' in entry else ''}: "
+                  f"{metric} {old:.6g} -> {new:.6g} (+{(new / old - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
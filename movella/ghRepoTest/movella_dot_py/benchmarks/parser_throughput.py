@@ -0,0 +1,84 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from movella_dot_py.core.parser import PayloadParser, PAYLOAD_FIELDS
+from movella_dot_py.core.collector import SensorDataCollector
+
+
+def make_packets(parser: PayloadParser, count: int, seed: int = 0):
+    """Build ``count`` well-formed packets with random finite values"""
+    rng = random.Random(seed)
+    plan = parser.plan
+    packets = []
+    for i in range(count):
+        values = []
+        for name in parser.dtype.names:
+            start, stop = plan.slices[name]
+            for _ in range(stop - start):
+                if name == 'timestamp':
+                    values.append(i * 8333)
+                elif name == 'magnetic_field':
+                    values.append(rng.randint(-32768, 32767))
+                elif name == 'status':
+                    values.append(rng.randint(0, 0xFFFF))
+                elif name.startswith('clipping'):
+                    values.append(rng.randint(0, 255))
+                else:
+                    values.append(rng.uniform(-10.0, 10.0))
+        packets.append(plan.struct.pack(*values))
+    return packets
+
+
+def rate(func, packets, repeat: int) -> float:
+    """Best packets-per-second rate of ``func`` over ``repeat`` runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(packets)
+        best = min(best, time.perf_counter() - start)
+    return len(packets) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-packet parser throughput for every payload mode")
+    parser.add_argument('--packets', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    header = f"{'Payload mode':<28}{'parse':>12}{'parse_record':>14}{'speedup':>9}{'add_data':>12}{'compat':>12}"
+    print(f"Packets per second ({args.packets} packets, best of {args.repeat})")
+    print(header)
+    print('-' * len(header))
+    for mode in PAYLOAD_FIELDS:
+        payload_parser = PayloadParser(mode)
+        packets = make_packets(payload_parser, args.packets)
+
+        def run_parse(items):
+            for packet in items:
+                payload_parser.parse(packet)
+
+        def run_record(items):
+            for packet in items:
+                payload_parser.parse_record(packet)
+
+        def run_collector(items, store_objects=False):
+            collector = SensorDataCollector(mode, store_objects=store_objects)
+            for packet in items:
+                collector.add_data(packet)
+
+        parse_rate = rate(run_parse, packets, args.repeat)
+        record_rate = rate(run_record, packets, args.repeat)
+        collector_rate = rate(run_collector, packets, args.repeat)
+        compat_rate = rate(lambda items: run_collector(items, True), packets, args.repeat)
+        print(f"{mode.name:<28}{parse_rate:>12,.0f}{record_rate:>14,.0f}"
+              f"{record_rate / parse_rate:>8.1f}x{collector_rate:>12,.0f}{compat_rate:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
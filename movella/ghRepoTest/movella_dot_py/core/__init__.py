@@ -1,5 +1,26 @@
 from .parser import PayloadParser
 from .collector import SensorDataCollector
 from .sensor import MovellaDOTSensor
+from .display import LiveConsoleView
+from .recorder import BinaryRecorder, RecordedLog, read_log
+from .metrics import MetricsSnapshot, SensorMetrics
+from .loss import LossIndex, LossTracker, build_loss_index
+from .alignment import AlignedData, align_collectors
+from .session import Session, SessionSensor, SessionWriter, save_session
+from .connection import RetryPolicy, BringUpReport, connect_sensors
+from .discovery import DiscoveryCache, discover_sensors, scan_for_sensors
+from .simulator import DOTSimulator, SimulatedDOTClient, SimulationOptions
+from .exporter import ExportReport, RecordingExporter, RecordingFile, export_recordings
+from .fleet import MovellaDOTFleet, FleetOperationReport, OperationResult, ScheduledStart
 
-__all__ = ['PayloadParser', 'SensorDataCollector', 'MovellaDOTSensor']
\ No newline at end of file
+__all__ = ['PayloadParser', 'SensorDataCollector', 'MovellaDOTSensor', 'LiveConsoleView',
+           'BinaryRecorder', 'RecordedLog', 'read_log',
+           'MetricsSnapshot', 'SensorMetrics',
+           'LossIndex', 'LossTracker', 'build_loss_index',
+           'AlignedData', 'align_collectors',
+           'Session', 'SessionSensor', 'SessionWriter', 'save_session',
+           'RetryPolicy', 'BringUpReport', 'connect_sensors',
+           'DiscoveryCache', 'discover_sensors', 'scan_for_sensors',
+           'DOTSimulator', 'SimulatedDOTClient', 'SimulationOptions',
+           'ExportReport', 'RecordingExporter', 'RecordingFile', 'export_recordings',
+           'MovellaDOTFleet', 'FleetOperationReport', 'OperationResult', 'ScheduledStart']
\ No newline at end of file
@@ -0,0 +1,188 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+import numpy as np
+from .collector import SensorDataCollector
+from .parser import field_components
+
+# Fields that can be resampled, in output order. Quaternions are slerped,
+# Euler angles are interpolated on their unwrapped angle, the rest linearly.
+ALIGNABLE_FIELDS = ('quaternion', 'euler_angles', 'free_acceleration', 'acceleration',
+                    'angular_velocity', 'magnetic_field')
+QUATERNION_FIELDS = ('quaternion', 'delta_q')
+
+
+@dataclass
+class AlignedData:
+    """Several sensors resampled onto one time grid
+
+    ``data[t, s, c]`` is channel ``channels[c]`` of sensor ``sensors[s]`` at
+    ``times[t]``; it is NaN and ``mask[t, s]`` is False wherever the sensor
+    had no samples close enough on both sides of the grid point.
+    """
+    times: np.ndarray           # (T,) seconds, host clock unless device time was used
+    data: np.ndarray            # (T, S, C)
+    mask: np.ndarray            # (T, S) True where data is valid
+    sensors: List[str]
+    channels: List[str]         # flattened labels, e.g. quaternion_w
+    fields: Dict[str, slice]    # channel range of every resampled field
+
+    def field(self, name: str) -> np.ndarray:
+        """(T, S, components) view of one resampled field"""
+        return self.data[:, :, self.fields[name]]
+
+    def sensor(self, key: str) -> np.ndarray:
+        """(T, C) view of one sensor"""
+        return self.data[:, self.sensors.index(key), :]
+
+    def coverage(self) -> Dict[str, float]:
+        """Fraction of valid grid points per sensor"""
+        return {key: float(self.mask[:, index].mean()) if len(self.mask) else 0.0
+                for index, key in enumerate(self.sensors)}
+
+
+def _sensor_times(collectors: Dict[str, SensorDataCollector]) -> Dict[str, np.ndarray]:
+    """Host-aligned sample times in seconds, or device seconds when no sensor has host times
+
+    Raises ``ValueError`` when only some sensors have host times, as the two
+    time bases cannot be put on one grid.
+    """
+    times = {key: collector.get_host_timestamps() for key, collector in collectors.items()}
+    without_host = [key for key, t in times.items() if len(t) and np.isnan(t).all()]
+    if not without_host:
+        return times
+    if len(without_host) < sum(1 for t in times.values() if len(t)):
+        raise ValueError(f"Sensors {', '.join(without_host)} have no host times "
+                         "while the others do; cannot mix device and host time")
+    return {key: collector.get_unwrapped_timestamps() / 1e6
+            for key, collector in collectors.items()}
+
+
+def interpolation_weights(times: np.ndarray, grid: np.ndarray,
+                          max_gap: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Left sample index, weight of the right sample and validity of every grid point
+
+    Grid points outside the samples or between two samples further apart
+    than ``max_gap`` seconds are invalid, as is everything when there are
+    fewer than two samples.
+    """
+    count = len(times)
+    if count < 2:
+        return (np.zeros(len(grid), dtype=np.intp), np.zeros(len(grid)),
+                np.zeros(len(grid), dtype=bool))
+    left = np.searchsorted(times, grid, side='right') - 1
+    valid = (left >= 0) & (left < count - 1)
+    at_end = grid == times[-1]
+    left = np.clip(left, 0, count - 2)
+    left[at_end] = count - 2
+    spacing = times[left + 1] - times[left]
+    valid = (valid & (spacing <= max_gap) & (spacing > 0)) | at_end
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(spacing > 0, (grid - times[left]) / spacing, 0.0)
+    return left, np.clip(weight, 0.0, 1.0), valid
+
+
+def lerp(values: np.ndarray, left: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Vectorized linear interpolation between rows ``left`` and ``left + 1``"""
+    start = values[left].astype(np.float64)
+    return start + weight[:, None] * (values[left + 1] - start)
+
+
+def slerp(quaternions: np.ndarray, left: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    """Vectorized spherical interpolation between rows ``left`` and ``left + 1``
+
+    Takes the shorter arc and falls back to normalized linear interpolation
+    for nearly identical rotations.
+    """
+    q0 = quaternions[left].astype(np.float64)
+    q1 = quaternions[left + 1].astype(np.float64)
+    q0 /= np.linalg.norm(q0, axis=1, keepdims=True)
+    q1 /= np.linalg.norm(q1, axis=1, keepdims=True)
+    dot = np.einsum('ij,ij->i', q0, q1)
+    q1[dot < 0] *= -1
+    dot = np.clip(np.abs(dot), 0.0, 1.0)
+    theta = np.arccos(dot)
+    sin_theta = np.sin(theta)
+    close = sin_theta < 1e-6
+    safe_sin = np.where(close, 1.0, sin_theta)
+    w0 = np.where(close, 1.0 - weight, np.sin((1.0 - weight) * theta) / safe_sin)
+    w1 = np.where(close, weight, np.sin(weight * theta) / safe_sin)
+    result = w0[:, None] * q0 + w1[:, None] * q1
+    result /= np.linalg.norm(result, axis=1, keepdims=True)
+    return result
+
+
+def _resample_field(name: str, values: np.ndarray, left: np.ndarray,
+                    weight: np.ndarray) -> np.ndarray:
+    if name in QUATERNION_FIELDS:
+        return slerp(values, left, weight)
+    if name == 'euler_angles':
+        unwrapped = np.rad2deg(np.unwrap(np.deg2rad(values.astype(np.float64)), axis=0))
+        return (lerp(unwrapped, left, weight) + 180.0) % 360.0 - 180.0
+    return lerp(values, left, weight)
+
+
+def align_collectors(collectors: Union[Dict[str, SensorDataCollector], Sequence[SensorDataCollector]],
+                     rate: float = 120.0, fields: Iterable[str] = None,
+                     start: float = None, end: float = None, max_gap: float = None,
+                     gap_factor: float = 1.5, dtype=np.float32) -> AlignedData:
+    """Resample several collectors onto one shared time grid
+
+    The grid runs at ``rate`` Hz from ``start`` to ``end`` (by default the
+    earliest and latest sample of any sensor) on the host-aligned timeline
+    of ``get_host_timestamps``. ``fields`` defaults to the alignable fields
+    every collector carries. Grid points are masked, not interpolated, where
+    consecutive samples are more than ``max_gap`` seconds apart (by default
+    ``gap_factor`` times the sensor's median sample spacing), so lost
+    packets and disconnections show up as holes. Without host times on any
+    sensor the device timeline is used; ``ValueError`` when only some have them.
+    """
+    if not isinstance(collectors, dict):
+        collectors = {collector.mac_address or str(index): collector
+                      for index, collector in enumerate(collectors)}
+    if not collectors:
+        raise ValueError("No collectors to align")
+    if rate <= 0:
+        raise ValueError("rate must be positive")
+    if fields is None:
+        common = set.intersection(*(set(c.fields) for c in collectors.values()))
+        fields = [name for name in ALIGNABLE_FIELDS if name in common]
+    else:
+        fields = list(fields)
+        for key, collector in collectors.items():
+            missing = [name for name in fields if name not in collector.fields]
+            if missing:
+                raise ValueError(f"Sensor {key} does not carry {', '.join(missing)}")
+
+    times = _sensor_times(collectors)
+    non_empty = [t for t in times.values() if len(t)]
+    if start is None:
+        start = min((t[0] for t in non_empty), default=0.0)
+    if end is None:
+        end = max((t[-1] for t in non_empty), default=start)
+    grid = start + np.arange(int(np.floor((end - start) * rate + 1e-9)) + 1) / rate
+
+    channels, field_slices = [], {}
+    for name in fields:
+        labels = field_components(name)
+        field_slices[name] = slice(len(channels), len(channels) + len(labels))
+        channels.extend(labels)
+
+    data = np.full((len(grid), len(collectors), len(channels)), np.nan, dtype=dtype)
+    mask = np.zeros((len(grid), len(collectors)), dtype=bool)
+    for index, (key, collector) in enumerate(collectors.items()):
+        sensor_times = times[key]
+        if len(sensor_times) < 2:
+            continue
+        sensor_gap = max_gap
+        if sensor_gap is None:
+            spacing = np.diff(sensor_times)
+            sensor_gap = gap_factor * float(np.median(spacing)) if len(spacing) else 0.0
+        left, weight, valid = interpolation_weights(sensor_times, grid, sensor_gap)
+        mask[:, index] = valid
+        rows = np.flatnonzero(valid)
+        if not len(rows):
+            continue
+        for name in fields:
+            resampled = _resample_field(name, collector.get_column(name), left[rows], weight[rows])
+            data[rows, index, field_slices[name]] = resampled
+    return AlignedData(grid, data, mask, list(collectors), channels, field_slices)
@@ -1,54 +1,320 @@
-from typing import List
+from typing import Dict, List, Optional
+import time
 import numpy as np
 from ..models.enums import PayloadMode
-from ..models.data_structures import SensorData
-from .parser import PayloadParser
+from ..models.data_structures import DataGap, SensorData
+from .parser import PayloadParser, PAYLOAD_FIELDS, MAGNETIC_FIELD_SCALE
+from .timebase import ClockModel, TimestampUnwrapper, unwrap_timestamps
+
+# Host receive time (time.time()) of every sample, stored next to the payload fields
+HOST_TIME_FIELD = 'host_time'
+
+# Column dtype and per-sample shape for every SensorData field
+COLUMN_SPECS = {
+    'timestamp': (np.int64, ()),
+    'quaternion': (np.float32, (4,)),
+    'euler_angles': (np.float32, (3,)),
+    'free_acceleration': (np.float32, (3,)),
+    'acceleration': (np.float32, (3,)),
+    'angular_velocity': (np.float32, (3,)),
+    'magnetic_field': (np.float32, (3,)),
+    'delta_q': (np.float32, (4,)),
+    'delta_v': (np.float32, (3,)),
+    'status': (np.uint16, ()),
+    'clipping_acc': (np.uint8, ()),
+    'clipping_gyr': (np.uint8, ()),
+    HOST_TIME_FIELD: (np.float64, ()),
+}
+
+
+def _field_value(name: str, value):
+    """Convert a SensorData field into the values stored in its column"""
+    if name == 'timestamp':
+        return value.microseconds
+    if name == 'status':
+        return value.value
+    if name in ('clipping_acc', 'clipping_gyr'):
+        return value
+    if name in ('quaternion', 'delta_q'):
+        return (value.w, value.x, value.y, value.z)
+    if name == 'euler_angles':
+        return (value.roll, value.pitch, value.yaw)
+    return (value.x, value.y, value.z)
+
 
 class SensorDataCollector:
-    """Collects and stores sensor data"""
-    
-    def __init__(self, payload_mode: PayloadMode, mac_address: str = None):  
+    """Collects and stores sensor data
+
+    Samples are stored column-wise: one preallocated NumPy array per field
+    carried by the payload mode, grown geometrically when full. The getters
+    return views onto that storage, so they are O(1); copy them if they must
+    survive a later ``clear()``.
+
+    Pass ``store_objects=True`` to also keep the parsed ``SensorData``
+    objects in ``self.data`` (compatibility mode, much more memory).
+
+    ``gaps`` lists the outages marked with ``begin_gap``; each one is closed
+    by the first sample stored after it.
+
+    The host receive time of every sample is stored in the ``host_time``
+    column. ``clock`` fits the sensor clock against it, so
+    ``get_host_timestamps`` can give every sample a host-aligned time.
+    """
+
+    INITIAL_CAPACITY = 1024
+    GROWTH_FACTOR = 2
+
+    def __init__(self, payload_mode: PayloadMode, mac_address: str = None,
+                 store_objects: bool = False, capacity: int = INITIAL_CAPACITY):
         self.parser = PayloadParser(payload_mode)
-        self.data: List[SensorData] = []
+        self.payload_mode = payload_mode
         self.mac_address = mac_address
-        
-    def add_data(self, raw_data: bytes):
-        """Parse and add new sensor data"""
-        parsed_data = self.parser.parse(raw_data)
-        self.data.append(parsed_data)
-    
+        self.fields = PAYLOAD_FIELDS.get(payload_mode, ())
+        self.stored_fields = self.fields + (HOST_TIME_FIELD,)
+        self.data: Optional[List[SensorData]] = [] if store_objects else None
+        self.gaps: List[DataGap] = []
+        self._open_gap: Optional[DataGap] = None
+        self._clock = ClockModel()
+        self._unwrapper = TimestampUnwrapper()
+        self._clock_size = 0
+        self._size = 0
+        self._capacity = max(int(capacity), 1)
+        self._columns: Dict[str, np.ndarray] = {
+            name: np.empty((self._capacity,) + COLUMN_SPECS[name][1],
+                           dtype=COLUMN_SPECS[name][0])
+            for name in self.stored_fields
+        }
+        plan = self.parser.plan
+        self._unpack = plan.struct.unpack_from if plan else None
+        self._scalar_fields = [(name, plan.slices[name][0]) for name in self.fields
+                               if not COLUMN_SPECS[name][1]] if plan else []
+        self._vector_fields = [(name,) + plan.slices[name] for name in self.fields
+                               if COLUMN_SPECS[name][1]] if plan else []
+
+    @property
+    def size(self) -> int:
+        """Number of samples collected"""
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        """Number of samples that fit before the columns must grow"""
+        return self._capacity
+
+    def _reserve(self, count: int):
+        """Make room for ``count`` more samples"""
+        needed = self._size + count
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= self.GROWTH_FACTOR
+        for name, column in self._columns.items():
+            grown = np.empty((capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        self._capacity = capacity
+
+    def add_data(self, raw_data: bytes, host_time: float = None):
+        """Parse and add new sensor data received at ``host_time`` (now by default)"""
+        if host_time is None:
+            host_time = time.time()
+        if self.data is not None or self._unpack is None:
+            self.add_sample(self.parser.parse(raw_data), host_time)
+            return
+        values = self._unpack(raw_data)
+        if self._size == self._capacity:
+            self._reserve(1)
+        index = self._size
+        columns = self._columns
+        for name, position in self._scalar_fields:
+            columns[name][index] = values[position]
+        for name, start, stop in self._vector_fields:
+            columns[name][index] = values[start:stop]
+        if 'magnetic_field' in columns:
+            columns['magnetic_field'][index] /= MAGNETIC_FIELD_SCALE
+        columns[HOST_TIME_FIELD][index] = host_time
+        self._size = index + 1
+        if self._open_gap is not None:
+            self._close_gap(index)
+
+    def add_batch(self, buffer, count: int = None, host_times: np.ndarray = None):
+        """Decode and add ``count`` concatenated packets (all by default)
+
+        ``host_times`` gives the receive time of each packet; NaN when unknown.
+        """
+        columns = self.parser.parse_batch(buffer, count)
+        added = len(columns['timestamp'])
+        self._reserve(added)
+        start, stop = self._size, self._size + added
+        for name in self.fields:
+            self._columns[name][start:stop] = columns[name]
+        self._columns[HOST_TIME_FIELD][start:stop] = np.nan if host_times is None else host_times[:added]
+        self._size = stop
+        if self._open_gap is not None and added:
+            self._close_gap(start)
+        if self.data is not None:
+            size = self.parser.packet_size
+            view = memoryview(buffer).cast('B')
+            self.data.extend(self.parser.parse(bytes(view[i * size:(i + 1) * size]))
+                             for i in range(added))
+
+    def add_columns(self, columns: Dict[str, np.ndarray]):
+        """Append already decoded columns, e.g. read back from a session
+
+        Every field of the payload mode must be present with the same number
+        of rows; a missing ``host_time`` column is stored as NaN.
+        Compatibility mode cannot rebuild ``SensorData`` objects.
+        """
+        if self.data is not None:
+            raise ValueError("add_columns is not available with store_objects=True")
+        missing = [name for name in self.fields if name not in columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        counts = {len(columns[name]) for name in self.fields}
+        if len(counts) > 1:
+            raise ValueError("Columns have different lengths")
+        added = counts.pop() if counts else 0
+        self._reserve(added)
+        start, stop = self._size, self._size + added
+        for name in self.fields:
+            self._columns[name][start:stop] = columns[name]
+        self._columns[HOST_TIME_FIELD][start:stop] = columns.get(HOST_TIME_FIELD, np.nan)
+        self._size = stop
+        if self._open_gap is not None and added:
+            self._close_gap(start)
+
+    def add_sample(self, sample: SensorData, host_time: float = None):
+        """Add an already parsed sample received at ``host_time`` (now by default)"""
+        self._reserve(1)
+        index = self._size
+        for name in self.fields:
+            self._columns[name][index] = _field_value(name, getattr(sample, name))
+        self._columns[HOST_TIME_FIELD][index] = time.time() if host_time is None else host_time
+        self._size = index + 1
+        if self.data is not None:
+            self.data.append(sample)
+        if self._open_gap is not None:
+            self._close_gap(index)
+
+    def begin_gap(self, host_time: float = None) -> DataGap:
+        """Mark the start of an outage, e.g. when the connection drops
+
+        The gap stays open until the next sample arrives. Calling this while
+        a gap is already open returns that gap unchanged.
+        """
+        if self._open_gap is None:
+            timestamps = self.get_column('timestamp')
+            self._open_gap = DataGap(
+                start_time=time.time() if host_time is None else host_time,
+                last_timestamp=int(timestamps[-1]) if len(timestamps) else None)
+            self.gaps.append(self._open_gap)
+        return self._open_gap
+
+    def _close_gap(self, index: int):
+        """Close the open gap at the sample stored at ``index``
+
+        The gap ends at that sample's host receive time, or now when unknown.
+        """
+        gap = self._open_gap
+        host_time = float(self._columns[HOST_TIME_FIELD][index])
+        gap.end_time = host_time if np.isfinite(host_time) else time.time()
+        gap.sample_index = index
+        gap.first_timestamp = int(self._columns['timestamp'][index])
+        self._open_gap = None
+
     def clear(self):
-        """Clear collected data"""
-        self.data.clear()
-    
+        """Clear collected data, keeping the allocated storage"""
+        self._size = 0
+        self.gaps.clear()
+        self._open_gap = None
+        self._clock.reset()
+        self._unwrapper.reset()
+        self._clock_size = 0
+        if self.data is not None:
+            self.data.clear()
+
+    def latest(self) -> Optional[Dict[str, np.ndarray]]:
+        """Get a copy of the most recent sample, or None if nothing was collected"""
+        index = self._size - 1
+        if index < 0:
+            return None
+        return {name: self._columns[name][index].copy() for name in self.fields}
+
+    def get_column(self, name: str) -> np.ndarray:
+        """Get a view of the stored values of one SensorData field
+
+        Fields the payload mode does not carry give an empty array.
+        """
+        if name not in self._columns:
+            dtype, shape = COLUMN_SPECS[name]
+            return np.empty((0,) + shape, dtype=dtype)
+        return self._columns[name][:self._size]
+
+    def get_columns(self) -> Dict[str, np.ndarray]:
+        """Get views of every stored column, keyed by field name"""
+        return {name: self.get_column(name) for name in self.stored_fields}
+
+    @property
+    def clock(self) -> ClockModel:
+        """Fit of the sensor clock against host receive time, up to the latest sample"""
+        if self._clock_size < self._size and 'timestamp' in self._columns:
+            rows = slice(self._clock_size, self._size)
+            host_times = self._columns[HOST_TIME_FIELD][rows]
+            self._clock.update_batch(
+                self._unwrapper.unwrap_array(self._columns['timestamp'][rows], host_times),
+                host_times)
+            self._clock_size = self._size
+        return self._clock
+
     def get_timestamps(self) -> np.ndarray:
-        """Get array of timestamps"""
-        return np.array([d.timestamp.microseconds for d in self.data])
-    
+        """Get array of raw sensor timestamps (microseconds, wrap every 2**32)"""
+        return self.get_column('timestamp')
+
+    def get_unwrapped_timestamps(self) -> np.ndarray:
+        """Get array of sensor timestamps on a monotonic int64 timeline"""
+        return unwrap_timestamps(self.get_column('timestamp'), self.get_column(HOST_TIME_FIELD))
+
+    def get_host_receive_times(self) -> np.ndarray:
+        """Get array of host receive times (time.time(), NaN when unknown)"""
+        return self.get_column(HOST_TIME_FIELD)
+
+    def get_host_timestamps(self) -> np.ndarray:
+        """Get array of sensor timestamps mapped to host time through ``clock``"""
+        return self.clock.to_host(self.get_unwrapped_timestamps())
+
     def get_quaternions(self) -> np.ndarray:
         """Get array of quaternions"""
-        return np.array([d.quaternion.to_numpy() for d in self.data if d.quaternion])
-    
+        return self.get_column('quaternion')
+
     def get_euler_angles(self) -> np.ndarray:
         """Get array of euler angles"""
-        return np.array([d.euler_angles.to_numpy() for d in self.data if d.euler_angles])
-    
+        return self.get_column('euler_angles')
+
     def get_accelerations(self) -> np.ndarray:
         """Get array of accelerations"""
-        return np.array([d.acceleration.to_numpy() for d in self.data if d.acceleration])
-    
+        return self.get_column('acceleration')
+
     def get_free_accelerations(self) -> np.ndarray:
         """Get array of free accelerations"""
-        return np.array([d.free_acceleration.to_numpy() for d in self.data if d.free_acceleration])
+        return self.get_column('free_acceleration')
+
+    def get_angular_velocities(self) -> np.ndarray:
+        """Get array of angular velocities"""
+        return self.get_column('angular_velocity')
+
+    def get_magnetic_fields(self) -> np.ndarray:
+        """Get array of magnetic field values"""
+        return self.get_column('magnetic_field')
 
     def get_status_values(self) -> np.ndarray:
         """Get array of status values"""
-        return np.array([d.status.value for d in self.data if d.status])
-    
+        return self.get_column('status')
+
     def get_acc_clipping_counts(self) -> np.ndarray:
         """Get array of accelerometer clipping counts"""
-        return np.array([d.clipping_acc for d in self.data if d.clipping_acc is not None])
-    
+        return self.get_column('clipping_acc')
+
     def get_gyr_clipping_counts(self) -> np.ndarray:
         """Get array of gyroscope clipping counts"""
-        return np.array([d.clipping_gyr for d in self.data if d.clipping_gyr is not None])
\ No newline at end of file
+        return self.get_column('clipping_gyr')
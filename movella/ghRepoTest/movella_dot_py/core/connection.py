@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncio
+import time
+from bleak import BleakClient
+from ..models.data_structures import RetryPolicy, SensorConfiguration
+from .sensor import MovellaDOTSensor
+
+
+@dataclass
+class BringUpReport:
+    """Outcome of connecting and configuring one sensor"""
+    address: str
+    name: Optional[str]
+    sensor: Optional[MovellaDOTSensor]
+    attempts: int
+    elapsed: float                                  # seconds, all attempts
+    steps: Dict[str, float] = field(default_factory=dict)  # seconds, last attempt
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def bring_up_sensor(address: str, config: SensorConfiguration, name: str = None,
+                          client_factory: Callable[..., BleakClient] = BleakClient,
+                          policy: RetryPolicy = None, ready_timeout: float = 2.0,
+                          read_info: bool = True, identify: bool = False) -> BringUpReport:
+    """Connect, probe, and configure one sensor, retrying on failure
+
+    Instead of sleeping a fixed time after connecting, the sensor counts as
+    ready as soon as it answers a DEVICE_CONTROL read within
+    ``ready_timeout``. A failed step is retried after a jittered backoff,
+    reusing the BLE connection when it is still up.
+    """
+    policy = policy or RetryPolicy()
+    sensor = MovellaDOTSensor(config)
+    start = time.perf_counter()
+    steps: Dict[str, float] = {}
+    error = None
+
+    async def step(label, coroutine):
+        step_start = time.perf_counter()
+        result = await coroutine
+        steps[label] = time.perf_counter() - step_start
+        return result
+
+    for attempt in range(1, policy.attempts + 1):
+        steps = {}
+        try:
+            if not (sensor.is_connected and sensor.client.is_connected):
+                await step('connect', sensor.connect(address, name, client_factory))
+            await step('ready', sensor.wait_until_ready(ready_timeout))
+            if read_info:
+                await step('device_info', sensor.get_device_info())
+            await step('configure', sensor.configure_sensor())
+            if identify:
+                await step('identify', sensor.identify_sensor())
+            return BringUpReport(address, name, sensor, attempt,
+                                 time.perf_counter() - start, steps)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            print(f"Bring-up of {name or address} failed (attempt {attempt}/{policy.attempts}): {error}")
+            if attempt < policy.attempts:
+                await asyncio.sleep(policy.delay(attempt))
+
+    try:
+        if sensor.client and sensor.client.is_connected:
+            await sensor.client.disconnect()
+    except Exception:
+        pass
+    sensor.is_connected = False
+    return BringUpReport(address, name, None, policy.attempts,
+                         time.perf_counter() - start, steps, error)
+
+
+async def connect_sensors(devices: Iterable, config: SensorConfiguration,
+                          max_concurrency: int = 3,
+                          client_factory: Callable[..., BleakClient] = BleakClient,
+                          policy: RetryPolicy = None, ready_timeout: float = 2.0,
+                          read_info: bool = True, identify: bool = False) -> List[BringUpReport]:
+    """Bring up several sensors concurrently
+
+    ``devices`` holds BLE devices from a scan or plain address strings. At
+    most ``max_concurrency`` sensors are connecting at any time; use 1 to
+    fall back to sequential connection. Returns one report per device, in
+    input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def bring_up(device):
+        address = getattr(device, 'address', device)
+        name = getattr(device, 'name', None)
+        async with semaphore:
+            return await bring_up_sensor(address, config, name, client_factory, policy,
+                                         ready_timeout, read_info, identify)
+
+    return list(await asyncio.gather(*(bring_up(device) for device in devices)))
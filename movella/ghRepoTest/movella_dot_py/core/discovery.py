@@ -0,0 +1,160 @@
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+import asyncio
+import json
+import os
+import time
+from bleak import BleakScanner
+from ..models.data_structures import DeviceInfo
+from ..models.enums import FilterProfile
+
+DEVICE_NAME = "Movella DOT"
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".movella_dot_py", "devices.json")
+
+
+@dataclass
+class KnownDevice:
+    """A sensor seen in an earlier run
+
+    Has ``address`` and ``name`` like a scanned BLE device, so it can be
+    passed straight to ``MovellaDOTFleet`` or ``connect_sensors``.
+    """
+    address: str
+    name: Optional[str] = None
+    device_tag: Optional[str] = None
+    device_info: Optional[DeviceInfo] = None
+    last_seen: float = 0.0      # time.time() of the last scan or connection
+
+
+class DiscoveryCache:
+    """Persistent record of known Movella DOT sensors, keyed by address"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.devices: Dict[str, KnownDevice] = {}
+        self.load()
+
+    def load(self):
+        """Read the cache file; a missing or unreadable file gives an empty cache"""
+        self.devices = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable discovery cache {self.path}: {e}")
+            return
+        for entry in entries:
+            info = entry.get('device_info')
+            if info:
+                info = DeviceInfo(**dict(info, filter_profile=FilterProfile(info['filter_profile'])))
+            self.devices[entry['address']] = KnownDevice(
+                address=entry['address'],
+                name=entry.get('name'),
+                device_tag=entry.get('device_tag'),
+                device_info=info,
+                last_seen=entry.get('last_seen', 0.0),
+            )
+
+    def save(self):
+        """Write the cache file atomically"""
+        entries = []
+        for device in self.devices.values():
+            entry = asdict(device)
+            if device.device_info:
+                entry['device_info']['filter_profile'] = int(device.device_info.filter_profile)
+            entries.append(entry)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=2)
+        os.replace(temporary, self.path)
+
+    def remember(self, address: str, name: str = None,
+                 device_info: DeviceInfo = None) -> KnownDevice:
+        """Add or refresh a device, keeping what was known about it before"""
+        device = self.devices.get(address) or KnownDevice(address)
+        device.name = name or device.name
+        if device_info:
+            device.device_info = device_info
+            device.device_tag = device_info.device_tag
+        device.last_seen = time.time()
+        self.devices[address] = device
+        return device
+
+    def remember_sensor(self, sensor) -> KnownDevice:
+        """Record a connected MovellaDOTSensor and its device information"""
+        return self.remember(sensor.device_address, sensor.device_name, sensor.device_info)
+
+    def forget(self, address: str):
+        """Drop a device from the cache"""
+        self.devices.pop(address, None)
+
+    def known_devices(self) -> List[KnownDevice]:
+        """Known devices, most recently seen first"""
+        return sorted(self.devices.values(), key=lambda device: device.last_seen, reverse=True)
+
+    def addresses(self) -> List[str]:
+        """Addresses of the known devices, most recently seen first"""
+        return [device.address for device in self.known_devices()]
+
+
+async def scan_for_sensors(timeout: float = 5.0, expected_count: int = None,
+                           expected_addresses: List[str] = None,
+                           name_filter: str = DEVICE_NAME) -> List:
+    """Scan for Movella DOT sensors, stopping early once the expected ones are seen
+
+    The scan ends as soon as every address in ``expected_addresses`` has been
+    seen, or ``expected_count`` matching devices (of those addresses, when
+    given) have been seen; otherwise it runs for the full ``timeout``.
+    """
+    found = {}
+    done = asyncio.Event()
+    expected = set(expected_addresses or ())
+    if expected_count is None and expected:
+        expected_count = len(expected)
+
+    def on_detection(device, advertisement_data):
+        name = device.name or getattr(advertisement_data, 'local_name', None)
+        if not name or name_filter not in name:
+            return
+        found[device.address] = device
+        seen = len(expected & found.keys()) if expected else len(found)
+        if expected_count and seen >= expected_count:
+            done.set()
+
+    async with BleakScanner(detection_callback=on_detection):
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    return list(found.values())
+
+
+async def discover_sensors(cache: DiscoveryCache = None, expected_count: int = None,
+                           timeout: float = 5.0, use_cache: bool = True) -> List:
+    """Find sensors to connect to, skipping the BLE scan when possible
+
+    With ``use_cache`` and at least ``expected_count`` known devices (any, if
+    not given) in ``cache``, the known devices are returned without scanning.
+    Otherwise a scan runs that stops as soon as the expected number of
+    devices has been seen, and the cache is updated with what it found.
+    """
+    if cache and use_cache:
+        known = cache.known_devices()
+        if known and (expected_count is None or len(known) >= expected_count):
+            return known[:expected_count] if expected_count else known
+
+    known_addresses = cache.addresses() if cache else None
+    if expected_count is None and known_addresses:
+        devices = await scan_for_sensors(timeout, expected_addresses=known_addresses)
+    else:
+        devices = await scan_for_sensors(timeout, expected_count)
+    if cache:
+        for device in devices:
+            cache.remember(device.address, device.name)
+        cache.save()
+    return devices
@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional, TextIO
+import sys
+import threading
+import numpy as np
+from ..models.data_structures import Status
+
+# Label and number format of every displayed field
+_VECTOR_FIELDS = [
+    ('quaternion', "Quaternion (w,x,y,z)", "{:.3f}", ""),
+    ('euler_angles', "Euler (roll,pitch,yaw)", "{:.1f}", "°"),
+    ('acceleration', "Acceleration (x,y,z)", "{:.2f}", ""),
+    ('free_acceleration', "Free Acceleration (x,y,z)", "{:.2f}", ""),
+    ('angular_velocity', "Angular Velocity (x,y,z)", "{:.2f}", ""),
+    ('magnetic_field', "Magnetic Field (x,y,z)", "{:.2f}", ""),
+]
+
+_STATUS_FLAGS = [
+    ('is_clipping_acc_x', "Accelerometer X clipping"),
+    ('is_clipping_acc_y', "Accelerometer Y clipping"),
+    ('is_clipping_acc_z', "Accelerometer Z clipping"),
+    ('is_clipping_gyr_x', "Gyroscope X clipping"),
+    ('is_clipping_gyr_y', "Gyroscope Y clipping"),
+    ('is_clipping_gyr_z', "Gyroscope Z clipping"),
+    ('is_mag_new', "New magnetic field data"),
+]
+
+
+def format_sample(device_tag: Optional[str], address: Optional[str],
+                  sample: Optional[Dict[str, np.ndarray]]) -> str:
+    """Format the latest sample of one sensor as a block of text"""
+    lines = [f"Real-time Sensor Data from {device_tag} ({address}):"]
+    if sample is None:
+        lines.append("No data yet")
+        return "\n".join(lines)
+
+    for name, label, number_format, unit in _VECTOR_FIELDS:
+        if name in sample:
+            values = ", ".join(number_format.format(v) + unit for v in sample[name])
+            lines.append(f"{label}: {values}")
+
+    if 'status' in sample:
+        status = Status(int(sample['status']))
+        flags = [text for method, text in _STATUS_FLAGS if getattr(status, method)()]
+        if flags:
+            lines.append("Status Information:")
+            lines.extend(f"- {text}" for text in flags)
+    return "\n".join(lines)
+
+
+class LiveConsoleView:
+    """Periodically prints the latest sample of each sensor
+
+    Rendering happens on its own thread at ``refresh_hz`` and only reads the
+    most recent row of each collector, so the notification handlers never
+    wait on terminal I/O however fast the sensors stream.
+    """
+
+    CLEAR_SCREEN = "\x1b[H\x1b[J"
+
+    def __init__(self, sensors: List, refresh_hz: float = 10.0,
+                 stream: TextIO = None):
+        if refresh_hz <= 0:
+            raise ValueError("refresh_hz must be positive")
+        self.sensors = list(sensors)
+        self.refresh_hz = refresh_hz
+        self.stream = stream or sys.stdout
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def render(self) -> str:
+        """Build one frame with the latest sample of every sensor"""
+        blocks = []
+        for sensor in self.sensors:
+            collector = sensor.data_collector
+            sample = collector.latest() if collector else None
+            blocks.append(format_sample(sensor.device_tag, sensor.device_address, sample))
+        return "\n\n".join(blocks)
+
+    def _run(self):
+        interval = 1.0 / self.refresh_hz
+        in_place = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        while not self._stop_event.wait(interval):
+            frame = self.render()
+            try:
+                self.stream.write((self.CLEAR_SCREEN if in_place else "\n") + frame + "\n")
+                self.stream.flush()
+            except Exception as e:
+                print(f"Error rendering live view: {e}")
+
+    def start(self):
+        """Start rendering on a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop rendering and wait for the thread to exit"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'LiveConsoleView':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,354 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+import asyncio
+import time
+from ..models.characteristics import MovellaDOTCharacteristics
+from ..models.enums import PayloadMode, RecordingMessage
+from .collector import SensorDataCollector
+from .messages import (FILE_DATA_HEADER, FILE_DATA_REQUEST, FILE_INFO_FORMAT, FILE_INFO_REQUEST,
+                       FLASH_INFO_FORMAT, parse_message)
+from .parser import PAYLOAD_PLANS, PayloadParser
+from .sensor import MovellaDOTSensor
+from .session import DEFAULT_CHUNK_SIZE, SensorWriter, SessionWriter
+
+CHARS = MovellaDOTCharacteristics()
+
+
+@dataclass
+class RecordingFile:
+    """One recording stored on the flash of a sensor"""
+    index: int
+    start_time: int             # UTC seconds
+    output_rate: int            # Hz
+    payload_mode: PayloadMode
+    records: int
+
+    @property
+    def record_size(self) -> int:
+        return PAYLOAD_PLANS[self.payload_mode].struct.size
+
+    @property
+    def size(self) -> int:
+        """Bytes of record data"""
+        return self.records * self.record_size
+
+    @property
+    def duration(self) -> float:
+        return self.records / self.output_rate if self.output_rate else 0.0
+
+    def to_dict(self) -> dict:
+        return {'index': self.index, 'start_time': self.start_time,
+                'output_rate': self.output_rate, 'payload_mode': int(self.payload_mode),
+                'records': self.records}
+
+
+@dataclass
+class ExportReport:
+    """Outcome of exporting one recording of one sensor"""
+    address: str
+    name: Optional[str]
+    file: Optional[RecordingFile] = None
+    first_record: int = 0
+    records: int = 0            # records received by this export
+    bytes: int = 0
+    elapsed: float = 0.0        # seconds
+    resumes: int = 0            # reconnections during the export
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def complete(self) -> bool:
+        return self.file is not None and self.first_record + self.records >= self.file.records
+
+    @property
+    def kbps(self) -> float:
+        """Throughput in kB/s"""
+        return self.bytes / self.elapsed / 1000 if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        label = self.name or self.address
+        if self.file is None:
+            return f"{label}: FAILED ({self.error})"
+        line = (f"{label}: file {self.file.index}, {self.first_record + self.records}/"
+                f"{self.file.records} records, {self.bytes / 1000:.1f} kB in "
+                f"{self.elapsed:.2f} s ({self.kbps:.1f} kB/s)")
+        if self.resumes:
+            line += f", resumed {self.resumes}x"
+        return line if self.ok else f"{line} FAILED ({self.error})"
+
+    def to_dict(self) -> dict:
+        return {'file': self.file.to_dict() if self.file else None,
+                'first_record': self.first_record, 'records': self.records,
+                'bytes': self.bytes, 'elapsed': self.elapsed, 'kbps': self.kbps,
+                'resumes': self.resumes, 'complete': self.complete, 'error': self.error}
+
+
+class RecordingExporter:
+    """Lists and downloads the recordings stored on one sensor
+
+    Requests go through ``MovellaDOTSensor.send_message``, which checks
+    their acknowledgement on MESSAGE_ACK; file information and record data arrive on
+    MESSAGE_NOTIFY. Records are requested in windows of ``window`` records
+    with up to ``depth`` windows in flight, so the sensor always has the
+    next window queued while the previous one is on the air. When the link
+    drops, the export waits for the sensor to reconnect (or reconnects it,
+    following its ``reconnect_policy``) and asks again from the first
+    missing record.
+
+    Experimental: the export messages (``RecordingMessage`` from
+    REQUEST_FLASH_INFO on) and their payload layouts are defined for this
+    SDK and ``DOTSimulator``; they have not been verified against a real
+    sensor, which may use different IDs and layouts.
+    """
+
+    def __init__(self, sensor: MovellaDOTSensor, window: int = 120, depth: int = 4,
+                 timeout: float = 5.0):
+        self.sensor = sensor
+        self.window = window
+        self.depth = depth
+        self.timeout = timeout
+        self.flash_used: Optional[int] = None
+        self.flash_total: Optional[int] = None
+        self._replies: Dict[int, List[asyncio.Future]] = {}
+        self._on_data: Optional[Callable[[bytes], None]] = None
+        self._client = None
+
+    async def _subscribe(self):
+        """Subscribe to MESSAGE_NOTIFY, again after a reconnection"""
+        client = self.sensor.client
+        if client is self._client:
+            return
+        await client.start_notify(CHARS.MESSAGE_NOTIFY, self._handle_notify)
+        self._client = client
+
+    def _handle_notify(self, sender, data: bytearray):
+        try:
+            message = parse_message(data)
+        except ValueError:
+            return
+        if message.reid == RecordingMessage.FILE_DATA:
+            if self._on_data is not None:
+                self._on_data(message.payload)
+            return
+        for future in self._replies.get(message.reid, []):
+            if not future.done():
+                future.set_result(message.payload)
+                return
+
+    async def _request(self, reid: RecordingMessage, payload: bytes = b'',
+                       reply: RecordingMessage = None) -> Optional[bytes]:
+        """Send one message, check its acknowledgement and return the ``reply`` payload"""
+        answer = None
+        if reply is not None:
+            answer = asyncio.get_running_loop().create_future()
+            self._replies.setdefault(reply, []).append(answer)
+        try:
+            await self.sensor.send_message(reid, payload, self.timeout)
+            return await asyncio.wait_for(answer, self.timeout) if answer else None
+        finally:
+            if answer is not None:
+                self._replies[reply].remove(answer)
+
+    async def list_recordings(self) -> List[RecordingFile]:
+        """Recordings on the flash, oldest first"""
+        await self._subscribe()
+        count, self.flash_used, self.flash_total = FLASH_INFO_FORMAT.unpack(
+            await self._request(RecordingMessage.REQUEST_FLASH_INFO,
+                                reply=RecordingMessage.FLASH_INFO))
+        # The sensor answers in order: ask for every file at once
+        replies = await asyncio.gather(*(
+            self._request(RecordingMessage.REQUEST_FILE_INFO, FILE_INFO_REQUEST.pack(index),
+                          reply=RecordingMessage.FILE_INFO)
+            for index in range(count)))
+        files = []
+        for reply in replies:
+            index, start_time, output_rate, payload_mode, records = FILE_INFO_FORMAT.unpack(reply)
+            files.append(RecordingFile(index, start_time, output_rate, PayloadMode(payload_mode),
+                                       records))
+        return files
+
+    async def _wait_for_progress(self, progress: asyncio.Event) -> bool:
+        """Wait up to ``timeout`` for new records; raises once the link is down"""
+        deadline = time.perf_counter() + self.timeout
+        while not progress.is_set():
+            if not (self.sensor.is_connected and self.sensor.client.is_connected):
+                raise ConnectionError("connection lost during the export")
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(progress.wait(), min(remaining, 0.25))
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def _fetch(self, file: RecordingFile, first: int, deliver: Callable[[bytes, int], None]):
+        """Receive records ``first`` to the end of ``file`` in order"""
+        size = file.record_size
+        received = requested = first
+        progress = asyncio.Event()
+
+        def on_data(payload: bytes):
+            nonlocal received
+            index, position, count = FILE_DATA_HEADER.unpack_from(payload)
+            # Duplicates of re-requested windows and records past a gap are dropped
+            if index != file.index or position > received or position + count <= received:
+                return
+            skip = received - position
+            start = FILE_DATA_HEADER.size + skip * size
+            deliver(payload[start:start + (count - skip) * size], count - skip)
+            received = position + count
+            progress.set()
+
+        self._on_data = on_data
+        # Window requests are acknowledged concurrently, so the next one goes out at once
+        requests: List[asyncio.Task] = []
+        stalls = 0
+        try:
+            while received < file.records:
+                progress.clear()
+                for task in [task for task in requests if task.done()]:
+                    requests.remove(task)
+                    task.result()
+                while requested < file.records and requested - received < self.window * self.depth:
+                    count = min(self.window, file.records - requested)
+                    task = asyncio.ensure_future(self._request(
+                        RecordingMessage.REQUEST_FILE_DATA,
+                        FILE_DATA_REQUEST.pack(file.index, requested, count)))
+                    task.add_done_callback(lambda task: task.cancelled() or progress.set())
+                    requests.append(task)
+                    requested += count
+                if await self._wait_for_progress(progress):
+                    stalls = 0
+                    continue
+                stalls += 1
+                if stalls >= 3:
+                    raise asyncio.TimeoutError(f"no data for {stalls * self.timeout:.0f} s "
+                                               f"at record {received}")
+                # Nothing arrived: drop what is queued and ask from the first missing record
+                await self._request(RecordingMessage.STOP_EXPORT)
+                requested = received
+        finally:
+            self._on_data = None
+            for task in requests:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()
+
+    async def _resume(self):
+        """Wait for the sensor to reconnect, reconnecting it unless it does so itself"""
+        self._client = None
+        sensor = self.sensor
+        policy = sensor.reconnect_policy
+        if sensor.auto_reconnect:
+            deadline = time.perf_counter() + policy.attempts * (policy.max_delay + self.timeout)
+            while not (sensor.is_connected and sensor.client.is_connected):
+                if time.perf_counter() > deadline:
+                    raise ConnectionError("sensor did not reconnect")
+                await asyncio.sleep(0.05)
+            return
+        for attempt in range(1, policy.attempts + 1):
+            try:
+                await sensor.reconnect()
+                return
+            except Exception:
+                if attempt < policy.attempts:
+                    await asyncio.sleep(policy.delay(attempt))
+        raise ConnectionError(f"reconnection failed after {policy.attempts} attempts")
+
+    async def export(self, file: RecordingFile, writer: SensorWriter = None,
+                     collector: SensorDataCollector = None, first_record: int = 0) -> ExportReport:
+        """Download ``file`` into ``writer`` and/or ``collector``
+
+        Records go through ``PayloadParser.parse_batch`` as they arrive, in
+        order; ``first_record`` continues an export that was interrupted
+        earlier. Failures are reported in the returned report, which also
+        holds the throughput.
+        """
+        sensor = self.sensor
+        report = ExportReport(sensor.device_address, sensor.device_tag, file, first_record)
+        parser = PayloadParser(file.payload_mode)
+        # Notifications carry a few records each: decode and store them a window at a time
+        pending = bytearray()
+        pending_records = 0
+
+        def flush():
+            nonlocal pending, pending_records
+            if not pending_records:
+                return
+            if writer is not None:
+                writer.append(parser.parse_batch(pending, pending_records))
+            if collector is not None:
+                collector.add_batch(pending, pending_records)
+            pending, pending_records = bytearray(), 0
+
+        def deliver(data: bytes, count: int):
+            nonlocal pending_records
+            pending.extend(data)
+            pending_records += count
+            report.records += count
+            report.bytes += len(data)
+            if pending_records >= self.window:
+                flush()
+
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    await self._subscribe()
+                    await self._fetch(file, first_record + report.records, deliver)
+                    break
+                except Exception:
+                    if sensor.is_connected and sensor.client.is_connected:
+                        raise
+                finally:
+                    flush()
+                report.resumes += 1
+                await self._resume()
+        except Exception as e:
+            report.error = f"{type(e).__name__}: {e}"
+        report.elapsed = time.perf_counter() - start
+        return report
+
+
+async def export_recordings(sensors: Iterable[MovellaDOTSensor], path: str, file_index: int = None,
+                            chunk_size: int = DEFAULT_CHUNK_SIZE, metadata: dict = None,
+                            sensor_metadata: Dict[str, dict] = None,
+                            **options) -> Dict[str, ExportReport]:
+    """Export one recording of every sensor at once into a new session directory
+
+    ``file_index`` picks the recording, the latest by default. ``options``
+    go to ``RecordingExporter``. Reports are keyed by address; each
+    sensor's recording description and export figures are kept in its
+    session metadata, along with its entry of ``sensor_metadata``.
+    Experimental, like ``RecordingExporter``.
+    """
+    sensors = list(sensors)
+    sensor_metadata = sensor_metadata or {}
+    with SessionWriter(path, chunk_size, metadata) as session:
+        async def export_one(sensor: MovellaDOTSensor) -> ExportReport:
+            exporter = RecordingExporter(sensor, **options)
+            report = ExportReport(sensor.device_address, sensor.device_tag)
+            try:
+                files = await exporter.list_recordings()
+                if not files:
+                    raise ValueError("no recordings on the sensor")
+                file = files[-1] if file_index is None else files[file_index]
+            except Exception as e:
+                report.error = f"{type(e).__name__}: {e}"
+                return report
+            writer = session.add_sensor(file.payload_mode, sensor.device_address,
+                                        sensor.device_address, sensor.device_tag)
+            report = await exporter.export(file, writer)
+            writer.metadata['output_rate'] = file.output_rate
+            writer.metadata['recording'] = file.to_dict()
+            writer.metadata['export'] = report.to_dict()
+            writer.metadata.update(sensor_metadata.get(sensor.device_address, {}))
+            return report
+
+        reports = await asyncio.gather(*(export_one(sensor) for sensor in sensors))
+    return {sensor.device_address: report for sensor, report in zip(sensors, reports)}
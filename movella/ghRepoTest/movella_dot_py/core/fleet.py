@@ -0,0 +1,337 @@
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import math
+import time
+from bleak import BleakClient
+from ..models.data_structures import SensorConfiguration
+from ..models.enums import SensorState
+from .alignment import AlignedData, align_collectors
+from .connection import BringUpReport, RetryPolicy, connect_sensors
+from .discovery import DiscoveryCache
+from .exporter import ExportReport, export_recordings
+from .loss import LossIndex
+from .metrics import MetricsSnapshot
+from .sensor import MovellaDOTSensor
+from .session import DEFAULT_CHUNK_SIZE, Session, SessionWriter
+
+
+@dataclass
+class OperationResult:
+    """Outcome of one operation on one sensor"""
+    address: str
+    name: Optional[str]
+    started: float          # time.perf_counter() when the operation began
+    elapsed: float          # seconds
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class FleetOperationReport:
+    """Per-sensor results of one fleet-wide operation"""
+    operation: str
+    elapsed: float          # seconds until the last sensor finished
+    results: List[OperationResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(result.ok for result in self.results)
+
+    @property
+    def failed(self) -> List[OperationResult]:
+        return [result for result in self.results if not result.ok]
+
+    def slowest(self) -> Optional[OperationResult]:
+        """The sensor that held the operation up the longest"""
+        return max(self.results, key=lambda result: result.elapsed, default=None)
+
+    def summary(self) -> str:
+        """One line per sensor with its time and error, if any"""
+        lines = [f"{self.operation}: {len(self.results) - len(self.failed)}/{len(self.results)} ok "
+                 f"in {self.elapsed * 1000:.0f} ms"]
+        for result in self.results:
+            outcome = "ok" if result.ok else f"FAILED ({result.error})"
+            lines.append(f"  {result.name or result.address}: {result.elapsed * 1000:.0f} ms {outcome}")
+        return "\n".join(lines)
+
+
+@dataclass
+class ScheduledStart:
+    """A recording start sent to one sensor ahead of time"""
+    start_time: int                         # UTC second the recording starts at
+    sent: float                             # host time.time() of the write
+    write_latency: Optional[float] = None   # seconds from the write to the acknowledgement
+
+    @property
+    def margin(self) -> Optional[float]:
+        """Seconds left before the start when the sensor acknowledged"""
+        if self.write_latency is None:
+            return None
+        return self.start_time - (self.sent + self.write_latency)
+
+    def to_dict(self) -> dict:
+        return {'start_time': self.start_time, 'sent': self.sent,
+                'write_latency': self.write_latency, 'margin': self.margin}
+
+
+class MovellaDOTFleet:
+    """Connects to and drives several Movella DOT sensors at once
+
+    Use as an async context manager: entering connects and configures every
+    device concurrently, leaving disconnects them. Every fleet-wide operation
+    runs on all usable sensors at the same time, each under its own
+    ``timeout``, so one slow sensor cannot hold up the others, and returns a
+    ``FleetOperationReport`` with the time each sensor took.
+
+    ``devices`` may be scanned BLE devices, known devices from a
+    ``DiscoveryCache`` or plain addresses. When ``cache`` is given, the
+    device information of every connected sensor is saved to it. With
+    ``auto_reconnect`` every sensor reconnects and resumes streaming on its
+    own after a lost connection (see ``MovellaDOTSensor.enable_auto_reconnect``).
+    """
+
+    def __init__(self, devices: Iterable, config: SensorConfiguration = None,
+                 max_concurrency: int = 3, timeout: float = 10.0,
+                 client_factory: Callable[..., BleakClient] = BleakClient,
+                 policy: RetryPolicy = None, read_info: bool = True,
+                 cache: DiscoveryCache = None, auto_reconnect: bool = False):
+        self.devices = list(devices)
+        self.config = config or SensorConfiguration()
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.client_factory = client_factory
+        self.policy = policy
+        self.read_info = read_info
+        self.cache = cache
+        self.auto_reconnect = auto_reconnect
+        self.sensors: Dict[str, MovellaDOTSensor] = {}
+        self.states: Dict[str, SensorState] = {
+            getattr(device, 'address', device): SensorState.DISCONNECTED
+            for device in self.devices
+        }
+        self.bring_up_reports: List[BringUpReport] = []
+        self.scheduled_starts: Dict[str, ScheduledStart] = {}
+
+    async def __aenter__(self) -> 'MovellaDOTFleet':
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.disconnect()
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def __iter__(self):
+        return iter(list(self.sensors.values()))
+
+    def _name(self, sensor: MovellaDOTSensor) -> Optional[str]:
+        return sensor.device_tag or sensor.device_name
+
+    async def connect(self) -> List[BringUpReport]:
+        """Connect and configure every device that is not connected yet"""
+        pending = [device for device in self.devices
+                   if getattr(device, 'address', device) not in self.sensors]
+        for device in pending:
+            self.states[getattr(device, 'address', device)] = SensorState.CONNECTING
+        reports = await connect_sensors(pending, self.config, self.max_concurrency,
+                                        self.client_factory, self.policy,
+                                        read_info=self.read_info)
+        for report in reports:
+            if report.ok:
+                self.sensors[report.address] = report.sensor
+                self.states[report.address] = SensorState.CONNECTED
+                if self.auto_reconnect:
+                    report.sensor.enable_auto_reconnect()
+            else:
+                self.states[report.address] = SensorState.FAILED
+        self.bring_up_reports.extend(reports)
+        if self.cache:
+            for report in reports:
+                if report.ok:
+                    self.cache.remember_sensor(report.sensor)
+            self.cache.save()
+        return reports
+
+    def sensors_in(self, *states: SensorState) -> List[MovellaDOTSensor]:
+        """Sensors currently in any of the given states"""
+        return [sensor for address, sensor in self.sensors.items()
+                if self.states[address] in states]
+
+    async def _run(self, operation: str,
+                   action: Callable[[MovellaDOTSensor], Awaitable],
+                   sensors: List[MovellaDOTSensor],
+                   new_state: SensorState = None) -> FleetOperationReport:
+        """Run ``action`` on every sensor concurrently, each under the timeout"""
+        fleet_start = time.perf_counter()
+
+        async def run_one(sensor: MovellaDOTSensor) -> OperationResult:
+            start = time.perf_counter()
+            error = None
+            try:
+                await asyncio.wait_for(action(sensor), self.timeout)
+                if new_state is not None:
+                    self.states[sensor.device_address] = new_state
+            except asyncio.TimeoutError:
+                error = f"timed out after {self.timeout:.1f} s"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            return OperationResult(sensor.device_address, self._name(sensor), start,
+                                   time.perf_counter() - start, error)
+
+        results = await asyncio.gather(*(run_one(sensor) for sensor in sensors))
+        return FleetOperationReport(operation, time.perf_counter() - fleet_start, list(results))
+
+    async def configure(self) -> FleetOperationReport:
+        """Re-apply the configuration to every connected sensor"""
+        return await self._run('configure', lambda s: s.configure_sensor(),
+                               self.sensors_in(SensorState.CONNECTED), SensorState.CONNECTED)
+
+    async def identify(self) -> FleetOperationReport:
+        """Blink the LED of every connected sensor"""
+        return await self._run('identify', lambda s: s.identify_sensor(),
+                               self.sensors_in(SensorState.CONNECTED))
+
+    async def start_measurement(self) -> FleetOperationReport:
+        """Start BLE streaming on every connected sensor"""
+        return await self._run('start_measurement', lambda s: s.start_measurement(),
+                               self.sensors_in(SensorState.CONNECTED), SensorState.MEASURING)
+
+    async def stop_measurement(self) -> FleetOperationReport:
+        """Stop BLE streaming on every streaming sensor"""
+        return await self._run('stop_measurement', lambda s: s.stop_measurement(),
+                               self.sensors_in(SensorState.MEASURING), SensorState.CONNECTED)
+
+    async def start_recording(self, duration_seconds: int = 3600,
+                              start_time: int = None) -> FleetOperationReport:
+        """Start on-device recording on every connected sensor
+
+        Every sensor gets the same ``start_time`` (UTC seconds, now by default).
+        """
+        start_time = int(time.time()) if start_time is None else int(start_time)
+        return await self._run('start_recording',
+                               lambda s: s.start_recording(duration_seconds, start_time),
+                               self.sensors_in(SensorState.CONNECTED), SensorState.RECORDING)
+
+    async def schedule_recording(self, duration_seconds: int = 3600,
+                                 lead: float = 2.0) -> FleetOperationReport:
+        """Start on-device recording on every connected sensor at one future UTC second
+
+        The start second is at least ``lead`` seconds away, so every sensor
+        holds it before it comes. Each acknowledgement is checked, and the
+        start and write latency of every sensor are kept in
+        ``scheduled_starts`` and saved with the session. A sensor that
+        acknowledges after the start, or not at all, counts as failed but
+        is marked recording, so ``stop_recording`` still reaches it.
+
+        That the DOT waits for a future start second is an assumption: it
+        is how ``SimulatedDOT`` behaves, not something measured on a real
+        sensor. Compare the start of an exported recording with
+        ``scheduled_starts`` before relying on it.
+        """
+        start_time = math.ceil(time.time() + lead)
+        self.scheduled_starts = {}
+
+        async def schedule(sensor: MovellaDOTSensor):
+            scheduled = ScheduledStart(start_time, time.time())
+            self.scheduled_starts[sensor.device_address] = scheduled
+            try:
+                scheduled.write_latency = await sensor.start_recording(duration_seconds, start_time,
+                                                                       wait_ack=True)
+            except asyncio.TimeoutError:
+                # The start was written, only its acknowledgement is missing
+                self.states[sensor.device_address] = SensorState.RECORDING
+                raise RuntimeError("not acknowledged, assumed recording") from None
+            if scheduled.margin < 0:
+                self.states[sensor.device_address] = SensorState.RECORDING
+                raise RuntimeError(f"acknowledged {-scheduled.margin:.3f} s after the start")
+
+        return await self._run('schedule_recording', schedule,
+                               self.sensors_in(SensorState.CONNECTED), SensorState.RECORDING)
+
+    async def stop_recording(self) -> FleetOperationReport:
+        """Stop on-device recording on every recording sensor"""
+        return await self._run('stop_recording', lambda s: s.stop_recording(),
+                               self.sensors_in(SensorState.RECORDING), SensorState.CONNECTED)
+
+    async def export_recordings(self, path: str, file_index: int = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE, metadata: dict = None,
+                                **options) -> Dict[str, ExportReport]:
+        """Download one on-device recording of every connected sensor at once (experimental)
+
+        See ``export_recordings``; the latest recording by default. The
+        scheduled start of every sensor, if any, is saved with its data.
+        """
+        return await export_recordings(self.sensors_in(SensorState.CONNECTED), path, file_index,
+                                       chunk_size, self._session_metadata(metadata),
+                                       self._scheduled_metadata(), **options)
+
+    async def disconnect(self) -> FleetOperationReport:
+        """Disconnect every sensor; streaming is stopped first where active"""
+        async def shut_down(sensor: MovellaDOTSensor):
+            if self.states[sensor.device_address] == SensorState.MEASURING:
+                await sensor.stop_measurement()
+            await sensor.disconnect()
+
+        report = await self._run('disconnect', shut_down,
+                                 self.sensors_in(*[state for state in SensorState
+                                                   if state != SensorState.DISCONNECTED]))
+        for sensor in self.sensors.values():
+            self.states[sensor.device_address] = SensorState.DISCONNECTED
+        return report
+
+    def get_collected_data(self) -> Dict[str, dict]:
+        """Collected data of every sensor, keyed by address"""
+        return {address: sensor.get_collected_data()
+                for address, sensor in self.sensors.items()}
+
+    def metrics(self) -> Dict[str, MetricsSnapshot]:
+        """Instrumentation snapshot of every sensor, keyed by address"""
+        return {address: sensor.metrics() for address, sensor in self.sensors.items()}
+
+    def packet_loss(self) -> Dict[str, LossIndex]:
+        """Lost samples of every configured sensor, keyed by address"""
+        return {address: sensor.packet_loss() for address, sensor in self.sensors.items()
+                if sensor.loss_tracker is not None}
+
+    def align(self, rate: float = 120.0, **options) -> AlignedData:
+        """Resample the data of every sensor onto one time grid (see ``align_collectors``)
+
+        Sensors are labelled with their device tag, or address when unknown.
+        """
+        collectors = {(sensor.device_tag or address): sensor.data_collector
+                      for address, sensor in self.sensors.items()
+                      if sensor.data_collector is not None}
+        return align_collectors(collectors, rate, **options)
+
+    def _session_metadata(self, metadata: dict = None) -> dict:
+        metadata = dict(metadata or {})
+        if self.scheduled_starts:
+            metadata['scheduled_start'] = next(iter(self.scheduled_starts.values())).start_time
+        return metadata
+
+    def _scheduled_metadata(self) -> Dict[str, dict]:
+        """Per-sensor metadata of the last scheduled start, keyed by address"""
+        return {address: {'recording_start': scheduled.to_dict()}
+                for address, scheduled in self.scheduled_starts.items()}
+
+    def save_session(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     metadata: dict = None) -> Session:
+        """Write the data collected by every sensor to a new session directory
+
+        The scheduled start of every sensor, if any, is saved with its data.
+        """
+        scheduled = self._scheduled_metadata()
+        with SessionWriter(path, chunk_size, self._session_metadata(metadata)) as writer:
+            for address, sensor in self.sensors.items():
+                if sensor.data_collector is not None:
+                    sensor_writer = writer.write_collector(sensor.data_collector, address,
+                                                           sensor.device_tag)
+                    sensor_writer.metadata['output_rate'] = int(sensor.config.output_rate)
+                    sensor_writer.metadata['packet_loss'] = sensor.packet_loss().to_dict()
+                    sensor_writer.metadata.update(scheduled.get(address, {}))
+        return Session(path)
@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import numpy as np
+from .collector import HOST_TIME_FIELD, SensorDataCollector
+from .timebase import TimestampUnwrapper, unwrap_timestamps
+
+
+def _find_losses(timestamps: np.ndarray, period_us: float, previous: int = None):
+    """Rows preceded by missing samples, how many are missing and the timestamp before
+
+    ``timestamps`` are unwrapped; ``previous`` is the timestamp of the sample
+    just before them, if any. Out-of-order or repeated samples count as no
+    loss.
+    """
+    before = np.empty(len(timestamps), dtype=np.int64)
+    before[1:] = timestamps[:-1]
+    before[0] = timestamps[0] if previous is None else previous
+    missing = np.rint((timestamps - before) / period_us).astype(np.int64) - 1
+    rows = np.flatnonzero(missing > 0)
+    return rows, missing[rows], before[rows]
+
+
+@dataclass
+class LossIndex:
+    """Where one sensor lost samples, from the configured output rate
+
+    Entry ``i`` says that ``missing[i]`` samples were lost right before
+    collected sample ``positions[i]``, after the sample with device time
+    ``timestamps[i]``; ``running_loss[i]`` is the loss percentage of the
+    session up to that point.
+    """
+    output_rate: int                # Hz
+    received: int
+    positions: np.ndarray           # int64 row of the first sample after each gap
+    missing: np.ndarray             # int64 samples lost in each gap
+    timestamps: np.ndarray          # int64 unwrapped device time (us) before each gap
+
+    @property
+    def period_us(self) -> float:
+        return 1e6 / self.output_rate
+
+    @property
+    def lost(self) -> int:
+        return int(self.missing.sum())
+
+    @property
+    def expected(self) -> int:
+        return self.received + self.lost
+
+    @property
+    def loss_percent(self) -> float:
+        return 100.0 * self.lost / self.expected if self.expected else 0.0
+
+    @property
+    def running_loss(self) -> np.ndarray:
+        """Loss percentage up to and including each gap"""
+        lost = np.cumsum(self.missing)
+        return 100.0 * lost / (self.positions + 1 + lost)
+
+    def summary(self) -> str:
+        return (f"{self.received}/{self.expected} samples at {self.output_rate} Hz, "
+                f"{self.lost} lost in {len(self.missing)} gaps ({self.loss_percent:.2f}%)")
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form, as stored with a session"""
+        return {
+            'output_rate': int(self.output_rate),
+            'received': int(self.received),
+            'positions': self.positions.tolist(),
+            'missing': self.missing.tolist(),
+            'timestamps': self.timestamps.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, entry: dict) -> 'LossIndex':
+        return cls(
+            output_rate=entry['output_rate'],
+            received=entry['received'],
+            positions=np.array(entry['positions'], dtype=np.int64),
+            missing=np.array(entry['missing'], dtype=np.int64),
+            timestamps=np.array(entry['timestamps'], dtype=np.int64),
+        )
+
+
+def build_loss_index(timestamps: np.ndarray, output_rate: int,
+                     host_times: np.ndarray = None) -> LossIndex:
+    """Find lost samples in raw device timestamps (us) recorded at ``output_rate`` Hz"""
+    if output_rate <= 0:
+        raise ValueError("output_rate must be positive")
+    unwrapped = unwrap_timestamps(timestamps, host_times)
+    if not len(unwrapped):
+        empty = np.empty(0, dtype=np.int64)
+        return LossIndex(int(output_rate), 0, empty, empty, empty)
+    rows, missing, before = _find_losses(unwrapped, 1e6 / output_rate)
+    return LossIndex(int(output_rate), len(unwrapped), rows.astype(np.int64), missing, before)
+
+
+class LossTracker:
+    """Live packet-loss accounting for one collector
+
+    Every query first folds in the samples collected since the previous
+    one in a single vectorized step, so the notification handler does no
+    extra work. Clearing the collector restarts the accounting.
+    """
+
+    def __init__(self, collector: SensorDataCollector, output_rate: int):
+        if output_rate <= 0:
+            raise ValueError("output_rate must be positive")
+        self.collector = collector
+        self.output_rate = int(output_rate)
+        self.period_us = 1e6 / self.output_rate
+        self.reset()
+
+    def reset(self):
+        self._unwrapper = TimestampUnwrapper()
+        self._rows = 0
+        self._last: Optional[int] = None
+        self._positions: List[np.ndarray] = []
+        self._missing: List[np.ndarray] = []
+        self._timestamps: List[np.ndarray] = []
+        self._lost = 0
+
+    def update(self):
+        """Account for the samples collected since the last call"""
+        size = self.collector.size
+        if size < self._rows:
+            self.reset()
+        if size == self._rows:
+            return
+        rows = slice(self._rows, size)
+        timestamps = self._unwrapper.unwrap_array(self.collector.get_column('timestamp')[rows],
+                                                  self.collector.get_column(HOST_TIME_FIELD)[rows])
+        positions, missing, before = _find_losses(timestamps, self.period_us, self._last)
+        if len(positions):
+            self._positions.append(positions + self._rows)
+            self._missing.append(missing)
+            self._timestamps.append(before)
+            self._lost += int(missing.sum())
+        self._rows = size
+        self._last = int(timestamps[-1])
+
+    @property
+    def received(self) -> int:
+        self.update()
+        return self._rows
+
+    @property
+    def lost(self) -> int:
+        self.update()
+        return self._lost
+
+    @property
+    def loss_percent(self) -> float:
+        """Loss percentage of the session so far"""
+        self.update()
+        expected = self._rows + self._lost
+        return 100.0 * self._lost / expected if expected else 0.0
+
+    def index(self) -> LossIndex:
+        """Snapshot of every gap found so far"""
+        self.update()
+
+        def joined(parts):
+            return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return LossIndex(self.output_rate, self._rows, joined(self._positions).astype(np.int64),
+                         joined(self._missing), joined(self._timestamps))
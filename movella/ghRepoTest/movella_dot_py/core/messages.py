@@ -0,0 +1,46 @@
+from dataclasses import dataclass
+import struct
+from ..models.enums import MessageId
+
+# Payloads of the recording messages, between the ReID and the checksum. Only
+# START_RECORDING_FORMAT is taken from the DOT; the export layouts below are
+# experimental, defined for this SDK and DOTSimulator, and unverified on hardware
+START_RECORDING_FORMAT = struct.Struct('<IH')   # start UTC second, duration in seconds
+FLASH_INFO_FORMAT = struct.Struct('<BII')       # file count, used bytes, total bytes
+FILE_INFO_REQUEST = struct.Struct('<B')         # file index
+FILE_INFO_FORMAT = struct.Struct('<BIHBI')      # index, start UTC second, output rate, payload mode, records
+FILE_DATA_REQUEST = struct.Struct('<BIH')       # index, first record, record count
+FILE_DATA_HEADER = struct.Struct('<BIB')        # index, first record, record count; records follow
+
+MAX_PAYLOAD = 254                               # LEN is one byte and counts the ReID
+
+
+def message_checksum(message: bytes) -> int:
+    """Checksum byte that makes the sum of a MESSAGE_CONTROL message 0 mod 256"""
+    return (256 - sum(message) % 256) % 256
+
+
+def build_message(reid: int, payload: bytes = b'', mid: int = MessageId.RECORDING) -> bytearray:
+    """Message with MID, LEN, ReID, payload and checksum"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Message payload of {len(payload)} bytes exceeds {MAX_PAYLOAD}")
+    message = bytearray([mid, len(payload) + 1, reid]) + payload
+    message.append(message_checksum(message))
+    return message
+
+
+@dataclass
+class Message:
+    mid: int
+    reid: int
+    payload: bytes
+
+
+def parse_message(data: bytes) -> Message:
+    """Split a MESSAGE_CONTROL, MESSAGE_ACK or MESSAGE_NOTIFY message
+
+    Raises ``ValueError`` when LEN or the checksum do not match.
+    """
+    if len(data) < 4 or len(data) != data[1] + 3 or sum(data) % 256:
+        raise ValueError(f"Invalid message: {bytes(data).hex()}")
+    return Message(data[0], data[2], bytes(data[3:-1]))
@@ -0,0 +1,188 @@
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+import math
+import time
+
+# Histogram bucket edges in milliseconds: 20 per decade from 1 us to 10 s
+DEFAULT_BOUNDS_MS = tuple(10 ** (exponent / 20) for exponent in range(-60, 81))
+# Window over which the fastest packet defines zero relative latency
+LATENCY_WINDOW = 10.0
+
+
+@dataclass
+class HistogramSummary:
+    """Distribution of one measurement, in milliseconds"""
+    count: int
+    mean: float
+    min: float
+    max: float
+    p50: float
+    p90: float
+    p99: float
+
+    def __str__(self) -> str:
+        return (f"mean {self.mean:.2f} ms, p50 {self.p50:.2f}, p90 {self.p90:.2f}, "
+                f"p99 {self.p99:.2f}, max {self.max:.2f}")
+
+
+class Histogram:
+    """Fixed-bucket histogram: constant memory and O(log buckets) per value
+
+    Percentiles are interpolated linearly inside their bucket (about 12%
+    wide with the default bounds) and clamped to the values seen.
+    """
+
+    def __init__(self, bounds: tuple = DEFAULT_BOUNDS_MS):
+        self.bounds = bounds
+        self.reset()
+
+    def reset(self):
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.counts[bisect_right(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Approximate ``q``-th percentile (0-100); NaN when empty"""
+        if not self.count:
+            return math.nan
+        rank = q / 100.0 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[bucket - 1] if bucket > 0 else self.min
+                upper = self.bounds[bucket] if bucket < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> HistogramSummary:
+        if not self.count:
+            return HistogramSummary(0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan)
+        return HistogramSummary(self.count, self.total / self.count, self.min, self.max,
+                                self.percentile(50), self.percentile(90), self.percentile(99))
+
+
+@dataclass
+class MetricsSnapshot:
+    """Instrumentation of one sensor at one point in time
+
+    Rates are measured since the previous snapshot (or the first packet).
+    ``latency`` is device-to-host latency relative to the fastest packet of
+    the last ``LATENCY_WINDOW`` seconds, since the sensor and host clocks
+    share no origin: a growing latency with steady inter-arrival times
+    points at the radio, long callback times at the host.
+    """
+    address: Optional[str]
+    device_tag: Optional[str]
+    packets: int
+    bytes: int
+    elapsed: float              # seconds since the first packet
+    packets_per_second: float
+    bytes_per_second: float
+    average_packets_per_second: float
+    inter_arrival: HistogramSummary
+    callback_time: HistogramSummary
+    latency: HistogramSummary
+    loss_percent: Optional[float] = None
+
+    def summary(self) -> str:
+        lines = [f"{self.device_tag or self.address}: {self.packets_per_second:.1f} pkt/s, "
+                 f"{self.bytes_per_second / 1024:.1f} KB/s, {self.packets} packets"
+                 + (f", {self.loss_percent:.2f}% lost" if self.loss_percent is not None else ""),
+                 f"  inter-arrival: {self.inter_arrival}",
+                 f"  callback:      {self.callback_time}",
+                 f"  latency:       {self.latency}"]
+        return "\n".join(lines)
+
+
+class SensorMetrics:
+    """Per-packet instrumentation for one sensor's notification path
+
+    ``record`` costs a few microseconds: three histogram updates and a
+    windowed minimum. All times come from ``time.perf_counter``, which is
+    monotonic.
+    """
+
+    def __init__(self):
+        self.inter_arrival = Histogram()
+        self.callback_time = Histogram()
+        self.latency = Histogram()
+        self.reset()
+
+    def reset(self):
+        self.inter_arrival.reset()
+        self.callback_time.reset()
+        self.latency.reset()
+        self.packets = 0
+        self.bytes = 0
+        self._first_arrival: Optional[float] = None
+        self._last_arrival: Optional[float] = None
+        self._last_raw: Optional[int] = None
+        self._device_seconds = 0.0
+        self._offsets = deque()     # (arrival, offset), offsets increasing
+        self._mark = (None, 0, 0)   # arrival, packets, bytes at the last snapshot
+
+    def record(self, data: bytes, arrival: float, callback_seconds: float):
+        """Account for one packet received at ``arrival`` (perf_counter seconds)"""
+        self.packets += 1
+        self.bytes += len(data)
+        if self._last_arrival is None:
+            self._first_arrival = arrival
+            self._mark = (arrival, 0, 0)
+        else:
+            self.inter_arrival.add((arrival - self._last_arrival) * 1000.0)
+        self._last_arrival = arrival
+        self.callback_time.add(callback_seconds * 1000.0)
+
+        if len(data) >= 4:
+            # Every payload starts with the uint32 device timestamp (us)
+            raw = int.from_bytes(data[:4], 'little')
+            if self._last_raw is not None:
+                self._device_seconds += ((raw - self._last_raw) & 0xFFFFFFFF) / 1e6
+            self._last_raw = raw
+            offset = arrival - self._device_seconds
+            offsets = self._offsets
+            while offsets and offsets[-1][1] >= offset:
+                offsets.pop()
+            offsets.append((arrival, offset))
+            while offsets[0][0] < arrival - LATENCY_WINDOW:
+                offsets.popleft()
+            self.latency.add((offset - offsets[0][1]) * 1000.0)
+
+    def snapshot(self, address: str = None, device_tag: str = None,
+                 loss_percent: float = None) -> MetricsSnapshot:
+        """Current counters and histogram summaries; starts a new rate interval"""
+        now = time.perf_counter()
+        mark_time, mark_packets, mark_bytes = self._mark
+        interval = now - mark_time if mark_time is not None else 0.0
+        elapsed = now - self._first_arrival if self._first_arrival is not None else 0.0
+        if mark_time is not None:
+            self._mark = (now, self.packets, self.bytes)
+        return MetricsSnapshot(
+            address=address,
+            device_tag=device_tag,
+            packets=self.packets,
+            bytes=self.bytes,
+            elapsed=elapsed,
+            packets_per_second=(self.packets - mark_packets) / interval if interval > 0 else 0.0,
+            bytes_per_second=(self.bytes - mark_bytes) / interval if interval > 0 else 0.0,
+            average_packets_per_second=self.packets / elapsed if elapsed > 0 else 0.0,
+            inter_arrival=self.inter_arrival.summary(),
+            callback_time=self.callback_time.summary(),
+            latency=self.latency.summary(),
+            loss_percent=loss_percent,
+        )
@@ -1,12 +1,137 @@
+from collections import namedtuple
+from typing import Dict, Optional, Tuple
+import struct
+import numpy as np
 from ..models.enums import PayloadMode
 from ..models.data_structures import (SensorData, Timestamp, Quaternion, 
                                     EulerAngles, Vector3, MagneticField, Status)
 
+# SensorData fields carried by each supported payload mode, in wire order
+PAYLOAD_FIELDS: Dict[PayloadMode, Tuple[str, ...]] = {
+    PayloadMode.EXTENDED_QUATERNION: ('timestamp', 'quaternion', 'free_acceleration',
+                                      'status', 'clipping_acc', 'clipping_gyr'),
+    PayloadMode.COMPLETE_QUATERNION: ('timestamp', 'quaternion', 'free_acceleration'),
+    PayloadMode.ORIENTATION_EULER: ('timestamp', 'euler_angles'),
+    PayloadMode.ORIENTATION_QUATERNION: ('timestamp', 'quaternion'),
+    PayloadMode.FREE_ACCELERATION: ('timestamp', 'free_acceleration'),
+    PayloadMode.EXTENDED_EULER: ('timestamp', 'euler_angles', 'free_acceleration',
+                                 'status', 'clipping_acc', 'clipping_gyr'),
+    PayloadMode.COMPLETE_EULER: ('timestamp', 'euler_angles', 'free_acceleration'),
+    PayloadMode.DELTA_QUANTITIES: ('timestamp', 'delta_q', 'delta_v'),
+    PayloadMode.DELTA_QUANTITIES_WITH_MAG: ('timestamp', 'delta_q', 'delta_v', 'magnetic_field'),
+    PayloadMode.RATE_QUANTITIES: ('timestamp', 'acceleration', 'angular_velocity'),
+    PayloadMode.RATE_QUANTITIES_WITH_MAG: ('timestamp', 'acceleration', 'angular_velocity',
+                                           'magnetic_field'),
+    PayloadMode.CUSTOM_MODE_1: ('timestamp', 'euler_angles', 'free_acceleration',
+                                'angular_velocity'),
+    PayloadMode.CUSTOM_MODE_2: ('timestamp', 'euler_angles', 'free_acceleration',
+                                'magnetic_field'),
+    PayloadMode.CUSTOM_MODE_3: ('timestamp', 'quaternion', 'angular_velocity'),
+    PayloadMode.CUSTOM_MODE_5: ('timestamp', 'quaternion', 'acceleration', 'angular_velocity'),
+}
+
+# Little-endian wire type and per-sample shape of every SensorData field
+FIELD_WIRE_TYPES = {
+    'timestamp': ('<u4', ()),
+    'quaternion': ('<f4', (4,)),
+    'euler_angles': ('<f4', (3,)),
+    'free_acceleration': ('<f4', (3,)),
+    'acceleration': ('<f4', (3,)),
+    'angular_velocity': ('<f4', (3,)),
+    'magnetic_field': ('<i2', (3,)),  # fixed point, 12 fractional bits
+    'delta_q': ('<f4', (4,)),
+    'delta_v': ('<f4', (3,)),
+    'status': ('<u2', ()),
+    'clipping_acc': ('u1', ()),
+    'clipping_gyr': ('u1', ()),
+}
+
+MAGNETIC_FIELD_SCALE = 2 ** 12
+
+
+def payload_dtype(payload_mode: PayloadMode) -> np.dtype:
+    """Packed structured dtype matching one packet of the given payload mode"""
+    if payload_mode not in PAYLOAD_FIELDS:
+        raise ValueError(f"Unsupported payload mode: {payload_mode}")
+    return np.dtype([(name,) + FIELD_WIRE_TYPES[name]
+                     for name in PAYLOAD_FIELDS[payload_mode]])
+
+
+PAYLOAD_DTYPES: Dict[PayloadMode, np.dtype] = {
+    mode: payload_dtype(mode) for mode in PAYLOAD_FIELDS
+}
+
+# Component names used to flatten each field into a record
+FIELD_COMPONENTS = {
+    'quaternion': ('w', 'x', 'y', 'z'),
+    'delta_q': ('w', 'x', 'y', 'z'),
+    'euler_angles': ('roll', 'pitch', 'yaw'),
+}
+
+
+def field_components(name: str) -> Tuple[str, ...]:
+    """Flattened record names of one SensorData field"""
+    shape = FIELD_WIRE_TYPES[name][1]
+    if not shape:
+        return (name,)
+    return tuple(f"{name}_{c}" for c in FIELD_COMPONENTS.get(name, ('x', 'y', 'z')))
+
+
+class PayloadPlan:
+    """Precompiled decoder for one payload mode
+
+    ``struct`` unpacks a whole packet with a single ``unpack_from`` call
+    into a flat tuple; ``slices`` gives, per field, the range of that tuple
+    holding its values. ``record`` is a namedtuple type with one slot per
+    value.
+    """
+
+    def __init__(self, payload_mode: PayloadMode):
+        dtype = PAYLOAD_DTYPES[payload_mode]
+        codes = []
+        self.slices: Dict[str, Tuple[int, int]] = {}
+        names = []
+        position = 0
+        for name in dtype.names:
+            wire_type, shape = FIELD_WIRE_TYPES[name]
+            count = shape[0] if shape else 1
+            codes.append(f"{count}{np.dtype(wire_type).char}")
+            self.slices[name] = (position, position + count)
+            names.extend(field_components(name))
+            position += count
+        self.payload_mode = payload_mode
+        self.struct = struct.Struct('<' + ''.join(codes))
+        self.record = namedtuple(
+            ''.join(part.title() for part in payload_mode.name.split('_')) + 'Record', names)
+        self._magnetic_field = self.slices.get('magnetic_field')
+
+    def unpack(self, data) -> tuple:
+        """Decode one packet into a flat tuple of raw wire values"""
+        return self.struct.unpack_from(data)
+
+    def decode(self, data) -> tuple:
+        """Decode one packet into a record, with the magnetic field scaled"""
+        values = self.struct.unpack_from(data)
+        if self._magnetic_field:
+            start, stop = self._magnetic_field
+            values = (values[:start]
+                      + tuple(v / MAGNETIC_FIELD_SCALE for v in values[start:stop])
+                      + values[stop:])
+        return self.record._make(values)
+
+
+PAYLOAD_PLANS: Dict[PayloadMode, PayloadPlan] = {
+    mode: PayloadPlan(mode) for mode in PAYLOAD_FIELDS
+}
+
+
 class PayloadParser:
     """Parser for different payload types"""
     
     def __init__(self, payload_mode: PayloadMode):
         self.payload_mode = payload_mode
+        self.dtype = PAYLOAD_DTYPES.get(payload_mode)
+        self.plan = PAYLOAD_PLANS.get(payload_mode)
         self.parse_map = {
             PayloadMode.EXTENDED_QUATERNION: self._parse_extended_quaternion,
             PayloadMode.COMPLETE_QUATERNION: self._parse_complete_quaternion,
@@ -31,6 +156,46 @@ class PayloadParser:
             raise ValueError(f"Unsupported payload mode: {self.payload_mode}")
         return self.parse_map[self.payload_mode](data)
 
+    def parse_record(self, data) -> tuple:
+        """Parse payload data into a flat record without building SensorData
+
+        One ``struct.unpack_from`` call on the whole packet, no intermediate
+        slices. Meant for the live path where packets arrive one at a time.
+        """
+        if self.plan is None:
+            raise ValueError(f"Unsupported payload mode: {self.payload_mode}")
+        return self.plan.decode(data)
+
+    @property
+    def packet_size(self) -> int:
+        """Size in bytes of one packet in the current payload mode"""
+        if self.dtype is None:
+            raise ValueError(f"Unsupported payload mode: {self.payload_mode}")
+        return self.dtype.itemsize
+
+    def parse_batch(self, buffer, count: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Decode ``count`` concatenated packets in a single pass
+
+        ``buffer`` is any bytes-like object holding packets back to back;
+        by default every complete packet in it is decoded. Returns one array
+        per field, keyed like the SensorData attributes. Values are identical
+        to the per-packet parsers (the magnetic field is scaled to float32,
+        which represents every int16 / 4096 exactly). Apart from the magnetic
+        field the arrays are read-only views onto ``buffer``.
+        """
+        size = self.packet_size
+        available = len(memoryview(buffer).cast('B')) // size
+        if count is None:
+            count = available
+        elif count > available:
+            raise ValueError(f"Buffer holds {available} packets, {count} requested")
+        records = np.frombuffer(buffer, dtype=self.dtype, count=count)
+        columns = {name: records[name] for name in self.dtype.names}
+        if 'magnetic_field' in columns:
+            columns['magnetic_field'] = (columns['magnetic_field'].astype(np.float32)
+                                         / np.float32(MAGNETIC_FIELD_SCALE))
+        return columns
+
     def _parse_extended_quaternion(self, data: bytes) -> SensorData:
         """Parse Extended Quaternion payload (36 bytes)
         - Timestamp (4)
@@ -0,0 +1,217 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+import os
+import struct
+import threading
+import time
+import numpy as np
+from ..models.enums import PayloadMode
+from .collector import SensorDataCollector
+
+# File header: magic, format version, payload mode (0 if unknown), BLE address
+LOG_MAGIC = b'MDOTLOG1'
+LOG_VERSION = 1
+LOG_HEADER = struct.Struct('<8sHH32s')
+# Record header: host receive time (time.time()), payload length
+RECORD_HEADER = struct.Struct('<dH')
+
+
+class BinaryRecorder:
+    """Append-only binary log of raw notification payloads
+
+    ``record`` only appends the payload and its host receive time to an
+    in-memory queue, so it is cheap enough to call from the BLE notification
+    handler. A background thread drains the queue every ``flush_interval``
+    seconds with one large buffered write and fsyncs the file every
+    ``fsync_interval`` seconds. ``stop`` returns only after everything handed
+    to ``record`` before it has been written and fsynced.
+
+    Records whose payload mode is known can be decoded again with
+    ``read_log``.
+    """
+
+    def __init__(self, path: str, payload_mode: PayloadMode = None, address: str = None,
+                 flush_interval: float = 0.05, fsync_interval: float = 1.0,
+                 buffer_size: int = 1 << 20, max_queue: int = 0):
+        self.path = path
+        self.payload_mode = payload_mode
+        self.address = address
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.buffer_size = buffer_size
+        self.max_queue = max_queue      # 0 means unbounded
+        self.bytes_written = 0
+        self.records_written = 0
+        self.dropped = 0
+        self.fsync_count = 0
+        self._queue = deque()
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._file_lock = threading.Lock()
+        self._last_fsync = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Records waiting to be written"""
+        return len(self._queue)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Open the log and start the writer thread"""
+        if self.is_running:
+            return
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._file = open(self.path, 'ab', buffering=self.buffer_size)
+        if new_file:
+            address = (self.address or '').encode('ascii', 'replace')[:32]
+            header = LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, int(self.payload_mode or 0), address)
+            self._file.write(header)
+            self.bytes_written += len(header)
+        self._last_fsync = time.monotonic()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def record(self, payload: bytes, host_time: float = None):
+        """Queue one payload for writing; never blocks"""
+        if self.max_queue and len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((time.time() if host_time is None else host_time, bytes(payload)))
+
+    def _drain(self):
+        """Write every queued record with a single write call"""
+        queue = self._queue
+        count = len(queue)
+        if not count:
+            return
+        chunk = bytearray()
+        pack = RECORD_HEADER.pack
+        for _ in range(count):
+            host_time, payload = queue.popleft()
+            chunk += pack(host_time, len(payload))
+            chunk += payload
+        self._file.write(chunk)
+        self.bytes_written += len(chunk)
+        self.records_written += count
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsync_count += 1
+        self._last_fsync = time.monotonic()
+
+    def _run(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                with self._file_lock:
+                    self._drain()
+                    if time.monotonic() - self._last_fsync >= self.fsync_interval:
+                        self._sync()
+            except Exception as e:
+                print(f"Error writing {self.path}: {e}")
+
+    def flush(self):
+        """Write and fsync everything queued so far"""
+        if self._file is None:
+            return
+        with self._file_lock:
+            self._drain()
+            self._sync()
+
+    def stop(self):
+        """Stop the writer thread, write what is left, fsync and close"""
+        if self._file is None:
+            return
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self._drain()
+        self._sync()
+        self._file.close()
+        self._file = None
+
+    def stats(self) -> dict:
+        """Counters of the recorder"""
+        return {
+            'bytes_written': self.bytes_written,
+            'records_written': self.records_written,
+            'queue_depth': self.queue_depth,
+            'dropped': self.dropped,
+            'fsync_count': self.fsync_count,
+        }
+
+    def __enter__(self) -> 'BinaryRecorder':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+@dataclass
+class RecordedLog:
+    """Contents of a binary log written by BinaryRecorder"""
+    payload_mode: Optional[PayloadMode]
+    address: Optional[str]
+    host_times: np.ndarray      # float64, time.time() at reception
+    lengths: np.ndarray         # uint16, payload length of each record
+    payloads: bytes             # all payloads back to back
+
+    def to_collector(self) -> SensorDataCollector:
+        """Decode the payloads into a collector in one batch"""
+        if self.payload_mode is None:
+            raise ValueError("The log does not record its payload mode")
+        collector = SensorDataCollector(self.payload_mode, self.address,
+                                        capacity=max(len(self.lengths), 1))
+        collector.add_batch(self.payloads, host_times=self.host_times)
+        return collector
+
+
+def read_log(path: str) -> RecordedLog:
+    """Read a binary log written by BinaryRecorder
+
+    When every record has the same length (always the case for a known
+    payload mode) the records are split with one vectorized pass; a
+    truncated last record is ignored.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, mode, address = LOG_HEADER.unpack_from(data)
+    if magic != LOG_MAGIC:
+        raise ValueError(f"{path} is not a Movella DOT binary log")
+    if version != LOG_VERSION:
+        raise ValueError(f"Unsupported log version {version}")
+    payload_mode = PayloadMode(mode) if mode else None
+    address = address.rstrip(b'\x00').decode('ascii') or None
+    body = memoryview(data)[LOG_HEADER.size:]
+
+    if len(body) >= RECORD_HEADER.size:
+        first_length = RECORD_HEADER.unpack_from(body)[1]
+        record_dtype = np.dtype([('host_time', '<f8'), ('length', '<u2'),
+                                 ('payload', f'V{first_length}')])
+        count = len(body) // record_dtype.itemsize
+        records = np.frombuffer(body, dtype=record_dtype, count=count)
+        if np.all(records['length'] == first_length):
+            return RecordedLog(payload_mode, address, records['host_time'].copy(),
+                               records['length'].copy(), records['payload'].tobytes())
+
+    host_times, lengths, payloads = [], [], []
+    offset = 0
+    while offset + RECORD_HEADER.size <= len(body):
+        host_time, length = RECORD_HEADER.unpack_from(body, offset)
+        offset += RECORD_HEADER.size
+        if offset + length > len(body):
+            break
+        host_times.append(host_time)
+        lengths.append(length)
+        payloads.append(bytes(body[offset:offset + length]))
+        offset += length
+    return RecordedLog(payload_mode, address, np.array(host_times, dtype=np.float64),
+                       np.array(lengths, dtype=np.uint16), b''.join(payloads))
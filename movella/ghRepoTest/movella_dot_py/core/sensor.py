@@ -1,12 +1,16 @@
-from typing import Optional
+from typing import Callable, Dict, List, Optional
 import struct
 import asyncio
 from bleak import BleakClient, BleakScanner
 from ..models.characteristics import MovellaDOTCharacteristics
 from ..models.data_structures import (SensorConfiguration, DeviceInfo, 
-                                    SensorData)
-from ..models.enums import PayloadMode, FilterProfile
+                                    SensorData, RetryPolicy)
+from ..models.enums import PayloadMode, FilterProfile, RecordingMessage
 from .collector import SensorDataCollector
+from .loss import LossIndex, LossTracker
+from .messages import START_RECORDING_FORMAT, build_message, parse_message
+from .metrics import MetricsSnapshot, SensorMetrics
+from .recorder import BinaryRecorder
 import time
 
 
@@ -18,9 +22,37 @@ class MovellaDOTSensor:
         self.config = config or SensorConfiguration()
         self.config.payload_mode = self._validate_and_adjust_payload_mode(self.config.payload_mode)
         self.data_collector = None
+        self.loss_tracker: Optional[LossTracker] = None
+        self.recorder: Optional[BinaryRecorder] = None
+        self._metrics = SensorMetrics()
         self._device_address = None
         self._device_name = None
         self._device_tag = None
+        self.device_info: Optional[DeviceInfo] = None
+        self.auto_reconnect = False
+        self.reconnect_policy = RetryPolicy(attempts=10, base_delay=0.5, max_delay=10.0)
+        self._client_factory: Callable[..., BleakClient] = BleakClient
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._measuring = False
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._acks: Dict[int, List[asyncio.Future]] = {}
+        self._ack_client: Optional[BleakClient] = None
+
+    @property
+    def device_address(self) -> Optional[str]:
+        """BLE address of the connected sensor"""
+        return self._device_address
+
+    @property
+    def device_name(self) -> Optional[str]:
+        """Advertised name of the connected sensor"""
+        return self._device_name
+
+    @property
+    def device_tag(self) -> Optional[str]:
+        """Device tag read from the sensor"""
+        return self._device_tag
 
     def _get_payload_characteristic(self, payload_mode: PayloadMode) -> str:
         """Return the appropriate payload characteristic based on payload mode"""
@@ -56,28 +88,132 @@ class MovellaDOTSensor:
         self._device_name = device.name
         print(f"Connecting to {device.name} ({device.address})...")
         
-        self.client = BleakClient(device.address)
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        self.client = self._create_client(device.address)
         await self.client.connect()
         self.is_connected = True
         print("Connected successfully")
 
+    def _create_client(self, address: str) -> BleakClient:
+        """Build a client that reports disconnects to this sensor"""
+        return self._client_factory(address, disconnected_callback=self._handle_disconnect)
+
+    async def connect(self, address: str, name: str = None,
+                      client_factory: Callable[..., BleakClient] = BleakClient):
+        """Connect to the sensor with the given BLE address
+
+        ``client_factory`` is called like ``BleakClient(address,
+        disconnected_callback=...)``; pass a fake BleakClient here to run
+        without hardware.
+        """
+        self._device_address = address
+        self._device_name = name
+        self._client_factory = client_factory
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        self.client = self._create_client(address)
+        await self.client.connect()
+        self.is_connected = True
+
+    async def wait_until_ready(self, timeout: float = 2.0):
+        """Wait until the sensor answers a GATT read of DEVICE_CONTROL
+
+        Raises ``asyncio.TimeoutError`` if no answer arrives within ``timeout``.
+        """
+        await asyncio.wait_for(self.client.read_gatt_char(self.chars.DEVICE_CONTROL), timeout)
+
     async def reconnect(self):
-        """Reconnect to the previously connected sensor"""
+        """Reconnect to the previously connected sensor
+
+        Re-applies the configuration and, if the sensor was streaming,
+        subscribes to the payload characteristic again and restarts the
+        measurement. Collected data is kept.
+        """
         if not self._device_address:
             raise Exception("No device address stored")
         
         print("Reconnecting...")
         try:
-            self.client = BleakClient(self._device_address)
+            self._loop = asyncio.get_running_loop()
+            self.client = self._create_client(self._device_address)
             await self.client.connect()
             self.is_connected = True
+            await self._apply_configuration()
+            if self._measuring:
+                await self._start_streaming()
             print("Reconnected successfully")
         except Exception as e:
             print(f"Reconnection failed: {e}")
             raise
+
+    def enable_auto_reconnect(self, policy: RetryPolicy = None):
+        """Reconnect and resume streaming automatically after a lost connection
+
+        Each outage is recorded as a gap in the data collector. ``policy``
+        sets how often and how patiently reconnection is retried.
+        """
+        self.auto_reconnect = True
+        if policy:
+            self.reconnect_policy = policy
+
+    def _handle_disconnect(self, client: BleakClient):
+        """Disconnect callback of the BLE client"""
+        if client is not self.client:
+            return
+        self.is_connected = False
+        if self._closing or not self.auto_reconnect or self._loop is None:
+            return
+        if self._reconnect_task and not self._reconnect_task.done():
+            return
+        print(f"Connection to {self._device_tag or self._device_address} lost")
+        if self.data_collector is not None and self._measuring:
+            self.data_collector.begin_gap()
+        self._loop.call_soon_threadsafe(self._schedule_reconnect)
+
+    def _schedule_reconnect(self):
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = self._loop.create_task(self._reconnect_with_backoff())
+
+    async def _reconnect_with_backoff(self):
+        """Retry ``reconnect`` following the reconnect policy"""
+        policy = self.reconnect_policy
+        for attempt in range(1, policy.attempts + 1):
+            if self._closing:
+                return
+            try:
+                await self.reconnect()
+                return
+            except Exception:
+                try:
+                    if self.client:
+                        await self.client.disconnect()
+                except Exception:
+                    pass
+                if attempt < policy.attempts:
+                    await asyncio.sleep(policy.delay(attempt))
+        print(f"Giving up reconnecting to {self._device_tag or self._device_address} "
+              f"after {policy.attempts} attempts")
             
     async def configure_sensor(self):
         """Configure sensor with the current configuration settings"""
+        await self._apply_configuration()
+        
+        # Initialize data collector
+        self.data_collector = SensorDataCollector(
+            self.config.payload_mode,
+            self._device_address
+        )
+        self.loss_tracker = LossTracker(self.data_collector, self.config.output_rate)
+
+    def packet_loss(self) -> Optional[LossIndex]:
+        """Samples lost so far according to the configured output rate"""
+        if self.loss_tracker is None:
+            return None
+        return self.loss_tracker.index()
+
+    async def _apply_configuration(self):
+        """Write output rate, filter profile and payload mode to the sensor"""
         # Configure output rate
         rate_bytes = struct.pack('<H', self.config.output_rate)
         rate_config = bytearray([
@@ -123,12 +259,6 @@ class MovellaDOTSensor:
         payload_config = bytearray([1, 1, self.config.payload_mode])
         await self.client.write_gatt_char(self.chars.MEASUREMENT_CONTROL, payload_config)
         print(f"Configured payload mode: {self.config.payload_mode.name}")
-        
-        # Initialize data collector
-        self.data_collector = SensorDataCollector(
-            self.config.payload_mode,
-            self._device_address
-        )
 
     def _validate_and_adjust_payload_mode(self, requested_mode: PayloadMode) -> PayloadMode:
         """Validate and adjust payload mode if necessary"""
@@ -150,56 +280,58 @@ class MovellaDOTSensor:
         return requested_mode
 
     def notification_handler(self, sender: int, data: bytearray):
-        """Handle incoming sensor data notifications"""
+        """Handle incoming sensor data notifications
+
+        Runs on the BLE callback path, so it only decodes and stores the
+        packet, and hands the raw bytes to the recorder if one is attached.
+        Use ``LiveConsoleView`` to display the incoming data and ``metrics``
+        to see how the notification path is keeping up.
+        """
+        arrival = time.perf_counter()
         try:
+            host_time = time.time()
+            if self.recorder is not None:
+                self.recorder.record(data, host_time)
             if self.data_collector:
-                parsed_data = self.data_collector.parser.parse(data)
-                self.data_collector.add_data(data)
-                
-                print(f"\nReal-time Sensor Data from {self._device_tag} ({self._device_address}):")
-                
-                if parsed_data.quaternion:
-                    print(f"Quaternion (w,x,y,z): {parsed_data.quaternion.w:.3f}, "
-                          f"{parsed_data.quaternion.x:.3f}, {parsed_data.quaternion.y:.3f}, "
-                          f"{parsed_data.quaternion.z:.3f}")
-                    
-                if parsed_data.euler_angles:
-                    print(f"Euler (roll,pitch,yaw): {parsed_data.euler_angles.roll:.1f}°, "
-                          f"{parsed_data.euler_angles.pitch:.1f}°, {parsed_data.euler_angles.yaw:.1f}°")
-                    
-                if parsed_data.acceleration:
-                    print(f"Acceleration (x,y,z): {parsed_data.acceleration.x:.2f}, "
-                          f"{parsed_data.acceleration.y:.2f}, {parsed_data.acceleration.z:.2f}")
-                    
-                if parsed_data.free_acceleration:
-                    print(f"Free Acceleration (x,y,z): {parsed_data.free_acceleration.x:.2f}, "
-                          f"{parsed_data.free_acceleration.y:.2f}, {parsed_data.free_acceleration.z:.2f}")
-                    
-                if parsed_data.angular_velocity:
-                    print(f"Angular Velocity (x,y,z): {parsed_data.angular_velocity.x:.2f}, "
-                          f"{parsed_data.angular_velocity.y:.2f}, {parsed_data.angular_velocity.z:.2f}")
-                    
-                if parsed_data.magnetic_field:
-                    print(f"Magnetic Field (x,y,z): {parsed_data.magnetic_field.x:.2f}, "
-                          f"{parsed_data.magnetic_field.y:.2f}, {parsed_data.magnetic_field.z:.2f}")
-                    
-                if parsed_data.status:
-                    print("\nStatus Information:")
-                    if parsed_data.status.is_clipping_acc_x(): print("- Accelerometer X clipping")
-                    if parsed_data.status.is_clipping_acc_y(): print("- Accelerometer Y clipping")
-                    if parsed_data.status.is_clipping_acc_z(): print("- Accelerometer Z clipping")
-                    if parsed_data.status.is_clipping_gyr_x(): print("- Gyroscope X clipping")
-                    if parsed_data.status.is_clipping_gyr_y(): print("- Gyroscope Y clipping")
-                    if parsed_data.status.is_clipping_gyr_z(): print("- Gyroscope Z clipping")
-                    if parsed_data.status.is_mag_new(): print("- New magnetic field data")
-                
+                self.data_collector.add_data(data, host_time)
         except Exception as e:
             print(f"Error handling notification: {e}")
+        self._metrics.record(data, arrival, time.perf_counter() - arrival)
+
+    def metrics(self) -> MetricsSnapshot:
+        """Throughput, inter-arrival, callback time and latency of the notification path"""
+        loss = self.loss_tracker.loss_percent if self.loss_tracker is not None else None
+        return self._metrics.snapshot(self._device_address, self._device_tag, loss)
+
+    def reset_metrics(self):
+        """Start the instrumentation over"""
+        self._metrics.reset()
+
+    def attach_recorder(self, path: str, **options) -> BinaryRecorder:
+        """Log every raw payload to ``path`` with a started BinaryRecorder
+
+        Stop the returned recorder (or call ``detach_recorder``) to flush it.
+        """
+        self.detach_recorder()
+        self.recorder = BinaryRecorder(path, self.config.payload_mode,
+                                       self._device_address, **options)
+        self.recorder.start()
+        return self.recorder
+
+    def detach_recorder(self):
+        """Stop and remove the recorder, flushing everything it received"""
+        if self.recorder is not None:
+            recorder, self.recorder = self.recorder, None
+            recorder.stop()
 
     async def start_measurement(self):
         """Start measurement with notification handling"""
         print("Starting measurement...")
-        
+        await self._start_streaming()
+        self._measuring = True
+
+    async def _start_streaming(self):
+        """Subscribe to the payload characteristic and start the measurement"""
         payload_char = self._get_payload_characteristic(self.config.payload_mode)
         
         await self.client.start_notify(
@@ -215,6 +347,7 @@ class MovellaDOTSensor:
     async def stop_measurement(self):
         """Stop measurement and notifications"""
         print("Stopping measurement...")
+        self._measuring = False
         
         await self.client.write_gatt_char(
             self.chars.MEASUREMENT_CONTROL, 
@@ -224,27 +357,79 @@ class MovellaDOTSensor:
         payload_char = self._get_payload_characteristic(self.config.payload_mode)
         await self.client.stop_notify(payload_char)
 
-    async def start_recording(self, duration_seconds: int = 3600):
-        """Start recording data on the sensor"""
+    def _handle_ack(self, sender: int, data: bytearray):
+        """MESSAGE_ACK handler: resolve the oldest message waiting on this ReID"""
+        try:
+            message = parse_message(data)
+        except ValueError:
+            return
+        for future in self._acks.get(message.reid, []):
+            if not future.done():
+                future.set_result(message.payload[0] if message.payload else 0)
+                return
+
+    async def send_message(self, reid: int, payload: bytes = b'', timeout: float = 2.0,
+                           wait_ack: bool = True) -> Optional[float]:
+        """Write a MESSAGE_CONTROL message and wait for its acknowledgement
+
+        Returns the seconds from the write to the acknowledgement. Raises
+        ``asyncio.TimeoutError`` when no acknowledgement arrives within
+        ``timeout`` and ``ValueError`` when the sensor rejects the message.
+        With ``wait_ack=False`` the message is only written and None returned.
+        """
+        if not wait_ack:
+            await self.client.write_gatt_char(self.chars.MESSAGE_CONTROL, build_message(reid, payload))
+            return None
+        if self._ack_client is not self.client:
+            await self.client.start_notify(self.chars.MESSAGE_ACK, self._handle_ack)
+            self._ack_client = self.client
+        ack = asyncio.get_running_loop().create_future()
+        waiters = self._acks.setdefault(reid, [])
+        waiters.append(ack)
+        start = time.perf_counter()
+        try:
+            await self.client.write_gatt_char(self.chars.MESSAGE_CONTROL, build_message(reid, payload))
+            result = await asyncio.wait_for(ack, timeout)
+        finally:
+            waiters.remove(ack)
+        latency = time.perf_counter() - start
+        if result:
+            name = reid.name if isinstance(reid, RecordingMessage) else f"0x{reid:02X}"
+            raise ValueError(f"{name} rejected by the sensor (result {result})")
+        return latency
+
+    async def start_recording(self, duration_seconds: int = 3600, start_time: int = None,
+                              wait_ack: bool = False) -> Optional[float]:
+        """Start recording data on the sensor
+
+        ``start_time`` is the UTC second the recording starts at, now by
+        default; give several sensors the same one to start them together.
+        That a future second delays the start until it comes is how the
+        simulator models the DOT; it has not been checked on hardware.
+        With ``wait_ack`` returns the seconds until the sensor acknowledged
+        the message (see ``send_message``), otherwise None.
+        """
         print(f"Starting recording for {duration_seconds} seconds...")
-        current_time = int(time.time())
-        message = bytearray([0x01, 0x07, 0x40]) + struct.pack("<I", current_time) + struct.pack("<H", duration_seconds)
-        checksum = (256 - sum(message) % 256) % 256
-        message.append(checksum)
-        await self.client.write_gatt_char(self.chars.MESSAGE_CONTROL, message)
-
-    async def stop_recording(self):
-        """Stop recording data on the sensor"""
+        current_time = int(time.time()) if start_time is None else int(start_time)
+        return await self.send_message(RecordingMessage.START_RECORDING,
+                                       START_RECORDING_FORMAT.pack(current_time, duration_seconds),
+                                       wait_ack=wait_ack)
+
+    async def stop_recording(self, wait_ack: bool = False) -> Optional[float]:
+        """Stop recording data on the sensor; with ``wait_ack`` returns the acknowledgement time"""
         print("Stopping recording...")
-        message = bytearray([0x01, 0x01, 0x41, 0xBD])
-        await self.client.write_gatt_char(self.chars.MESSAGE_CONTROL, message)
+        return await self.send_message(RecordingMessage.STOP_RECORDING, wait_ack=wait_ack)
 
     async def disconnect(self):
         """Disconnect from the sensor"""
+        self._closing = True
+        if self._reconnect_task and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
         if self.client and self.is_connected:
             await self.client.disconnect()
             self.is_connected = False
             print("Disconnected from sensor")
+        self.detach_recorder()
 
     def get_collected_data(self):
         """Get the collected data in various formats"""
@@ -254,7 +439,9 @@ class MovellaDOTSensor:
         return {
             'device_tag': self._device_tag,
             'mac_address': self._device_address,
-            'timestamps': self.data_collector.get_timestamps(),
+            'timestamps': self.data_collector.get_unwrapped_timestamps(),
+            'host_timestamps': self.data_collector.get_host_timestamps(),
+            'packet_loss': self.packet_loss(),
             'quaternions': self.data_collector.get_quaternions(),
             'euler_angles': self.data_collector.get_euler_angles(),
             'accelerations': self.data_collector.get_accelerations()
@@ -296,7 +483,7 @@ class MovellaDOTSensor:
             output_rate = int.from_bytes(control_data[24:26], byteorder='little')
             filter_profile = FilterProfile(control_data[26])
             
-            return DeviceInfo(
+            self.device_info = DeviceInfo(
                 mac_address=mac,
                 firmware_version=firmware_version,
                 serial_number=serial_number,
@@ -305,6 +492,8 @@ class MovellaDOTSensor:
                 output_rate=output_rate,
                 filter_profile=filter_profile
             )
+            self._device_tag = device_tag
+            return self.device_info
         except Exception as e:
             print(f"Error getting device info: {e}")
             raise
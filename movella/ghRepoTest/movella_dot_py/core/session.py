@@ -0,0 +1,462 @@
+from dataclasses import asdict
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import os
+import re
+import time
+import numpy as np
+from ..models.data_structures import DataGap
+from ..models.enums import PayloadMode
+from .collector import COLUMN_SPECS, HOST_TIME_FIELD, SensorDataCollector
+from .loss import LossIndex, build_loss_index
+from .parser import PAYLOAD_FIELDS
+from .timebase import TimestampUnwrapper, unwrap_timestamps
+
+SESSION_FORMAT = "movella-session"
+SESSION_VERSION = 2
+READABLE_VERSIONS = (1, 2)      # version 1 has no unwrapped timestamp channel
+META_FILE = "meta.json"
+INDEX_FILE = "index.npz"
+DEFAULT_CHUNK_SIZE = 4096
+
+# Monotonic int64 device time (us) of every sample; time-range queries run on it
+UNWRAPPED_TIMESTAMP_FIELD = 'unwrapped_timestamp'
+CHANNEL_SPECS = dict(COLUMN_SPECS, **{UNWRAPPED_TIMESTAMP_FIELD: (np.int64, ())})
+
+
+def _channel_dtype(name: str) -> np.dtype:
+    """Little-endian on-disk dtype of a channel"""
+    return np.dtype(CHANNEL_SPECS[name][0]).newbyteorder('<')
+
+
+def _chunk_min(values: np.ndarray) -> np.ndarray:
+    return np.fmin.reduce(values, axis=0)
+
+
+def _chunk_max(values: np.ndarray) -> np.ndarray:
+    return np.fmax.reduce(values, axis=0)
+
+
+class SensorWriter:
+    """Appends the channels of one sensor to a session
+
+    Each channel is a flat binary file of fixed-size rows. Rows are grouped
+    into chunks of ``chunk_size`` rows, and the minimum and maximum of every
+    channel (per component) are kept for each chunk. The wrapped uint32
+    device timestamps are also stored unwrapped, continuing across appends.
+    """
+
+    def __init__(self, directory: str, key: str, payload_mode: PayloadMode,
+                 chunk_size: int, address: str = None, device_tag: str = None):
+        self.directory = directory
+        self.key = key
+        self.payload_mode = payload_mode
+        self.chunk_size = chunk_size
+        self.address = address
+        self.device_tag = device_tag
+        self.channels = PAYLOAD_FIELDS[payload_mode] + (HOST_TIME_FIELD, UNWRAPPED_TIMESTAMP_FIELD)
+        self.size = 0
+        self.gaps: List[DataGap] = []
+        self.metadata: Dict = {}
+        self._unwrapper = TimestampUnwrapper()
+        self._mins: Dict[str, List[np.ndarray]] = {name: [] for name in self.channels}
+        self._maxs: Dict[str, List[np.ndarray]] = {name: [] for name in self.channels}
+        os.makedirs(directory, exist_ok=True)
+        self._files = {name: open(os.path.join(directory, f"{name}.bin"), 'wb')
+                       for name in self.channels}
+
+    def append(self, columns: Dict[str, np.ndarray]):
+        """Append rows given as one array per channel, as from ``get_columns``
+
+        A missing ``host_time`` channel is stored as NaN; the unwrapped
+        timestamps are computed here.
+        """
+        missing = [name for name in PAYLOAD_FIELDS[self.payload_mode] if name not in columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        arrays = {name: np.ascontiguousarray(columns[name], dtype=_channel_dtype(name))
+                  for name in self.channels
+                  if name in columns and name != UNWRAPPED_TIMESTAMP_FIELD}
+        if HOST_TIME_FIELD not in arrays:
+            count = len(next(iter(arrays.values())))
+            arrays[HOST_TIME_FIELD] = np.full(count, np.nan, dtype=_channel_dtype(HOST_TIME_FIELD))
+        counts = {len(array) for array in arrays.values()}
+        if len(counts) > 1:
+            raise ValueError("Columns have different lengths")
+        count = counts.pop() if counts else 0
+        if not count:
+            return
+        arrays[UNWRAPPED_TIMESTAMP_FIELD] = self._unwrapper.unwrap_array(
+            arrays['timestamp'], arrays[HOST_TIME_FIELD])
+        for name, array in arrays.items():
+            self._files[name].write(array.tobytes())
+            self._update_stats(name, array)
+        self.size += count
+
+    def _update_stats(self, name: str, array: np.ndarray):
+        """Fold new rows into the statistics of the chunks they fall in"""
+        mins, maxs = self._mins[name], self._maxs[name]
+        position = 0
+        while position < len(array):
+            row = self.size + position
+            offset = row % self.chunk_size
+            part = array[position:position + self.chunk_size - offset]
+            if offset == 0:
+                mins.append(_chunk_min(part))
+                maxs.append(_chunk_max(part))
+            else:
+                mins[-1] = np.fmin(mins[-1], _chunk_min(part))
+                maxs[-1] = np.fmax(maxs[-1], _chunk_max(part))
+            position += len(part)
+
+    def append_collector(self, collector: SensorDataCollector):
+        """Append every sample and gap of a collector"""
+        if collector.payload_mode != self.payload_mode:
+            raise ValueError(f"Collector payload mode {collector.payload_mode.name} "
+                             f"does not match {self.payload_mode.name}")
+        first_row = self.size
+        self.append(collector.get_columns())
+        for gap in collector.gaps:
+            gap = DataGap(**asdict(gap))
+            if gap.sample_index is not None:
+                gap.sample_index += first_row
+            self.gaps.append(gap)
+
+    def flush(self):
+        """Write buffered rows and the chunk index to disk"""
+        for f in self._files.values():
+            f.flush()
+        index = {}
+        for name in self.channels:
+            dtype = _channel_dtype(name)
+            shape = CHANNEL_SPECS[name][1]
+            empty = np.empty((0,) + shape, dtype=dtype)
+            index[f"min_{name}"] = np.array(self._mins[name], dtype=dtype) if self._mins[name] else empty
+            index[f"max_{name}"] = np.array(self._maxs[name], dtype=dtype) if self._maxs[name] else empty
+        np.savez(os.path.join(self.directory, INDEX_FILE), **index)
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+    def describe(self) -> dict:
+        """Entry of this sensor in the session metadata"""
+        return {
+            'directory': os.path.basename(self.directory),
+            'address': self.address,
+            'device_tag': self.device_tag,
+            'payload_mode': int(self.payload_mode),
+            'size': self.size,
+            'channels': {name: {'dtype': _channel_dtype(name).str,
+                                'shape': list(CHANNEL_SPECS[name][1])}
+                         for name in self.channels},
+            'gaps': [asdict(gap) for gap in self.gaps],
+            'metadata': self.metadata,
+        }
+
+
+class SessionWriter:
+    """Writes a session directory
+
+    Layout::
+
+        meta.json               session and sensor descriptions
+        <sensor>/<channel>.bin  raw little-endian rows, one file per channel
+        <sensor>/index.npz      per-chunk min/max of every channel
+
+    ``metadata`` is stored as is in ``meta.json`` and must be JSON
+    serializable. Use as a context manager, or call ``close``.
+    """
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE, metadata: dict = None):
+        if os.path.exists(os.path.join(path, META_FILE)):
+            raise FileExistsError(f"A session already exists in {path}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.path = path
+        self.chunk_size = chunk_size
+        self.metadata = dict(metadata or {})
+        self.created = time.time()
+        self.sensors: Dict[str, SensorWriter] = {}
+        os.makedirs(path, exist_ok=True)
+
+    def _directory_for(self, key: str) -> str:
+        base = re.sub(r'[^A-Za-z0-9_-]', '', key) or "sensor"
+        name, suffix = base, 1
+        used = {os.path.basename(writer.directory) for writer in self.sensors.values()}
+        while name in used:
+            suffix += 1
+            name = f"{base}_{suffix}"
+        return os.path.join(self.path, name)
+
+    def add_sensor(self, payload_mode: PayloadMode, key: str = None, address: str = None,
+                   device_tag: str = None) -> SensorWriter:
+        """Start a new sensor; ``key`` defaults to the address or device tag"""
+        if payload_mode not in PAYLOAD_FIELDS:
+            raise ValueError(f"Unsupported payload mode: {payload_mode}")
+        key = key or address or device_tag or f"sensor{len(self.sensors) + 1}"
+        if key in self.sensors:
+            raise ValueError(f"Sensor {key} is already in the session")
+        writer = SensorWriter(self._directory_for(key), key, payload_mode, self.chunk_size,
+                              address, device_tag)
+        self.sensors[key] = writer
+        return writer
+
+    def write_collector(self, collector: SensorDataCollector, key: str = None,
+                        device_tag: str = None) -> SensorWriter:
+        """Add a sensor holding everything a collector has collected"""
+        writer = self.add_sensor(collector.payload_mode, key, collector.mac_address, device_tag)
+        writer.append_collector(collector)
+        return writer
+
+    def flush(self):
+        """Make everything written so far readable by ``Session``"""
+        for writer in self.sensors.values():
+            writer.flush()
+        meta = {
+            'format': SESSION_FORMAT,
+            'version': SESSION_VERSION,
+            'chunk_size': self.chunk_size,
+            'created': self.created,
+            'metadata': self.metadata,
+            'sensors': {key: writer.describe() for key, writer in self.sensors.items()},
+        }
+        temporary = os.path.join(self.path, META_FILE + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temporary, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        """Flush and close every channel file"""
+        self.flush()
+        for writer in self.sensors.values():
+            writer.close()
+
+    def __enter__(self) -> 'SessionWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class SessionSensor:
+    """Read access to one sensor of a session
+
+    Channels are opened with ``np.memmap`` on first access, so nothing is
+    read until it is needed. Range and threshold queries consult the chunk
+    index first and only read the chunks that can contain matching rows.
+    """
+
+    def __init__(self, directory: str, key: str, description: dict, chunk_size: int):
+        self.directory = directory
+        self.key = key
+        self.address: Optional[str] = description.get('address')
+        self.device_tag: Optional[str] = description.get('device_tag')
+        self.payload_mode = PayloadMode(description['payload_mode'])
+        self.size: int = description['size']
+        self.chunk_size = chunk_size
+        self.channels = tuple(description['channels'])
+        self.gaps = [DataGap(**gap) for gap in description.get('gaps', [])]
+        self.metadata: Dict = description.get('metadata', {})
+        self._specs = {name: (np.dtype(spec['dtype']), tuple(spec['shape']))
+                       for name, spec in description['channels'].items()}
+        self._columns: Dict[str, np.ndarray] = {}
+        self._index = None
+        self._unwrapped: Optional[np.ndarray] = None
+        self._time_bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def chunk_count(self) -> int:
+        return -(-self.size // self.chunk_size)
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map of a whole channel"""
+        if name not in self._columns:
+            if name not in self._specs:
+                raise KeyError(f"Channel {name} is not in the session")
+            dtype, shape = self._specs[name]
+            if self.size == 0:
+                self._columns[name] = np.empty((0,) + shape, dtype=dtype)
+            else:
+                self._columns[name] = np.memmap(os.path.join(self.directory, f"{name}.bin"),
+                                                dtype=dtype, mode='r', shape=(self.size,) + shape)
+        return self._columns[name]
+
+    def chunk_bounds(self, chunk: int) -> Tuple[int, int]:
+        """First and one-past-last row of a chunk"""
+        start = chunk * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    def chunk_stats(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-chunk minimum and maximum of a channel, shape (chunks,) + channel shape"""
+        if self._index is None:
+            self._index = np.load(os.path.join(self.directory, INDEX_FILE))
+        return self._index[f"min_{name}"], self._index[f"max_{name}"]
+
+    def unwrapped_timestamps(self) -> np.ndarray:
+        """Monotonic int64 device time (us) of every row
+
+        Sessions written before this channel existed are unwrapped in memory.
+        """
+        if UNWRAPPED_TIMESTAMP_FIELD in self._specs:
+            return self.column(UNWRAPPED_TIMESTAMP_FIELD)
+        if self._unwrapped is None:
+            host_times = self.column(HOST_TIME_FIELD) if HOST_TIME_FIELD in self._specs else None
+            self._unwrapped = unwrap_timestamps(self.column('timestamp'), host_times)
+        return self._unwrapped
+
+    def time_bounds(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-chunk minimum and maximum unwrapped timestamp"""
+        if UNWRAPPED_TIMESTAMP_FIELD in self._specs:
+            return self.chunk_stats(UNWRAPPED_TIMESTAMP_FIELD)
+        if self._time_bounds is None:
+            unwrapped = self.unwrapped_timestamps()
+            starts = np.arange(0, self.size, self.chunk_size)
+            empty = np.empty(0, dtype=np.int64)
+            self._time_bounds = ((np.minimum.reduceat(unwrapped, starts),
+                                  np.maximum.reduceat(unwrapped, starts))
+                                 if self.size else (empty, empty))
+        return self._time_bounds
+
+    def _collect_rows(self, chunks: Iterable[int], name: str, test) -> np.ndarray:
+        column = self.unwrapped_timestamps() if name == UNWRAPPED_TIMESTAMP_FIELD else self.column(name)
+        rows = []
+        for chunk in chunks:
+            start, stop = self.chunk_bounds(int(chunk))
+            rows.append(np.flatnonzero(test(column[start:stop])) + start)
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def chunks_between(self, start: int = None, end: int = None) -> np.ndarray:
+        """Chunks that may hold unwrapped timestamps in ``[start, end]``"""
+        t_min, t_max = self.time_bounds()
+        selected = np.ones(len(t_min), dtype=bool)
+        if start is not None:
+            selected &= t_max >= start
+        if end is not None:
+            selected &= t_min <= end
+        return np.flatnonzero(selected)
+
+    def rows_between(self, start: int = None, end: int = None) -> np.ndarray:
+        """Rows whose timestamp is in ``[start, end]``
+
+        Bounds are unwrapped device microseconds, as ``unwrapped_timestamps``:
+        the raw timestamp until the first wrap of the uint32 counter.
+        """
+        def test(timestamps):
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start is not None:
+                mask &= timestamps >= start
+            if end is not None:
+                mask &= timestamps <= end
+            return mask
+        return self._collect_rows(self.chunks_between(start, end), UNWRAPPED_TIMESTAMP_FIELD, test)
+
+    def chunks_where(self, name: str, above=None, below=None, component: int = None) -> np.ndarray:
+        """Chunks that may hold values of a channel ``> above`` and ``< below``"""
+        lows, highs = self.chunk_stats(name)
+        if component is not None:
+            lows, highs = lows[:, component], highs[:, component]
+        selected = np.ones(lows.shape, dtype=bool)
+        if above is not None:
+            selected &= highs > above
+        if below is not None:
+            selected &= lows < below
+        if selected.ndim > 1:
+            selected = selected.reshape(len(selected), -1).any(axis=1)
+        return np.flatnonzero(selected)
+
+    def rows_where(self, name: str, above=None, below=None, component: int = None) -> np.ndarray:
+        """Rows where a channel is ``> above`` and ``< below``
+
+        For vector channels the test applies to ``component``, or to each
+        component when it is None, in which case a row matches when any
+        component passes.
+        """
+        def test(values):
+            if component is not None:
+                values = values[:, component]
+            mask = np.ones(values.shape, dtype=bool)
+            if above is not None:
+                mask &= values > above
+            if below is not None:
+                mask &= values < below
+            return mask.reshape(len(mask), -1).any(axis=1) if mask.ndim > 1 else mask
+        return self._collect_rows(self.chunks_where(name, above, below, component), name, test)
+
+    def read(self, rows: np.ndarray = None, channels: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        """Copy the given rows (all by default) of the given channels into memory"""
+        channels = self.channels if channels is None else tuple(channels)
+        if rows is None:
+            return {name: np.array(self.column(name)) for name in channels}
+        return {name: self.column(name)[rows] for name in channels}
+
+    def between(self, start: int = None, end: int = None,
+                channels: Iterable[str] = None) -> Dict[str, np.ndarray]:
+        """Channels of the rows whose unwrapped timestamp is in ``[start, end]``"""
+        return self.read(self.rows_between(start, end), channels)
+
+    def packet_loss(self, output_rate: int = None) -> Optional[LossIndex]:
+        """Loss index saved with the sensor, or computed for ``output_rate``
+
+        Without a saved index, the ``output_rate`` metadata is used when
+        present; returns None when the rate is unknown.
+        """
+        if output_rate is None and 'packet_loss' in self.metadata:
+            return LossIndex.from_dict(self.metadata['packet_loss'])
+        output_rate = output_rate or self.metadata.get('output_rate')
+        if not output_rate:
+            return None
+        host_times = self.column(HOST_TIME_FIELD) if HOST_TIME_FIELD in self.channels else None
+        return build_loss_index(self.column('timestamp'), output_rate, host_times)
+
+    def to_collector(self) -> SensorDataCollector:
+        """Load the whole sensor into a new SensorDataCollector"""
+        collector = SensorDataCollector(self.payload_mode, self.address,
+                                        capacity=max(self.size, 1))
+        collector.add_columns({name: self.column(name) for name in self.channels})
+        collector.gaps = [DataGap(**asdict(gap)) for gap in self.gaps]
+        return collector
+
+
+class Session:
+    """A session directory written by ``SessionWriter``
+
+    Opening only reads ``meta.json``; channel data and chunk indexes are
+    loaded lazily by each ``SessionSensor``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get('format') != SESSION_FORMAT:
+            raise ValueError(f"{path} is not a Movella DOT session")
+        if meta.get('version') not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported session version {meta.get('version')}")
+        self.chunk_size: int = meta['chunk_size']
+        self.created: float = meta.get('created', 0.0)
+        self.metadata: Dict = meta.get('metadata', {})
+        self.sensors: Dict[str, SessionSensor] = {
+            key: SessionSensor(os.path.join(path, description['directory']), key,
+                               description, self.chunk_size)
+            for key, description in meta['sensors'].items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.sensors)
+
+    def __iter__(self):
+        return iter(self.sensors.values())
+
+    def __getitem__(self, key: str) -> SessionSensor:
+        return self.sensors[key]
+
+
+def save_session(path: str, collectors: Dict[str, SensorDataCollector],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, metadata: dict = None) -> Session:
+    """Write collectors, keyed by sensor name, to a new session and open it"""
+    with SessionWriter(path, chunk_size, metadata) as writer:
+        for key, collector in collectors.items():
+            writer.write_collector(collector, key)
+    return Session(path)
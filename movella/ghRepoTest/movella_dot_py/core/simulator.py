@@ -0,0 +1,498 @@
+from dataclasses import dataclass, field
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+import asyncio
+import math
+import random
+import struct
+import time
+from ..models.characteristics import MovellaDOTCharacteristics
+from ..models.enums import FilterProfile, MessageId, OutputRate, PayloadMode, RecordingMessage
+from .messages import (FILE_DATA_HEADER, FILE_DATA_REQUEST, FILE_INFO_FORMAT, FILE_INFO_REQUEST,
+                       FLASH_INFO_FORMAT, MAX_PAYLOAD, START_RECORDING_FORMAT, build_message,
+                       parse_message)
+from .parser import FIELD_WIRE_TYPES, MAGNETIC_FIELD_SCALE, PAYLOAD_FIELDS, PAYLOAD_PLANS
+
+CHARS = MovellaDOTCharacteristics()
+DEVICE_INFO = CHARS.BASE_UUID.format(0x1001)
+PAYLOAD_CHARACTERISTICS = (CHARS.LONG_PAYLOAD, CHARS.MEDIUM_PAYLOAD, CHARS.SHORT_PAYLOAD)
+DEVICE_CONTROL_SIZE = 32
+
+# DEVICE_CONTROL visit index bits
+VISIT_IDENTIFY = 0x01
+VISIT_POWER_OFF = 0x02
+VISIT_DEVICE_TAG = 0x08
+VISIT_OUTPUT_RATE = 0x10
+VISIT_FILTER_PROFILE = 0x20
+
+# MESSAGE_ACK results
+ACK_OK = 0x00
+ACK_INVALID = 0x01
+
+
+@dataclass
+class SimulationOptions:
+    """Link and device behaviour of simulated sensors"""
+    latency: float = 0.0            # seconds from sampling to delivery
+    jitter: float = 0.0             # extra random delay, uniform in [0, jitter] seconds
+    loss: float = 0.0               # probability that a notification is dropped
+    drop_after: float = None        # seconds after connecting before the link drops
+    connect_delay: float = 0.0      # seconds taken by connect()
+    clock_drift_ppm: float = 0.0    # sensor clock speed error
+    speed: float = 1.0              # 1.0 is real time, 0 emits as fast as possible
+    export_bandwidth: float = 0.0   # bytes/s of recording data on MESSAGE_NOTIFY, 0 unlimited
+    seed: int = None
+
+
+@dataclass
+class SimulatedRecording:
+    """One recording on the flash of a simulated sensor"""
+    start_time: int                 # UTC seconds from the start message
+    output_rate: int
+    payload_mode: PayloadMode
+    records: int
+    clock_start_us: int             # device timestamp of the first record
+
+    @property
+    def record_size(self) -> int:
+        return PAYLOAD_PLANS[self.payload_mode].struct.size
+
+    def record_bytes(self, first: int, count: int) -> bytes:
+        """Records ``first`` to ``first + count``, generated like streamed packets"""
+        plan = PAYLOAD_PLANS[self.payload_mode]
+        period = 1.0 / self.output_rate
+        return b''.join(
+            plan.struct.pack(*_sample_values(
+                self.payload_mode,
+                (self.clock_start_us + int(index * period * 1e6)) & 0xFFFFFFFF,
+                index * period))
+            for index in range(first, first + count))
+
+
+@dataclass
+class SimulatedDOT:
+    """State of one simulated sensor, kept across connections"""
+    address: str
+    device_tag: str
+    serial_number: int
+    firmware_version: tuple = (2, 6, 0)
+    product_code: str = "XS-T01"
+    output_rate: int = int(OutputRate.RATE_60)
+    filter_profile: FilterProfile = FilterProfile.GENERAL
+    payload_mode: PayloadMode = PayloadMode.COMPLETE_EULER
+    measuring: bool = False
+    recording: bool = False
+    recording_started: Optional[int] = None     # UTC seconds from the start message
+    recording_duration: Optional[int] = None
+    recording_since: Optional[float] = None     # device clock seconds the recording began at
+    recordings: List[SimulatedRecording] = field(default_factory=list)
+    flash_size: int = 64 * 1024 * 1024
+    identify_count: int = 0
+    powered_off: bool = False
+    clock_origin_us: int = 0                    # device timestamp at clock second 0
+    clock_seconds: float = 0.0                  # simulated seconds the clock has run
+    clock_updated: float = field(default_factory=time.monotonic)
+    sent: int = 0
+    dropped: int = 0
+    messages: List[bytes] = field(default_factory=list)
+
+    def device_info_bytes(self) -> bytearray:
+        """DEVICE_INFO (0x1001) read value"""
+        info = bytearray(36)
+        info[0:6] = bytes(int(part, 16) for part in self.address.split(':'))[::-1] \
+            if self.address.count(':') == 5 else bytes(6)
+        info[6:9] = bytes(self.firmware_version)
+        info[20:28] = self.serial_number.to_bytes(8, 'little')
+        info[28:34] = self.product_code.encode('ascii')[:6].ljust(6, b'\x00')
+        return info
+
+    def add_recording(self, seconds: float, start_time: int = None,
+                      clock_start_us: int = None) -> SimulatedRecording:
+        """Store a recording of ``seconds`` at the current rate and payload mode"""
+        recording = SimulatedRecording(
+            int(time.time()) if start_time is None else int(start_time),
+            self.output_rate, self.payload_mode, int(seconds * self.output_rate),
+            self.clock_origin_us if clock_start_us is None else clock_start_us)
+        self.recordings.append(recording)
+        return recording
+
+    def clock(self, speed: float = 1.0) -> float:
+        """Seconds on the device clock now
+
+        The clock keeps running between streams and connections, at
+        ``speed`` times host time (real time when ``speed`` is 0); while
+        streaming, the stream sets it to the time of its latest sample.
+        """
+        return self.clock_seconds + (time.monotonic() - self.clock_updated) * (speed or 1.0)
+
+    def set_clock(self, seconds: float):
+        self.clock_seconds = seconds
+        self.clock_updated = time.monotonic()
+
+    def flash_used(self) -> int:
+        return sum(recording.records * recording.record_size for recording in self.recordings)
+
+    def device_control_bytes(self) -> bytearray:
+        """DEVICE_CONTROL read value, same layout as the writes"""
+        control = bytearray(DEVICE_CONTROL_SIZE)
+        tag = self.device_tag.encode('ascii')[:16]
+        control[7] = len(tag)
+        control[8:8 + len(tag)] = tag
+        control[24:26] = struct.pack('<H', self.output_rate)
+        control[26] = int(self.filter_profile)
+        return control
+
+
+def _sample_values(payload_mode: PayloadMode, timestamp: int, t: float) -> list:
+    """Flat values of one packet: a slow rotation about z with gravity"""
+    angle = 0.5 * t
+    half = angle / 2
+    values = [timestamp]
+    for name in PAYLOAD_FIELDS[payload_mode][1:]:
+        if name in ('quaternion', 'delta_q'):
+            scale = 1.0 if name == 'quaternion' else 0.01
+            values += [math.cos(half * scale), 0.0, 0.0, math.sin(half * scale)]
+        elif name == 'euler_angles':
+            values += [0.0, 0.0, (math.degrees(angle) + 180.0) % 360.0 - 180.0]
+        elif name == 'free_acceleration':
+            values += [math.sin(t), math.cos(t), 0.0]
+        elif name == 'acceleration':
+            values += [math.sin(t), math.cos(t), 9.81]
+        elif name == 'angular_velocity':
+            values += [0.0, 0.0, math.degrees(0.5)]
+        elif name == 'delta_v':
+            values += [0.0, 0.0, 9.81 / 60]
+        elif name == 'magnetic_field':
+            values += [int(0.4 * math.cos(angle) * MAGNETIC_FIELD_SCALE),
+                       int(-0.4 * math.sin(angle) * MAGNETIC_FIELD_SCALE), 0]
+        elif FIELD_WIRE_TYPES[name][0] in ('<u2', 'u1'):
+            values.append(0)
+    return values
+
+
+class SimulatedDOTClient:
+    """Stand-in for ``BleakClient`` connected to a simulated Movella DOT
+
+    Accepts the DEVICE_CONTROL, MEASUREMENT_CONTROL and MESSAGE_CONTROL
+    writes of ``MovellaDOTSensor`` byte for byte, answers its reads, and
+    while measuring emits payloads of the configured mode at the configured
+    output rate on the subscribed payload characteristic. Stopping a
+    recording stores it on the simulated flash, from where the recording
+    messages of ``RecordingExporter`` list and export it.
+    """
+
+    def __init__(self, device: SimulatedDOT, options: SimulationOptions,
+                 disconnected_callback: Callable = None, rng: random.Random = None):
+        self.device = device
+        self.address = device.address
+        self.options = options
+        self.disconnected_callback = disconnected_callback
+        self.is_connected = False
+        self._rng = rng or random.Random(options.seed)
+        self._notify: Dict[str, Callable] = {}
+        self._stream_task: Optional[asyncio.Task] = None
+        self._drop_handle: Optional[asyncio.TimerHandle] = None
+        self._last_delivery = 0.0
+        self._exports: Deque[Tuple[int, int, int]] = deque()
+        self._export_task: Optional[asyncio.Task] = None
+
+    def _require_connection(self):
+        if not self.is_connected:
+            raise ConnectionError(f"Simulated sensor {self.address} is not connected")
+
+    async def connect(self, **kwargs) -> bool:
+        if self.device.powered_off:
+            raise ConnectionError(f"Simulated sensor {self.address} is powered off")
+        if self.options.connect_delay:
+            await asyncio.sleep(self.options.connect_delay)
+        self.is_connected = True
+        if self.options.drop_after is not None:
+            self._drop_handle = asyncio.get_running_loop().call_later(
+                self.options.drop_after, self.drop)
+        return True
+
+    async def disconnect(self) -> bool:
+        self._close_link()
+        return True
+
+    def drop(self):
+        """Lose the link as if the sensor went out of range"""
+        self._close_link()
+
+    def _close_link(self):
+        if not self.is_connected:
+            return
+        self.is_connected = False
+        self._notify.clear()
+        self.device.measuring = False
+        if self._stream_task and not self._stream_task.done():
+            self._stream_task.cancel()
+        self._exports.clear()
+        if self._export_task and not self._export_task.done():
+            self._export_task.cancel()
+        if self._drop_handle:
+            self._drop_handle.cancel()
+        if self.disconnected_callback:
+            self.disconnected_callback(self)
+
+    async def start_notify(self, char_specifier: str, callback: Callable, **kwargs):
+        self._require_connection()
+        self._notify[char_specifier] = callback
+
+    async def stop_notify(self, char_specifier: str):
+        self._require_connection()
+        self._notify.pop(char_specifier, None)
+
+    async def read_gatt_char(self, char_specifier: str, **kwargs) -> bytearray:
+        self._require_connection()
+        if char_specifier == DEVICE_INFO:
+            return self.device.device_info_bytes()
+        if char_specifier == CHARS.DEVICE_CONTROL:
+            return self.device.device_control_bytes()
+        if char_specifier == CHARS.MEASUREMENT_CONTROL:
+            return bytearray([1, int(self.device.measuring), int(self.device.payload_mode)])
+        raise ValueError(f"Characteristic {char_specifier} cannot be read")
+
+    async def write_gatt_char(self, char_specifier: str, data: bytes, response: bool = None):
+        self._require_connection()
+        data = bytes(data)
+        if char_specifier == CHARS.DEVICE_CONTROL:
+            self._write_device_control(data)
+        elif char_specifier == CHARS.MEASUREMENT_CONTROL:
+            self._write_measurement_control(data)
+        elif char_specifier == CHARS.MESSAGE_CONTROL:
+            self._write_message_control(data)
+        else:
+            raise ValueError(f"Characteristic {char_specifier} cannot be written")
+
+    def _write_device_control(self, data: bytes):
+        if len(data) != DEVICE_CONTROL_SIZE:
+            raise ValueError(f"DEVICE_CONTROL writes are {DEVICE_CONTROL_SIZE} bytes, got {len(data)}")
+        visit = data[0]
+        if visit & VISIT_IDENTIFY and data[1] == 0x01:
+            self.device.identify_count += 1
+        if visit & VISIT_DEVICE_TAG:
+            self.device.device_tag = data[8:8 + min(data[7], 16)].decode('ascii')
+        if visit & VISIT_OUTPUT_RATE:
+            rate = struct.unpack_from('<H', data, 24)[0]
+            self.device.output_rate = int(OutputRate(rate))
+        if visit & VISIT_FILTER_PROFILE:
+            self.device.filter_profile = FilterProfile(data[26])
+        if visit & VISIT_POWER_OFF and data[2] == 0x01:
+            self.device.powered_off = True
+            self._close_link()
+
+    def _write_measurement_control(self, data: bytes):
+        if len(data) != 3 or data[0] != 1:
+            raise ValueError(f"Invalid MEASUREMENT_CONTROL write: {data.hex()}")
+        mode = PayloadMode(data[2])
+        if mode not in PAYLOAD_PLANS:
+            raise ValueError(f"Payload mode {mode.name} is not supported")
+        self.device.payload_mode = mode
+        if data[1] == 1 and not self.device.measuring:
+            self.device.measuring = True
+            self._stream_task = asyncio.get_running_loop().create_task(self._stream())
+        elif data[1] == 0 and self.device.measuring:
+            self.device.measuring = False
+            if self._stream_task and not self._stream_task.done():
+                self._stream_task.cancel()
+
+    def _write_message_control(self, data: bytes):
+        try:
+            message = parse_message(data)
+        except ValueError:
+            raise ValueError(f"Invalid MESSAGE_CONTROL message: {data.hex()}") from None
+        self.device.messages.append(data)
+        mid, reid, payload = message.mid, message.reid, message.payload
+        if mid != MessageId.RECORDING:
+            self._acknowledge(mid, reid)
+            return
+        loop = asyncio.get_running_loop()
+        device = self.device
+        speed = self.options.speed
+        if reid == RecordingMessage.START_RECORDING:
+            device.recording_started, device.recording_duration = START_RECORDING_FORMAT.unpack(payload)
+            if not device.recording:
+                # A start second in the future delays the recording until then. This
+                # models the DOT as assumed by schedule_recording; unverified on hardware
+                delay = max(0.0, device.recording_started - time.time())
+                device.recording_since = device.clock(speed) + delay * (speed or 1.0)
+            device.recording = True
+        elif reid == RecordingMessage.STOP_RECORDING:
+            if device.recording:
+                self._store_recording(device.clock(speed))
+            device.recording = False
+        elif reid == RecordingMessage.REQUEST_FLASH_INFO:
+            self._acknowledge(mid, reid)
+            self._deliver(loop, CHARS.MESSAGE_NOTIFY, build_message(
+                RecordingMessage.FLASH_INFO,
+                FLASH_INFO_FORMAT.pack(len(device.recordings), device.flash_used(), device.flash_size)))
+            return
+        elif reid == RecordingMessage.REQUEST_FILE_INFO:
+            index, = FILE_INFO_REQUEST.unpack(payload)
+            if index >= len(device.recordings):
+                self._acknowledge(mid, reid, ACK_INVALID)
+                return
+            recording = device.recordings[index]
+            self._acknowledge(mid, reid)
+            self._deliver(loop, CHARS.MESSAGE_NOTIFY, build_message(
+                RecordingMessage.FILE_INFO,
+                FILE_INFO_FORMAT.pack(index, recording.start_time, recording.output_rate,
+                                      int(recording.payload_mode), recording.records)))
+            return
+        elif reid == RecordingMessage.REQUEST_FILE_DATA:
+            index, first, count = FILE_DATA_REQUEST.unpack(payload)
+            if index >= len(device.recordings) or first + count > device.recordings[index].records:
+                self._acknowledge(mid, reid, ACK_INVALID)
+                return
+            self._exports.append((index, first, count))
+            if self._export_task is None or self._export_task.done():
+                self._export_task = loop.create_task(self._serve_exports())
+        elif reid == RecordingMessage.STOP_EXPORT:
+            self._exports.clear()
+            if self._export_task and not self._export_task.done():
+                self._export_task.cancel()
+        self._acknowledge(mid, reid)
+
+    def _store_recording(self, now: float):
+        """Keep what was recorded since the start message (device clock seconds) on the flash"""
+        device = self.device
+        seconds = max(0.0, now - device.recording_since)
+        if device.recording_duration:
+            seconds = min(seconds, device.recording_duration)
+        device.add_recording(seconds, device.recording_started,
+                             self._device_timestamp(device.recording_since))
+
+    def _acknowledge(self, mid: int, reid: int, result: int = ACK_OK):
+        """Notify MESSAGE_ACK with the message ID, the ReID and the result"""
+        self._deliver(asyncio.get_running_loop(), CHARS.MESSAGE_ACK,
+                      build_message(reid, bytes([result]), mid))
+
+    async def _serve_exports(self):
+        """Send requested records as FILE_DATA notifications, one request after the other"""
+        loop = asyncio.get_running_loop()
+        bandwidth = self.options.export_bandwidth
+        sent = 0
+        while self._exports and self.is_connected:
+            index, first, count = self._exports.popleft()
+            recording = self.device.recordings[index]
+            per_message = (MAX_PAYLOAD - FILE_DATA_HEADER.size) // recording.record_size
+            for position in range(first, first + count, per_message):
+                records = min(per_message, first + count - position)
+                payload = FILE_DATA_HEADER.pack(index, position, records) \
+                    + recording.record_bytes(position, records)
+                if bandwidth:
+                    await asyncio.sleep(len(payload) / bandwidth)
+                else:
+                    sent += 1
+                    if sent % 16 == 0:
+                        await asyncio.sleep(0)
+                if not self.is_connected:
+                    return
+                self._deliver(loop, CHARS.MESSAGE_NOTIFY,
+                              build_message(RecordingMessage.FILE_DATA, payload))
+
+    def _payload_characteristic(self) -> Optional[str]:
+        return next((uuid for uuid in PAYLOAD_CHARACTERISTICS if uuid in self._notify), None)
+
+    def _device_timestamp(self, t: float) -> int:
+        drift = 1.0 + self.options.clock_drift_ppm * 1e-6
+        return int(self.device.clock_origin_us + t * 1e6 * drift) & 0xFFFFFFFF
+
+    def _deliver(self, loop: asyncio.AbstractEventLoop, uuid: str, packet: bytes):
+        """Hand a packet to the subscriber after the simulated link delay, in order"""
+        delay = self.options.latency + (self._rng.uniform(0, self.options.jitter)
+                                        if self.options.jitter else 0.0)
+        if delay <= 0:
+            self._notify_packet(uuid, packet)
+            return
+        # Timers due at the same time may run in any order: keep them distinct
+        due = max(loop.time() + delay, self._last_delivery + 1e-6)
+        self._last_delivery = due
+        loop.call_at(due, self._notify_packet, uuid, packet)
+
+    def _notify_packet(self, uuid: str, packet: bytes):
+        callback = self._notify.get(uuid)
+        if callback and self.is_connected:
+            callback(uuid, bytearray(packet))
+
+    async def _stream(self):
+        """Emit one packet per output period until the measurement stops"""
+        loop = asyncio.get_running_loop()
+        plan = PAYLOAD_PLANS[self.device.payload_mode]
+        period = 1.0 / self.device.output_rate
+        speed = self.options.speed
+        started = loop.time()
+        # Samples continue the device clock, so timestamps never go back across streams
+        clock_start = self.device.clock(speed)
+        index = 0
+        while self.device.measuring and self.is_connected:
+            t = clock_start + index * period
+            if speed > 0:
+                wait = started + index * period / speed - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            elif index % 64 == 0:
+                await asyncio.sleep(0)
+            if not (self.device.measuring and self.is_connected):
+                break
+            uuid = self._payload_characteristic()
+            index += 1
+            self.device.set_clock(t)
+            if uuid is None:
+                continue
+            if self.options.loss and self._rng.random() < self.options.loss:
+                self.device.dropped += 1
+                continue
+            packet = plan.struct.pack(*_sample_values(self.device.payload_mode,
+                                                      self._device_timestamp(t), t))
+            self.device.sent += 1
+            self._deliver(loop, uuid, packet)
+
+
+class DOTSimulator:
+    """Factory of simulated sensors, usable wherever a BleakClient factory is
+
+    ``DOTSimulator(count=5)`` creates five sensors; pass the simulator as
+    ``client_factory`` and its ``addresses`` as the devices to connect::
+
+        simulator = DOTSimulator(count=5, options=SimulationOptions(loss=0.01))
+        async with MovellaDOTFleet(simulator.addresses, config,
+                                   client_factory=simulator) as fleet:
+            ...
+
+    Sensor state (tag, settings, clock) survives reconnections; unknown
+    addresses get a new sensor on first connection.
+    """
+
+    def __init__(self, count: int = 0, options: SimulationOptions = None):
+        self.options = options or SimulationOptions()
+        self._rng = random.Random(self.options.seed)
+        self.devices: Dict[str, SimulatedDOT] = {}
+        self.clients: List[SimulatedDOTClient] = []
+        for _ in range(count):
+            self.add_device()
+
+    @property
+    def addresses(self) -> List[str]:
+        return list(self.devices)
+
+    def add_device(self, address: str = None, device_tag: str = None) -> SimulatedDOT:
+        number = len(self.devices) + 1
+        address = address or "D4:22:CD:00:{:02X}:{:02X}".format(number >> 8, number & 0xFF)
+        device = SimulatedDOT(
+            address=address,
+            device_tag=device_tag or f"sim{number}",
+            serial_number=0x0000_2000_0000_0000 + number,
+            clock_origin_us=self._rng.randrange(1 << 32),
+        )
+        self.devices[address] = device
+        return device
+
+    def __call__(self, address: str, disconnected_callback: Callable = None,
+                 **kwargs) -> SimulatedDOTClient:
+        device = self.devices.get(address) or self.add_device(address)
+        client = SimulatedDOTClient(device, self.options, disconnected_callback,
+                                    random.Random(self._rng.random()))
+        self.clients.append(client)
+        return client
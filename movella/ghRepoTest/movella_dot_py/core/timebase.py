@@ -0,0 +1,169 @@
+from typing import Optional, Tuple
+import math
+import numpy as np
+
+# The sensor timestamp is a uint32 microsecond counter: it wraps every
+# 2**32 us, about 71.6 minutes
+TIMESTAMP_WRAP = 1 << 32
+_HALF_WRAP = TIMESTAMP_WRAP // 2
+
+
+def _wrap_steps(raw_steps: np.ndarray, host_steps: np.ndarray = None) -> np.ndarray:
+    """Number of counter wraps between consecutive samples
+
+    With host receive times the elapsed host time decides, which also
+    handles outages longer than a wrap; otherwise (or where the host time is
+    NaN) a backwards jump of more than half the range counts as one wrap.
+    """
+    steps = (raw_steps < -_HALF_WRAP).astype(np.int64) - (raw_steps > _HALF_WRAP)
+    if host_steps is not None:
+        expected = np.round((host_steps * 1e6 - raw_steps) / TIMESTAMP_WRAP)
+        known = np.isfinite(expected)
+        steps[known] = expected[known].astype(np.int64)
+    return steps
+
+
+def unwrap_timestamps(timestamps: np.ndarray, host_times: np.ndarray = None) -> np.ndarray:
+    """Turn wrapped uint32 sensor timestamps into a monotonic int64 timeline
+
+    ``host_times`` (seconds, same length) are optional host receive times
+    used to count wraps across long outages. The first sample keeps its raw
+    value.
+    """
+    raw = np.asarray(timestamps, dtype=np.int64) & (TIMESTAMP_WRAP - 1)
+    if len(raw) < 2:
+        return raw.copy()
+    host_steps = np.diff(np.asarray(host_times, dtype=np.float64)) if host_times is not None else None
+    wraps = np.empty(len(raw), dtype=np.int64)
+    wraps[0] = 0
+    np.cumsum(_wrap_steps(np.diff(raw), host_steps), out=wraps[1:])
+    return raw + wraps * TIMESTAMP_WRAP
+
+
+class TimestampUnwrapper:
+    """Streaming version of ``unwrap_timestamps``, one sample at a time"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._last_raw: Optional[int] = None
+        self._last_host = math.nan
+        self._offset = 0
+
+    def unwrap(self, timestamp: int, host_time: float = math.nan) -> int:
+        raw = int(timestamp) & (TIMESTAMP_WRAP - 1)
+        if self._last_raw is not None:
+            step = raw - self._last_raw
+            host_step = host_time - self._last_host
+            if math.isfinite(host_step):
+                self._offset += round((host_step * 1e6 - step) / TIMESTAMP_WRAP) * TIMESTAMP_WRAP
+            elif step < -_HALF_WRAP:
+                self._offset += TIMESTAMP_WRAP
+            elif step > _HALF_WRAP:
+                self._offset -= TIMESTAMP_WRAP
+        self._last_raw = raw
+        self._last_host = host_time
+        return raw + self._offset
+
+    def unwrap_array(self, timestamps: np.ndarray, host_times: np.ndarray = None) -> np.ndarray:
+        """Unwrap a block of samples, continuing from the previous ones"""
+        raw = np.asarray(timestamps, dtype=np.int64) & (TIMESTAMP_WRAP - 1)
+        if not len(raw):
+            return raw
+        if host_times is None:
+            host_times = np.full(len(raw), math.nan)
+        host_times = np.asarray(host_times, dtype=np.float64)
+        first = self.unwrap(raw[0], host_times[0])
+        steps = _wrap_steps(np.diff(raw), np.diff(host_times))
+        unwrapped = np.empty(len(raw), dtype=np.int64)
+        unwrapped[0] = first
+        unwrapped[1:] = first + np.diff(raw).cumsum() + steps.cumsum() * TIMESTAMP_WRAP
+        self._last_raw = int(raw[-1])
+        self._last_host = float(host_times[-1])
+        self._offset = int(unwrapped[-1]) - int(raw[-1])
+        return unwrapped
+
+
+class ClockModel:
+    """Streaming linear fit of host receive time against sensor time
+
+    Fits ``host = intercept + slope * device_seconds`` by least squares,
+    keeping running means and centred sums (Welford) so that precision does
+    not degrade over long sessions. ``slope - 1`` is the sensor clock drift.
+    Host receive times include the BLE latency, so the mapped times carry
+    its mean as a constant offset.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._origin: Optional[Tuple[float, float]] = None
+        self._mean_x = 0.0
+        self._mean_y = 0.0
+        self._m2_x = 0.0
+        self._c_xy = 0.0
+
+    def _centre(self, device_us, host_time):
+        if self._origin is None:
+            self._origin = (float(device_us), float(host_time))
+        return ((device_us - self._origin[0]) / 1e6, host_time - self._origin[1])
+
+    def update(self, device_us: int, host_time: float):
+        """Add one sample: unwrapped sensor time (us) and host receive time (s)"""
+        if not math.isfinite(host_time):
+            return
+        x, y = self._centre(device_us, host_time)
+        self.count += 1
+        dx = x - self._mean_x
+        self._mean_x += dx / self.count
+        self._mean_y += (y - self._mean_y) / self.count
+        self._m2_x += dx * (x - self._mean_x)
+        self._c_xy += dx * (y - self._mean_y)
+
+    def update_batch(self, device_us: np.ndarray, host_times: np.ndarray):
+        """Add a block of samples in one vectorized step; NaN host times are skipped"""
+        device_us = np.asarray(device_us)
+        host_times = np.asarray(host_times, dtype=np.float64)
+        known = np.isfinite(host_times)
+        if not known.all():
+            device_us, host_times = device_us[known], host_times[known]
+        if not len(host_times):
+            return
+        self._centre(device_us[0], host_times[0])
+        x = (device_us - self._origin[0]) / 1e6
+        y = host_times - self._origin[1]
+        n = len(x)
+        mean_x, mean_y = x.mean(), y.mean()
+        m2_x = float(((x - mean_x) ** 2).sum())
+        c_xy = float(((x - mean_x) * (y - mean_y)).sum())
+        # Chan et al. merge of two sets of centred sums
+        total = self.count + n
+        dx, dy = mean_x - self._mean_x, mean_y - self._mean_y
+        self._m2_x += m2_x + dx * dx * self.count * n / total
+        self._c_xy += c_xy + dx * dy * self.count * n / total
+        self._mean_x += dx * n / total
+        self._mean_y += dy * n / total
+        self.count = total
+
+    @property
+    def slope(self) -> float:
+        """Host seconds per sensor second (1.0 until two distinct samples are seen)"""
+        if self.count < 2 or self._m2_x <= 0:
+            return 1.0
+        return self._c_xy / self._m2_x
+
+    @property
+    def drift_ppm(self) -> float:
+        """Sensor clock drift against the host clock, parts per million"""
+        return (self.slope - 1.0) * 1e6
+
+    def to_host(self, device_us) -> np.ndarray:
+        """Map unwrapped sensor times (us) to host time (s), vectorized"""
+        device_us = np.asarray(device_us)
+        if self._origin is None:
+            return np.full(device_us.shape, np.nan)
+        x = (device_us - self._origin[0]) / 1e6
+        return self._origin[1] + self._mean_y + self.slope * (x - self._mean_x)
@@ -0,0 +1,37 @@
+import asyncio
+import sys
+import os
+
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from movella_dot_py.core.fleet import MovellaDOTFleet
+from movella_dot_py.core.simulator import DOTSimulator, SimulationOptions
+from movella_dot_py.models.data_structures import SensorConfiguration
+from movella_dot_py.models.enums import OutputRate, FilterProfile, PayloadMode
+
+async def main():
+    # Five simulated sensors on a lossy, jittery link; no hardware needed
+    simulator = DOTSimulator(count=5, options=SimulationOptions(
+        latency=0.02, jitter=0.01, loss=0.01, seed=1))
+
+    config = SensorConfiguration(
+        output_rate=OutputRate.RATE_120,
+        filter_profile=FilterProfile.DYNAMIC,
+        payload_mode=PayloadMode.CUSTOM_MODE_5
+    )
+
+    async with MovellaDOTFleet(simulator.addresses, config, client_factory=simulator) as fleet:
+        print((await fleet.start_measurement()).summary())
+        for _ in range(5):
+            await asyncio.sleep(1)
+            for snapshot in fleet.metrics().values():
+                print(snapshot.summary())
+        print((await fleet.stop_measurement()).summary())
+
+        for address, loss in fleet.packet_loss().items():
+            print(f"{address}: {loss.summary()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,13 @@
-from .enums import OutputRate, FilterProfile, PayloadMode
+from .enums import (OutputRate, FilterProfile, PayloadMode, SensorState,
+                    MessageId, RecordingMessage)
 from .data_structures import (SensorConfiguration, DeviceInfo, Timestamp, 
                             Quaternion, EulerAngles, Vector3, MagneticField, 
-                            Status, SensorData)
+                            Status, SensorData, RetryPolicy, DataGap)
 from .characteristics import MovellaDOTCharacteristics
 
-__all__ = ['OutputRate', 'FilterProfile', 'PayloadMode', 
+__all__ = ['OutputRate', 'FilterProfile', 'PayloadMode', 'SensorState',
+           'MessageId', 'RecordingMessage',
            'SensorConfiguration', 'DeviceInfo', 'Timestamp',
            'Quaternion', 'EulerAngles', 'Vector3', 'MagneticField',
-           'Status', 'SensorData', 'MovellaDOTCharacteristics']
\ No newline at end of file
+           'Status', 'SensorData', 'RetryPolicy', 'DataGap',
+           'MovellaDOTCharacteristics']
\ No newline at end of file
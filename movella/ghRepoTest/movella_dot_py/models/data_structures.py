@@ -1,5 +1,6 @@
 from dataclasses import dataclass
 from typing import Optional
+import random
 import struct
 import numpy as np
 from .enums import FilterProfile, OutputRate, PayloadMode
@@ -22,6 +23,37 @@ class SensorConfiguration:
     filter_profile: FilterProfile = FilterProfile.GENERAL
     payload_mode: PayloadMode = PayloadMode.COMPLETE_EULER
 
+@dataclass
+class RetryPolicy:
+    """Retry schedule with exponential, jittered backoff"""
+    attempts: int = 3
+    base_delay: float = 0.5     # seconds before the second attempt
+    max_delay: float = 5.0
+    jitter: float = 0.5         # +/- fraction applied to every delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given failed attempt (1-based)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+@dataclass
+class DataGap:
+    """Interval without data caused by a lost connection"""
+    start_time: float                       # host time.time() of the disconnect
+    end_time: Optional[float] = None        # host time of the first sample after it
+    sample_index: Optional[int] = None      # index of the first sample after it
+    last_timestamp: Optional[int] = None    # device timestamp (us) before the gap
+    first_timestamp: Optional[int] = None   # device timestamp (us) after the gap
+
+    @property
+    def is_open(self) -> bool:
+        return self.end_time is None
+
+    @property
+    def duration(self) -> Optional[float]:
+        """Length of the outage in host seconds, None while still open"""
+        return None if self.end_time is None else self.end_time - self.start_time
+
 @dataclass
 class Timestamp:
     """Timestamp in microseconds"""
@@ -36,4 +36,36 @@ class PayloadMode(IntEnum):
     CUSTOM_MODE_2 = 23
     CUSTOM_MODE_3 = 24
     CUSTOM_MODE_4 = 25            # Movella SDK only
-    CUSTOM_MODE_5 = 26
\ No newline at end of file
+    CUSTOM_MODE_5 = 26
+
+class SensorState(IntEnum):
+    """Connection state of a sensor managed by a fleet"""
+    DISCONNECTED = 0
+    CONNECTING = 1
+    CONNECTED = 2     # connected and configured
+    MEASURING = 3     # streaming over BLE
+    RECORDING = 4     # recording to on-device flash
+    FAILED = 5        # bring-up gave up
+
+class MessageId(IntEnum):
+    """MID of messages on MESSAGE_CONTROL, MESSAGE_ACK and MESSAGE_NOTIFY"""
+    RECORDING = 0x01
+
+class RecordingMessage(IntEnum):
+    """ReID of the recording messages (MID 0x01)
+
+    Requests are written to MESSAGE_CONTROL and acknowledged on MESSAGE_ACK;
+    FLASH_INFO, FILE_INFO and FILE_DATA arrive on MESSAGE_NOTIFY. Experimental:
+    only START_RECORDING and STOP_RECORDING come from the DOT; the export ReIDs
+    (0x50 onwards) were chosen for this SDK and ``DOTSimulator`` and are not
+    verified on hardware.
+    """
+    START_RECORDING = 0x40
+    STOP_RECORDING = 0x41
+    REQUEST_FLASH_INFO = 0x50
+    FLASH_INFO = 0x51           # file count, used and total bytes
+    REQUEST_FILE_INFO = 0x60
+    FILE_INFO = 0x61            # start time, rate, payload mode and size of one file
+    REQUEST_FILE_DATA = 0x70
+    FILE_DATA = 0x71            # consecutive records of one file
+    STOP_EXPORT = 0x73
@@ -2,7 +2,11 @@ import asyncio
 from bleak import BleakClient, BleakScanner
 from datetime import datetime
 import os
-import struct
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "ghRepoTest"))
+
+from movella_dot_py.core.recorder import BinaryRecorder
 
 # ===== UUID principali =====
 CONTROL_CHAR_UUID = "15172001-4947-11e9-8646-d663bd873d93"
@@ -29,25 +33,23 @@ class MovellaDevice:
         self.address = address
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_address = address.replace(":", "")
-        self.output_file = os.path.join(desktop_path, f"{name}_{safe_address}_data_{timestamp}.csv")
+        self.output_file = os.path.join(desktop_path, f"{name}_{safe_address}_data_{timestamp}.bin")
         self.client = BleakClient(address)
         self.data_char = None
         self.recording = False
         self.data_received = False
-
-        if not os.path.exists(self.output_file):
-            with open(self.output_file, "w") as f:
-                f.write("timestamp,acc_x,acc_y,acc_z,gyro_x,gyro_y,gyro_z\n")
+        # I pacchetti grezzi vengono scritti su disco da un thread in background
+        # in un file .bin al posto del CSV (leggibili con
+        # movella_dot_py.core.recorder.read_log)
+        self.recorder = BinaryRecorder(self.output_file, address=address)
 
     def notification_handler(self, sender, data):
+        # Serve a find_data_characteristic per riconoscere la caratteristica che
+        # invia dati: prima non veniva mai impostato e nessuna veniva trovata
+        self.data_received = True
         if not self.recording:
             return
-        try:
-            float_values = struct.unpack('<' + 'f'*(len(data)//4), data)
-            with open(self.output_file, "a") as f:
-                f.write(f"{datetime.now().isoformat()},{','.join(map(str, float_values))}\n")
-        except struct.error:
-            pass  # ignora pacchetti malformati
+        self.recorder.record(data)
 
 async def activate_configuration(device: MovellaDevice, rate_hz=120):
     cfg_byte = b'\x01' if rate_hz == 60 else b'\x02'
@@ -81,6 +83,7 @@ async def start_device(device: MovellaDevice):
     if device.data_char is None:
         print(f"⚠️ Nessuna caratteristica dati per {device.name}")
         return
+    device.recorder.start()
     device.recording = True
     await device.client.start_notify(device.data_char, device.notification_handler)
     await device.client.write_gatt_char(CONTROL_CHAR_UUID, START_CMD, response=True)
@@ -92,7 +95,10 @@ async def stop_device(device: MovellaDevice):
     await device.client.write_gatt_char(CONTROL_CHAR_UUID, STOP_CMD, response=True)
     await device.client.stop_notify(device.data_char)
     device.recording = False
-    print(f"🛑 Recording fermato su {device.name}")
+    device.recorder.stop()
+    stats = device.recorder.stats()
+    print(f"🛑 Recording fermato su {device.name} "
+          f"({stats['records_written']} pacchetti, {stats['bytes_written']} byte)")
 
 async def manage_input(devices):
     loop = asyncio.get_event_loop()
@@ -3,12 +3,12 @@ import sys
 import os
 import time
 import threading
-from bleak import BleakScanner, BleakClient
 
 # Aggiungi il percorso del modulo personalizzato
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from movella_dot_py.core.sensor import MovellaDOTSensor
+from movella_dot_py.core.fleet import MovellaDOTFleet
+from movella_dot_py.core.discovery import DiscoveryCache, discover_sensors
 from movella_dot_py.models.data_structures import SensorConfiguration
 from movella_dot_py.models.enums import OutputRate, FilterProfile, PayloadMode
 
@@ -40,10 +40,11 @@ async def main():
     # Avvia il thread che ascolta la tastiera
     threading.Thread(target=keyboard_listener, daemon=True).start()
 
-    # Scansione BLE
-    print("Scanning for Movella DOT sensors (5 seconds)...")
-    devices = await BleakScanner.discover(timeout=5.0)
-    dot_devices = [d for d in devices if d.name and "Movella DOT" in d.name]
+    # Sensori già noti dalla cache, altrimenti scansione BLE
+    # (--scan per forzare una nuova scansione)
+    cache = DiscoveryCache()
+    print("Ricerca sensori Movella DOT...")
+    dot_devices = await discover_sensors(cache, timeout=5.0, use_cache="--scan" not in sys.argv)
     
     if not dot_devices:
         print("Nessun sensore Movella DOT trovato")
@@ -53,69 +54,60 @@ async def main():
     dot_devices = dot_devices[:max_sensors]
     print(f"Trovati {len(dot_devices)} sensori Movella DOT")
 
-    sensors = []
     config = SensorConfiguration(
         output_rate=OutputRate.RATE_120,
         filter_profile=FilterProfile.DYNAMIC,
         payload_mode=PayloadMode.CUSTOM_MODE_5
     )
 
-    # Connessione e configurazione sensori
-    for device in dot_devices:
-        try:
-            sensor = MovellaDOTSensor(config)
-            sensor.client = BleakClient(device.address)
-            print(f"\nConnessione a {device.name} ({device.address})...")
-            await sensor.client.connect()
-            sensor.is_connected = True
-            sensor._device_address = device.address
-            sensor._device_name = device.name
-
-            print("\nLettura informazioni del dispositivo...")
-            device_info = await sensor.get_device_info()
-            sensor._device_tag = device_info.device_tag
-            print(f"MAC: {device_info.mac_address}")
-            print(f"Firmware: {device_info.firmware_version}")
-            print(f"Serial: {device_info.serial_number}")
-            print(f"Product: {device_info.product_code}")
-            print(f"Tag: {device_info.device_tag}")
-            print(f"Output Rate: {device_info.output_rate} Hz")
-            print(f"Filter Profile: {device_info.filter_profile.name}")
-
-            await sensor.identify_sensor()
-            await asyncio.sleep(2)
-
-            await sensor.configure_sensor()
-            sensors.append(sensor)
-            print(f"Connesso e configurato {device.name}")
-
-        except Exception as e:
-            print(f"Errore connessione {device.name}: {str(e)}")
-
-    if not sensors:
+    # Connessione e configurazione sensori in parallelo
+    fleet = MovellaDOTFleet(dot_devices, config, cache=cache)
+    await fleet.connect()
+    for report in fleet.bring_up_reports:
+        if not report.ok:
+            print(f"Errore connessione {report.name}: {report.error}")
+            continue
+        device_info = report.sensor.device_info
+        print(f"\nConnesso e configurato {report.name} in {report.elapsed:.2f} s")
+        print(f"MAC: {device_info.mac_address}")
+        print(f"Firmware: {device_info.firmware_version}")
+        print(f"Serial: {device_info.serial_number}")
+        print(f"Product: {device_info.product_code}")
+        print(f"Tag: {device_info.device_tag}")
+        print(f"Output Rate: {device_info.output_rate} Hz")
+        print(f"Filter Profile: {device_info.filter_profile.name}")
+
+    if not len(fleet):
         print("Nessun sensore connesso correttamente.")
         return
 
+    # Il LED lampeggia da solo, non serve aspettarlo
+    await fleet.identify()
+
     try:
         # Attendi pressione di 'a' per iniziare la registrazione
         print("\nIn attesa di 'a' per avviare la registrazione...")
         while not recording_flag["recording"]:
             await asyncio.sleep(0.2)
 
+        # Stesso secondo UTC di avvio per tutti, inviato in anticipo
         print("\nAvvio registrazione su tutti i sensori...")
-        await asyncio.gather(*(sensor.start_recording() for sensor in sensors))
+        print((await fleet.schedule_recording()).summary())
+        for address, start in fleet.scheduled_starts.items():
+            if start.write_latency is not None:
+                print(f"{address}: avvio alle {start.start_time}, ACK in "
+                      f"{start.write_latency * 1000:.0f} ms")
 
         # Attendi pressione di 's' per fermare la registrazione
         while not recording_flag["stop"]:
             await asyncio.sleep(0.2)
 
         print("\nArresto registrazione...")
-        await asyncio.gather(*(sensor.stop_recording() for sensor in sensors))
+        print((await fleet.stop_recording()).summary())
 
         # Mostra riassunto dei dati
-        for sensor in sensors:
+        for data in fleet.get_collected_data().values():
             print(f"\n--- Sensor Data Summary ---")
-            data = sensor.get_collected_data()
             if data:
                 print(f"Device: {data['device_tag']}")
                 print(f"MAC: {data['mac_address']}")
@@ -124,7 +116,8 @@ async def main():
                 if len(timestamps) > 0:
                     print(f"Campioni raccolti: {len(timestamps)}")
                     print(f"Durata: {(timestamps[-1] - timestamps[0])/1e6:.2f} s")
-                    if euler_angles:
+                    print(f"Pacchetti persi: {data['packet_loss'].summary()}")
+                    if len(euler_angles) > 0:
                         print(f"Primi euler angles: {euler_angles[0]}")
                         print(f"Ultimi euler angles: {euler_angles[-1]}")
                 else:
@@ -134,7 +127,7 @@ async def main():
         print(f"Errore durante la registrazione: {str(e)}")
     finally:
         print("\nDisconnessione di tutti i sensori...")
-        await asyncio.gather(*(sensor.disconnect() for sensor in sensors))
+        await fleet.disconnect()
 
 if __name__ == "__main__":
     asyncio.run(main())
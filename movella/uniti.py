@@ -1,71 +1,42 @@
 import asyncio
-import threading
-import time
 import sys
 import os
-import serial
-from bleak import BleakScanner, BleakClient
-from prompt_toolkit import prompt
+from prompt_toolkit import PromptSession
 from prompt_toolkit.patch_stdout import patch_stdout
 from prompt_toolkit.shortcuts import print_formatted_text
 
 # ============================================================
 # CONFIGURAZIONE GoPro / Arduino
 # ============================================================
-PORTE = ["COM5", "COM15", "COM8"]
-BAUD = 115200
-STATUS_INTERVAL = 5
-
-arduinos = []
-arduino_states = {}
-state_lock = threading.Lock()
+# Porte da riga di comando (es. le pty di gopro/firmware_emulator.py) o queste
+PORTE = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ["COM5", "COM15", "COM8"]
+TAKES_LOG = "takes.jsonl"  # tempi di invio/risposta di ogni START/STOP
+# Con --http le GoPro sono comandate direttamente in HTTP, senza Arduino:
+# (nome, indirizzo IP della scheda WiFi collegata alla rete di quella GoPro)
+CAMERE_HTTP = [("GoPro1", None)]
 
 # ============================================================
 # CONFIGURAZIONE Movella
 # ============================================================
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from movella_dot_py.core.sensor import MovellaDOTSensor
+from gopro.serial_controller import BAUD, SerialController
+from gopro.http_controller import GoProCamera, HttpController
+from gopro.trigger import SyncTrigger
+from gopro.provisioning import RetryPolicy, assign_networks, provision
+from movella_dot_py.core.fleet import MovellaDOTFleet
+from movella_dot_py.core.discovery import DiscoveryCache, discover_sensors
 from movella_dot_py.models.data_structures import SensorConfiguration
 from movella_dot_py.models.enums import OutputRate, FilterProfile, PayloadMode
 
-# ============================================================
-# EVENTI DI SINCRONIZZAZIONE
-# ============================================================
-start_event = threading.Event()
-stop_event = threading.Event()
+WIFI_RETRY = RetryPolicy(attempts=3)  # per porta: passare policies= a provision()
 
 # ============================================================
-# THREAD LETTURA SERIAL
+# LETTURA SERIAL
 # ============================================================
-def read_arduino(ser):
-    while True:
-        try:
-            line = ser.readline().decode(errors="ignore").strip()
-            if not line:
-                continue
-            with state_lock:
-                state = arduino_states.get(ser.port, {})
-                if line == "READY":
-                    state["status"] = "READY"
-                elif line in ["STARTED", "STOPPED"]:
-                    state["last_cmd"] = line
-                elif line in ["CONNECTED", "DISCONNECTED", "NO_SSID", "NO_PASS"]:
-                    state["wifi"] = line
-                else:
-                    state["last_msg"] = line
-                arduino_states[ser.port] = state
-            print_formatted_text(f"[COM][{ser.port}] -> {line}")
-        except Exception as e:
-            print_formatted_text(f"[COM][{ser.port}] ❌ Errore lettura: {e}")
-            time.sleep(1)
-
-def send_command(ser_list, cmd):
-    for ser in ser_list:
-        try:
-            ser.write((cmd + "\n").encode())
-            ser.flush()
-        except Exception as e:
-            print_formatted_text(f"[{ser.port}] ❌ Errore invio comando: {e}")
+# Le porte seriali sono lette sullo stesso event loop dei sensori BLE:
+# nessun thread, nessun polling tra GoPro e Movella
+def print_line(port, line):
+    print_formatted_text(f"[COM][{port}] -> {line}")
 
 # ============================================================
 # FILE RETI WIFI
@@ -86,70 +57,37 @@ def load_networks(filename="networks.txt"):
         print_formatted_text(f"❌ File {filename} non trovato.")
     return nets
 
-def connect_arduino(ser, ssid, pwd, timeout=20):
-    ser.reset_input_buffer()
-    print_formatted_text(f"[PY][{ser.port}] 🔗 Connessione a '{ssid}'...")
-    start = time.time()
-    last_sent = None
-    with state_lock:
-        arduino_states[ser.port]["wifi"] = "NO_SSID"
-    while time.time() - start < timeout:
-        with state_lock:
-            wifi_status = arduino_states.get(ser.port, {}).get("wifi", "")
-        if wifi_status == "NO_SSID" and last_sent != "SSID":
-            ser.write(f"SETSSID {ssid}\n".encode())
-            ser.flush()
-            last_sent = "SSID"
-            print_formatted_text(f"[PY][{ser.port}] 📡 Inviato SSID: {ssid}")
-        elif wifi_status == "NO_PASS" and last_sent != "PASS":
-            ser.write(f"SETPASS {pwd}\n".encode())
-            ser.flush()
-            last_sent = "PASS"
-            print_formatted_text(f"[PY][{ser.port}] 🔑 Inviata password.")
-        elif wifi_status == "CONNECTED":
-            print_formatted_text(f"[PY][{ser.port}] ✅ Connesso a {ssid}")
-            return True
-        elif wifi_status == "DISCONNECTED":
-            print_formatted_text(f"[PY][{ser.port}] ❌ Connessione fallita")
-            return False
-        time.sleep(0.2)
-    print_formatted_text(f"[PY][{ser.port}] ⏰ Timeout connessione")
-    return False
-
-# ============================================================
-# APERTURA PORTE SERIAL
-# ============================================================
-for porta in PORTE:
-    try:
-        ser = serial.Serial(porta, BAUD, timeout=1)
-        time.sleep(2)
-        arduinos.append(ser)
-        with state_lock:
-            arduino_states[porta] = {"status": "OPEN", "wifi": "NO_SSID", "last_cmd": None}
-        threading.Thread(target=read_arduino, args=(ser,), daemon=True).start()
-        print_formatted_text(f"[PY][{porta}] Aperta con successo.")
-    except Exception as e:
-        print_formatted_text(f"[PY][{porta}] ❌ Errore apertura: {e}")
-
-if not arduinos:
-    print_formatted_text("[PY] ❌ Nessun Arduino aperto!")
-    sys.exit(1)
-
-available_networks = load_networks()
-for idx, ser in enumerate(arduinos):
-    if idx >= len(available_networks):
-        print_formatted_text(f"[PY][{ser.port}] ⚠ Nessuna rete assegnata.")
-        continue
-    ssid, pwd = available_networks[idx]
-    connect_arduino(ser, ssid, pwd)
+async def connect_arduinos(arduinos, networks):
+    """
+    Connette tutti gli Arduino alle reti WiFi in parallelo: ogni risposta
+    (NO_SSID, NO_PASS, CONNECTED, DISCONNECTED) riceve subito il passo
+    successivo, i tentativi falliti sono ripetuti secondo WIFI_RETRY.
+    """
+    assigned = assign_networks([port.port for port in arduinos], networks)
+    for port in arduinos:
+        if port.port not in assigned:
+            print_formatted_text(f"[PY][{port.port}] ⚠ Nessuna rete assegnata.")
+    for porta, (ssid, _) in assigned.items():
+        print_formatted_text(f"[PY][{porta}] 🔗 Connessione a '{ssid}'...")
+    results = await provision(arduinos, assigned, policy=WIFI_RETRY)
+    for porta, result in results.items():
+        if result.ok:
+            print_formatted_text(f"[PY][{porta}] ✅ Connesso a {result.ssid} in {result.time_to_connect:.1f}s "
+                                 f"({result.attempts} tentativi)")
+        else:
+            print_formatted_text(f"[PY][{porta}] ❌ Connessione fallita dopo {result.attempts} tentativi "
+                                 f"({result.error})")
+    return results
 
 # ============================================================
 # MOVELLA MANAGER
 # ============================================================
-async def movella_manager():
-    print("\n🔍 Scansione sensori Movella DOT (5s)...")
-    devices = await BleakScanner.discover(timeout=5.0)
-    dot_devices = [d for d in devices if d.name and "Movella DOT" in d.name]
+async def movella_manager(arduinos):
+    # Sensori già noti dalla cache, altrimenti scansione BLE
+    # (--scan per forzare una nuova scansione)
+    cache = DiscoveryCache()
+    print("\n🔍 Ricerca sensori Movella DOT...")
+    dot_devices = await discover_sensors(cache, timeout=5.0, use_cache="--scan" not in sys.argv)
 
     if not dot_devices:
         print("❌ Nessun sensore Movella DOT trovato.")
@@ -163,108 +101,82 @@ async def movella_manager():
         payload_mode=PayloadMode.CUSTOM_MODE_5
     )
 
-    sensors = []
-
-    # Connessione in sequenza (più stabile su Windows)
-    for device in dot_devices:
-        try:
-            print(f"\n🔗 Connessione a {device.name} ({device.address})...")
-            sensor = MovellaDOTSensor(config)
-            sensor.client = BleakClient(device.address)
-            await sensor.client.connect()
-
-            # ⚠ attesa critica per stabilizzare il BLE
-            await asyncio.sleep(2.5)
-
-            if not sensor.client.is_connected:
-                raise Exception("Connessione BLE non riuscita")
-
-            sensor.is_connected = True
-            sensor._device_address = device.address
-            sensor._device_name = device.name
-
-            # Tentativi multipli di configurazione
-            for attempt in range(3):
-                try:
-                    await sensor.configure_sensor()
-                    print(f"✅ {device.name} configurato correttamente.")
-                    sensors.append(sensor)
-                    break
-                except Exception as e:
-                    print(f"⚠️ Tentativo {attempt+1} fallito: {e}")
-                    await asyncio.sleep(1.5)
+    # Connessione in parallelo (max 3 alla volta): il sensore è pronto appena
+    # risponde a una lettura di DEVICE_CONTROL, senza attese fisse
+    async with MovellaDOTFleet(dot_devices, config, max_concurrency=3, cache=cache) as fleet:
+        for report in fleet.bring_up_reports:
+            if report.ok:
+                print(f"✅ {report.name} configurato in {report.elapsed:.2f}s "
+                      f"({report.attempts} tentativi)")
             else:
-                raise Exception("Configurazione fallita dopo 3 tentativi")
+                print(f"❌ Errore connessione {report.name}: {report.error}")
 
-        except Exception as e:
-            print(f"❌ Errore connessione {device.name}: {e}")
-            try:
-                if sensor.client.is_connected:
-                    await sensor.client.disconnect()
-            except:
-                pass
-
-    if not sensors:
-        print("❌ Nessun sensore configurato correttamente.")
-        return
+        if not len(fleet):
+            print("❌ Nessun sensore configurato correttamente.")
+            return
 
-    print(f"\n✅ {len(sensors)} sensori Movella connessi correttamente.\n")
+        print(f"\n✅ {len(fleet)} sensori Movella connessi correttamente.\n")
 
-    # Attesa del comando START
-    print("⏳ In attesa di START (tasto 'a')...")
-    while not start_event.is_set():
-        await asyncio.sleep(0.05)
-
-    print("\n🚀 START simultaneo GoPro + Movella...")
-    send_command(arduinos, "START")
-    await asyncio.gather(*(s.start_recording() for s in sensors))
-
-    # Attesa comando STOP
-    while not stop_event.is_set():
-        await asyncio.sleep(0.05)
+        # Attesa del comando START: il prompt è una coroutine sullo stesso loop
+        print_formatted_text("[PY] 👉 Comandi: 'a'=START, 's'=STOP, 'q'=USCITA")
+        print("⏳ In attesa di START (tasto 'a')...")
+        session = PromptSession()
+        trigger = SyncTrigger(arduinos, fleet, log_path=TAKES_LOG)
+        with patch_stdout():
+            if await read_command(session, ("a", "q")) == "q":
+                print("[PY] 🔌 Uscita forzata.")
+            else:
+                print("\n🚀 START simultaneo GoPro + Movella...")
+                print((await trigger.start()).summary())
 
-    print("\n🛑 STOP simultaneo...")
-    send_command(arduinos, "STOP")
-    await asyncio.gather(*(s.stop_recording() for s in sensors))
+                # Attesa comando STOP ('q' ferma comunque la registrazione)
+                if await read_command(session, ("s", "q")) == "q":
+                    print("[PY] 🔌 Uscita forzata.")
+                print("\n🛑 STOP simultaneo...")
+                print((await trigger.stop()).summary())
 
-    print("\n🔌 Disconnessione sensori...")
-    for s in sensors:
-        try:
-            if s.client.is_connected:
-                await s.client.disconnect()
-        except Exception as e:
-            print(f"Errore disconnessione {s._device_name}: {e}")
+        print("\n🔌 Disconnessione sensori...")
 
     print("✅ Tutti i sensori disconnessi.")
 
 # ============================================================
 # INTERFACCIA COMANDI
 # ============================================================
-def command_interface():
-    print_formatted_text("[PY] 👉 Comandi: 'a'=START, 's'=STOP, 'q'=USCITA")
-    with patch_stdout():
-        while True:
-            cmd = prompt("> ").lower().strip()
-            if cmd == "a":
-                print("[PY] 🚀 Avvio simultaneo richiesto...")
-                start_event.set()
-            elif cmd == "s":
-                print("[PY] 🛑 Stop simultaneo richiesto...")
-                stop_event.set()
-                break
-            elif cmd == "q":
-                print("[PY] 🔌 Uscita forzata.")
-                break
-            else:
-                print("[PY] ⚠ Comando non valido.")
+async def read_command(session, accepted):
+    """Attende uno dei comandi accettati senza bloccare l'event loop"""
+    while True:
+        cmd = (await session.prompt_async("> ")).lower().strip()
+        if cmd in accepted:
+            return cmd
+        print("[PY] ⚠ Comando non valido.")
 
 # ============================================================
 # MAIN
 # ============================================================
-if __name__ == "__main__":
-    cli_thread = threading.Thread(target=command_interface, daemon=True)
-    cli_thread.start()
-    asyncio.run(movella_manager())
-    for ser in arduinos:
-        ser.close()
+def open_cameras(http):
+    """Controller seriale (Arduino) o HTTP diretto: stessa interfaccia"""
+    if http:
+        return HttpController(GoProCamera(nome, local_addr=scheda) for nome, scheda in CAMERE_HTTP)
+    # --tagged: comandi con ID e tempi dell'Arduino (vedi firmware.ino)
+    return SerialController(PORTE, BAUD, on_line=print_line, tagged="--tagged" in sys.argv)
+
+async def main():
+    http = "--http" in sys.argv
+    async with open_cameras(http) as arduinos:
+        for porta, errore in arduinos.failed.items():
+            print_formatted_text(f"[PY][{porta}] ❌ Errore apertura: {errore}")
+        for nome in arduinos.ports:
+            print_formatted_text(f"[PY][{nome}] Aperta con successo.")
+
+        if not len(arduinos):
+            print_formatted_text("[PY] ❌ Nessun Arduino aperto!")
+            sys.exit(1)
+
+        if not http:
+            await connect_arduinos(arduinos, load_networks())
+
+        await movella_manager(arduinos)
     print("[PY] ✅ Tutto chiuso correttamente.")
+
+if __name__ == "__main__":
+    asyncio.run(main())